@@ -0,0 +1,148 @@
+"""
+Chart rendering for the PDF reports.
+
+Charts are described by plain, picklable specs and drawn with matplotlib's
+object-oriented Figure API (no pyplot global state), so several can be
+rendered at once. render_charts() serves specs from the cache when their
+data is unchanged and renders the rest concurrently in a process pool,
+so a report waits for its slowest chart instead of the sum of all of them.
+
+Settings: CHART_FORMAT ('png' or 'svg'), CHART_DPI, CHART_RENDER_WORKERS
+(0 renders in the calling process), CHART_CACHE_TIMEOUT.
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.cache import cache
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'analytics:chart:'
+MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def bar_chart(title, labels, values, color, xlabel=''):
+    """Horizontal bars, first item on top."""
+    return {
+        'kind': 'barh', 'title': title, 'xlabel': xlabel, 'color': color, 'figsize': (10, 6),
+        # Use reversed lists so the highest value is at the top
+        'labels': [str(label) for label in labels][::-1],
+        'values': [float(value or 0) for value in values][::-1],
+    }
+
+
+def pie_chart(title, labels, values):
+    return {
+        'kind': 'pie', 'title': title, 'figsize': (8, 6),
+        'labels': [str(label) for label in labels],
+        'values': [float(value or 0) for value in values],
+    }
+
+
+def line_chart(title, labels, values, color, xlabel='', ylabel=''):
+    return {
+        'kind': 'line', 'title': title, 'xlabel': xlabel, 'ylabel': ylabel, 'color': color, 'figsize': (12, 6),
+        'labels': [str(label) for label in labels],
+        'values': [float(value or 0) for value in values],
+    }
+
+
+def render_chart(spec, fmt='png', dpi=100):
+    """Draw one spec and return it as a data URI. Safe to run in any thread or process."""
+    figure = Figure(figsize=spec['figsize'])
+    ax = figure.subplots()
+    labels, values = spec['labels'], spec['values']
+
+    if spec['kind'] == 'barh':
+        ax.barh(labels, values, color=spec['color'])
+    elif spec['kind'] == 'pie':
+        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=140, colors=colormaps['Set3'].colors)
+    elif spec['kind'] == 'line':
+        ax.plot(labels, values, marker='o', linestyle='-', color=spec['color'], linewidth=2)
+        ax.fill_between(labels, values, color=spec['color'], alpha=0.3)
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.grid(True, linestyle='--', alpha=0.7)
+    else:
+        raise ValueError(f"Unknown chart kind: {spec['kind']}")
+
+    ax.set_title(spec['title'])
+    if spec.get('xlabel'):
+        ax.set_xlabel(spec['xlabel'])
+    if spec.get('ylabel'):
+        ax.set_ylabel(spec['ylabel'])
+    figure.tight_layout()
+
+    output = io.BytesIO()
+    figure.savefig(output, format=fmt, dpi=dpi, bbox_inches='tight')
+    encoded = base64.b64encode(output.getvalue()).decode()
+    return f"data:{MIME_TYPES[fmt]};base64,{encoded}"
+
+
+def _render_args(spec, fmt, dpi):
+    # Top level helper so it can be pickled into the pool
+    return render_chart(spec, fmt=fmt, dpi=dpi)
+
+
+def cache_key(spec, fmt, dpi):
+    payload = json.dumps([spec, fmt, dpi], sort_keys=True)
+    return CACHE_PREFIX + hashlib.sha256(payload.encode()).hexdigest()
+
+
+_pool = None
+
+
+def _get_pool(workers):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def render_charts(specs, fmt=None, dpi=None):
+    """
+    Render {name: spec} and return {name: data URI}.
+    Cached charts are reused; the others are rendered concurrently.
+    """
+    fmt = fmt or getattr(settings, 'CHART_FORMAT', 'png')
+    dpi = dpi or getattr(settings, 'CHART_DPI', 100)
+    workers = getattr(settings, 'CHART_RENDER_WORKERS', 4)
+
+    keys = {name: cache_key(spec, fmt, dpi) for name, spec in specs.items()}
+    cached = cache.get_many(list(keys.values()))
+    charts = {name: cached[key] for name, key in keys.items() if key in cached}
+    missing = [name for name in specs if name not in charts]
+
+    rendered = {}
+    if missing and workers:
+        try:
+            pool = _get_pool(workers)
+            futures = {name: pool.submit(_render_args, specs[name], fmt, dpi) for name in missing}
+            rendered = {name: future.result() for name, future in futures.items()}
+        except BrokenProcessPool:
+            logger.error("Chart rendering pool died, rendering in process.", exc_info=True)
+            _reset_pool()
+            rendered = {}
+    for name in missing:
+        if name not in rendered:
+            rendered[name] = render_chart(specs[name], fmt=fmt, dpi=dpi)
+
+    cache.set_many(
+        {keys[name]: chart for name, chart in rendered.items()},
+        getattr(settings, 'CHART_CACHE_TIMEOUT', 60 * 60)
+    )
+    charts.update(rendered)
+    return charts
@@ -0,0 +1,96 @@
+"""
+Spreadsheet exports of the sales report line items.
+
+Rows are read with values_list().iterator(chunk_size=...) so no model
+instances are built and only one chunk is held at a time. CSV is streamed
+to the client as it is produced; XLSX is written by xlsxwriter in
+constant_memory mode (rows are flushed to a temp file as they are written)
+and sent from disk. Memory stays flat whatever the row count.
+"""
+import csv
+import tempfile
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from xlsxwriter import Workbook
+
+CHUNK_SIZE = 2000
+
+HEADER = ['Order ID', 'Date', 'Branch', 'Product', 'Category', 'Qty', 'Unit Price', 'Total']
+FIELDS = [
+    'order_id', 'order__created_at', 'order__branch__name', 'product__name',
+    'product__category__name', 'quantity', 'price_at_purchase', 'total_price',
+]
+
+
+def export_rows(items):
+    """Yield one plain row per line item (see HEADER)."""
+    rows = items.order_by('order__created_at', 'id').values_list(*FIELDS).iterator(chunk_size=CHUNK_SIZE)
+    for order_id, created_at, branch, product, category, quantity, price, total in rows:
+        yield [
+            order_id, timezone.localtime(created_at).date(), branch or '', product,
+            category or '', quantity, price, total,
+        ]
+
+
+def _no_cache(response):
+    # Anti-caching headers for IDM/Browsers
+    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    response['Pragma'] = 'no-cache'
+    response['Expires'] = '0'
+    return response
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+    def write(self, value):
+        return value
+
+
+def _with_header(rows):
+    yield HEADER
+    yield from rows
+
+
+def csv_response(items, filename):
+    writer = csv.writer(Echo())
+    lines = (writer.writerow(row) for row in _with_header(export_rows(items)))
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return _no_cache(response)
+
+
+def write_xlsx(items, output):
+    """Write the line items to output (a path or binary file) as XLSX."""
+    workbook = Workbook(output, {'constant_memory': True})
+    sheet = workbook.add_worksheet('Sales')
+    bold = workbook.add_format({'bold': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    money = workbook.add_format({'num_format': '#,##0.00'})
+
+    sheet.write_row(0, 0, HEADER, bold)
+    sheet.set_column(1, 1, 12)
+    sheet.set_column(2, 4, 24)
+    for row_number, row in enumerate(export_rows(items), start=1):
+        order_id, day, branch, product, category, quantity, price, total = row
+        sheet.write_number(row_number, 0, order_id)
+        sheet.write_datetime(row_number, 1, day, date_format)
+        sheet.write_string(row_number, 2, branch)
+        sheet.write_string(row_number, 3, product)
+        sheet.write_string(row_number, 4, category)
+        sheet.write_number(row_number, 5, quantity)
+        sheet.write_number(row_number, 6, float(price), money)
+        sheet.write_number(row_number, 7, float(total), money)
+    workbook.close()
+
+
+def xlsx_response(items, filename):
+    # The zip container needs the whole workbook, so it is built in a temp
+    # file (deleted when the response is closed) rather than in memory
+    output = tempfile.TemporaryFile()
+    write_xlsx(items, output)
+    output.seek(0)
+    response = FileResponse(
+        output, as_attachment=True, filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    return _no_cache(response)
@@ -5,6 +5,12 @@ from products.models import Product, Category
 from django.utils import timezone
 from datetime import timedelta
 
+EXPORT_FORMATS = (
+    ('pdf', 'PDF Report'),
+    ('csv', 'CSV (line items)'),
+    ('xlsx', 'Excel (line items)'),
+)
+
 class SalesReportForm(forms.Form):
     branch = forms.ModelChoiceField(
         queryset=Branch.objects.all(),
@@ -50,6 +56,14 @@ class SalesReportForm(forms.Form):
         label="End Date",
         initial=lambda: timezone.now().date()
     )
+    export_format = forms.ChoiceField(
+        choices=EXPORT_FORMATS,
+        initial='pdf',
+        label="Format",
+        widget=forms.Select(attrs={
+            'class': 'bg-gray-50 border border-gray-300 text-gray-900 text-sm rounded-lg focus:ring-teal-500 focus:border-teal-500 block w-full p-2.5 dark:bg-gray-700 dark:border-gray-600 dark:placeholder-gray-400 dark:text-white dark:focus:ring-teal-500 dark:focus:border-teal-500'
+        })
+    )
 
     def clean(self):
         cleaned_data = super().clean()
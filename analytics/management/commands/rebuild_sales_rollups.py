@@ -0,0 +1,19 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from analytics.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily sales rollups from the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days from this date on (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+        total = rebuild_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups ({total} product rows)."))
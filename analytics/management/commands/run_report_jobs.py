@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from analytics.report_jobs import evict_artifacts, process_jobs
+
+class Command(BaseCommand):
+    help = 'Renders queued PDF report jobs (runs until interrupted unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the queued jobs and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                job = process_jobs()
+                if job is not None:
+                    total += 1
+                    self.stdout.write(f"Report job {job.id}: {job.status}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        evicted = evict_artifacts()
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} report jobs, evicted {evicted} artifacts."))
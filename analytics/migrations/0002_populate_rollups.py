@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    """Seed the rollups from existing orders (same as rebuild_sales_rollups)."""
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailyOrderRollup = apps.get_model('analytics', 'DailyOrderRollup')
+    DailyProductRollup = apps.get_model('analytics', 'DailyProductRollup')
+
+    order_rows = Order.objects.annotate(day=TruncDate('created_at')).values('day', 'branch_id', 'status').annotate(
+        order_count=Count('id'),
+        revenue=Sum('total_amount'),
+    ).order_by()
+    DailyOrderRollup.objects.bulk_create([DailyOrderRollup(**row) for row in order_rows], batch_size=1000)
+
+    product_rows = OrderItem.objects.annotate(
+        day=TruncDate('order__created_at'),
+        branch_id=F('order__branch_id'),
+        category_id=F('product__category_id'),
+        status=F('order__status'),
+    ).values('day', 'branch_id', 'product_id', 'category_id', 'status').annotate(
+        units=Sum('quantity'),
+        revenue=Sum(F('quantity') * F('price_at_purchase')),
+        order_count=Count('order_id', distinct=True),
+    ).order_by()
+    DailyProductRollup.objects.bulk_create([DailyProductRollup(**row) for row in product_rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('orders', '0008_order_order_created_idx_order_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
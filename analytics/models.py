@@ -0,0 +1,92 @@
+import uuid
+from django.conf import settings
+from django.db import models
+
+class DailyOrderRollup(models.Model):
+    """
+    Orders per (day, branch, status): how many and their total amount.
+    Maintained by analytics.rollups; `manage.py rebuild_sales_rollups` rebuilds it.
+    """
+    day = models.DateField()
+    branch = models.ForeignKey('branches.Branch', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Daily Order Rollup"
+        verbose_name_plural = "Daily Order Rollups"
+        indexes = [
+            models.Index(fields=['day', 'branch', 'status'], name='order_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.order_count} orders"
+
+class DailyProductRollup(models.Model):
+    """
+    Sold lines per (day, branch, product, category, status): units, revenue
+    and the number of orders that contained the product.
+    """
+    day = models.DateField()
+    branch = models.ForeignKey('branches.Branch', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey('products.Category', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Daily Product Rollup"
+        verbose_name_plural = "Daily Product Rollups"
+        indexes = [
+            models.Index(fields=['day', 'branch', 'status'], name='product_rollup_day_idx'),
+            models.Index(fields=['product', 'day'], name='product_rollup_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id} {self.status}: {self.units} units"
+
+class ReportJob(models.Model):
+    """
+    A PDF report rendered in the background by `manage.py run_report_jobs`.
+    Jobs with the same kind and parameters share `params_hash`, so a repeated
+    request is answered by the running job or its recent artifact.
+    """
+    KIND_CHOICES = (
+        ('sales', 'Sales Report'),
+        ('visual', 'Visual Report'),
+    )
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64, db_index=True)
+    base_url = models.CharField(max_length=500, blank=True, help_text="Used by WeasyPrint to resolve static files")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0)
+    file = models.FileField(upload_to='reports/', blank=True)
+    file_size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Report Job"
+        verbose_name_plural = "Report Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.id} ({self.status})"
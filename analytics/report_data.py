@@ -0,0 +1,179 @@
+"""
+Data layer for the reports.
+
+The visual report used to run one aggregate query per table and per
+ordering (branch by orders / by revenue, category by orders / by revenue,
+...). Here the filtered rollup rows (see analytics.rollups) are loaded once
+per table into pandas frames and every section, with both of its orderings,
+is derived from them in memory: two queries for the whole report.
+
+The sales report and its exports list the order lines themselves
+(sales_report_items); sales_report_chunks() splits them into the PDF's
+pages and totals each page in a single SQL query, and
+sales_report_part_pages() reads a part's lines onto those pages.
+"""
+from bisect import bisect_left
+from decimal import Decimal
+import pandas as pd
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from orders.models import OrderItem
+from .rollups import order_rollups, product_rollups
+
+TOP_PRODUCTS = 10
+
+
+def _frame(queryset, columns):
+    frame = pd.DataFrame.from_records(list(queryset.values_list(*columns)), columns=columns)
+    frame['revenue'] = frame['revenue'].astype(float)
+    return frame
+
+
+def _records(frame, sort_by, names, limit=None):
+    """Sort by sort_by (desc, name asc on ties) and rename columns for the template."""
+    name_column = frame.index.name
+    frame = frame.reset_index().sort_values([sort_by, name_column], ascending=[False, True], kind='stable')
+    if limit is not None:
+        frame = frame.head(limit)
+    return frame.rename(columns=names).to_dict('records')
+
+
+def visual_report_data(start_date, end_date):
+    """
+    Every table the visual report shows, for orders placed between
+    start_date and end_date (inclusive).
+    """
+    orders = _frame(
+        order_rollups().filter(day__gte=start_date, day__lte=end_date),
+        ['day', 'branch__name', 'order_count', 'revenue'],
+    )
+    products = _frame(
+        product_rollups().filter(day__gte=start_date, day__lte=end_date),
+        ['product__name', 'category__name', 'units', 'order_count', 'revenue'],
+    )
+    products['category__name'] = products['category__name'].fillna('Uncategorized')
+
+    # Section 1: branches (orders without a branch are left out)
+    branches = orders.dropna(subset=['branch__name']).groupby('branch__name')[['order_count', 'revenue']].sum()
+    branches = branches[branches['order_count'] > 0]
+    branch_names = {'order_count': 'total_orders', 'revenue': 'total_revenue'}
+
+    # Section 2: categories, "orders" being order lines as before
+    categories = products.groupby('category__name')[['order_count', 'revenue']].sum()
+    categories = categories[categories['order_count'] > 0]
+    category_names = {'category__name': 'product__category__name', 'order_count': 'total_orders', 'revenue': 'total_revenue'}
+
+    # Section 3: products
+    top_products = products.groupby('product__name')[['units', 'revenue']].sum()
+    top_products = top_products[top_products['units'] > 0]
+    product_names = {'units': 'qty_sold'}
+
+    # Section 4: daily trend
+    daily = orders.groupby('day')[['order_count', 'revenue']].sum().sort_index()
+    daily = daily[daily['order_count'] > 0]
+
+    return {
+        'branch_data_orders': _records(branches, 'order_count', branch_names),
+        'branch_data_revenue': _records(branches, 'revenue', branch_names),
+        'category_data_orders': _records(categories, 'order_count', category_names),
+        'category_data_revenue': _records(categories, 'revenue', category_names),
+        'top_products_qty': _records(top_products, 'units', product_names, limit=TOP_PRODUCTS),
+        'top_products_revenue': _records(top_products, 'revenue', product_names, limit=TOP_PRODUCTS),
+        'daily_sales': [
+            {'day': day, 'daily_revenue': revenue} for day, revenue in daily['revenue'].items()
+        ],
+    }
+
+
+def sales_report_items(start_date, end_date, branch=None, category=None, product=None):
+    """The filtered OrderItem rows behind the sales report."""
+    items = OrderItem.objects.filter(
+        order__created_at__date__gte=start_date,
+        order__created_at__date__lte=end_date
+    ).exclude(
+        product__isnull=True
+    ).select_related('order', 'product', 'order__branch', 'product__category').annotate(
+        total_price=F('quantity') * F('price_at_purchase')
+    )
+
+    if branch:
+        items = items.filter(order__branch=branch)
+    if category:
+        items = items.filter(product__category=category)
+    if product:
+        items = items.filter(product=product)
+    return items
+
+
+def sales_report_chunks(items, chunk_rows):
+    """
+    Split the report lines (in id order) into chunks of chunk_rows and total
+    each one in SQL. Returns [{'number', 'first_id', 'last_id', 'lines',
+    'units', 'revenue'}], the id range being what a chunk's rows are read by.
+    """
+    numbered = items.order_by().annotate(
+        line_number=Window(RowNumber(), order_by=F('id').asc())
+    ).values('id', 'quantity', 'total_price', 'line_number')
+    sql, params = numbered.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT (line_number - 1) / %s, MIN(id), MAX(id), COUNT(*), SUM(quantity), SUM(total_price) "
+            f"FROM ({sql}) numbered GROUP BY 1 ORDER BY 1",
+            [chunk_rows, *params]
+        )
+        rows = cursor.fetchall()
+    return [
+        {
+            'number': number + 1, 'first_id': first_id, 'last_id': last_id, 'lines': lines, 'units': units,
+            'revenue': Decimal(str(revenue or 0)).quantize(Decimal('0.01')),
+        }
+        for number, first_id, last_id, lines, units, revenue in rows
+    ]
+
+
+def _totals(pages):
+    return {
+        'lines': sum(page['lines'] for page in pages),
+        'units': sum(page['units'] for page in pages),
+        'revenue': sum((page['revenue'] for page in pages), Decimal('0.00')),
+    }
+
+
+def sales_report_parts(pages, pages_per_part):
+    """
+    Group page chunks (sales_report_chunks) into the parts rendered as one
+    document each. Part totals add up the pages' SQL subtotals.
+    """
+    parts = []
+    for start in range(0, len(pages), pages_per_part):
+        group = pages[start:start + pages_per_part]
+        parts.append({
+            'number': len(parts) + 1, 'pages': group,
+            'first_id': group[0]['first_id'], 'last_id': group[-1]['last_id'],
+            **_totals(group),
+        })
+    return parts
+
+
+def sales_report_part_pages(items, part):
+    """
+    Read a part's lines in one query and put each on its page by id range
+    (a page holds the lines from its first_id to its last_id). The pages'
+    subtotals, and the part's totals, are then taken from the rows read, so
+    what a page prints always adds up even if lines were added or removed
+    since sales_report_chunks planned the pages. Returns the pages with
+    their 'items'.
+    """
+    pages = [{**page, 'items': []} for page in part['pages']]
+    last_ids = [page['last_id'] for page in pages]
+    for item in items.filter(id__gte=part['first_id'], id__lte=part['last_id']).order_by('id'):
+        pages[bisect_left(last_ids, item.id)]['items'].append(item)
+    for page in pages:
+        page.update({
+            'lines': len(page['items']),
+            'units': sum(item.quantity for item in page['items']),
+            'revenue': sum((item.total_price for item in page['items']), Decimal('0.00')).quantize(Decimal('0.01')),
+        })
+    part.update(pages=pages, **_totals(pages))
+    return pages
@@ -0,0 +1,118 @@
+"""
+Background report jobs.
+
+submit_job() records a request and returns at once; the `run_report_jobs`
+worker renders queued jobs to media storage (reports/) while the browser
+polls the job status. Requests with the same kind and parameters are
+deduplicated: they get the queued/running job, or the finished artifact if
+it is younger than REPORT_REUSE_SECONDS. evict_artifacts() deletes files
+older than REPORT_ARTIFACT_MAX_AGE and, oldest first, whatever exceeds
+REPORT_ARTIFACT_MAX_BYTES in total.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+# A running job not finished within this window is assumed lost (worker died)
+RUN_TIMEOUT = timedelta(minutes=30)
+
+
+def params_hash(kind, params):
+    payload = json.dumps([kind, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def submit_job(kind, params, user=None, base_url=''):
+    """Return a job for (kind, params): an existing equivalent one or a new queued one."""
+    digest = params_hash(kind, params)
+    reuse_after = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_REUSE_SECONDS', 15 * 60))
+    existing = ReportJob.objects.filter(params_hash=digest).filter(
+        Q(status__in=['queued', 'running']) | Q(status='done', finished_at__gte=reuse_after)
+    ).order_by('-created_at').first()
+    if existing is not None:
+        return existing
+    return ReportJob.objects.create(
+        kind=kind, params=params, params_hash=digest, base_url=base_url, requested_by=user
+    )
+
+
+def claim_job():
+    """Mark the oldest queued (or abandoned running) job as running and return it."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = ReportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status='queued') | Q(status='running', started_at__lt=now - RUN_TIMEOUT)
+        ).order_by('created_at').first()
+        if job is None:
+            return None
+        job.status, job.started_at, job.progress, job.error = 'running', now, 0, ''
+        job.save(update_fields=['status', 'started_at', 'progress', 'error'])
+    return job
+
+
+def get_renderer(kind):
+    # WeasyPrint is only needed by the worker
+    from .reports import RENDERERS
+    return RENDERERS[kind]
+
+
+def run_job(job):
+    def progress(percent):
+        ReportJob.objects.filter(pk=job.pk).update(progress=percent)
+
+    try:
+        filename, content = get_renderer(job.kind)(job.params, progress, base_url=job.base_url or None)
+        job.file.save(filename, ContentFile(content), save=False)
+        job.file_size = len(content)
+        job.status, job.progress = 'done', 100
+    except Exception as e:
+        logger.error(f"Report job {job.id} failed: {e}", exc_info=True)
+        job.status, job.error = 'failed', str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'file_size', 'status', 'progress', 'error', 'finished_at'])
+    return job
+
+
+def _expire(jobs):
+    for job in jobs:
+        if job.file:
+            job.file.delete(save=False)
+    ReportJob.objects.filter(pk__in=[job.pk for job in jobs]).update(status='expired', file='', file_size=0)
+    return len(jobs)
+
+
+def evict_artifacts(max_age=None, max_bytes=None):
+    """Delete old artifacts, then the oldest ones beyond the size budget. Returns how many."""
+    if max_age is None:
+        max_age = timedelta(seconds=getattr(settings, 'REPORT_ARTIFACT_MAX_AGE', 24 * 60 * 60))
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'REPORT_ARTIFACT_MAX_BYTES', 500 * 1024 * 1024)
+
+    done = ReportJob.objects.filter(status='done')
+    evicted = _expire(list(done.filter(finished_at__lt=timezone.now() - max_age)))
+
+    total = 0
+    over_budget = []
+    for job in done.only('id', 'file', 'file_size').order_by('-finished_at'):
+        total += job.file_size
+        if total > max_bytes:
+            over_budget.append(job)
+    return evicted + _expire(over_budget)
+
+
+def process_jobs():
+    """Run one queued job if there is one. Returns the job or None."""
+    job = claim_job()
+    if job is not None:
+        run_job(job)
+        evict_artifacts()
+    return job
@@ -0,0 +1,223 @@
+"""
+PDF report rendering, run by the report job worker (see analytics.report_jobs).
+
+Each renderer takes the job's JSON parameters and a progress(percent)
+callback and returns (filename, pdf_bytes). Nothing here needs a request.
+"""
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
+from django.utils.timezone import now
+from pypdf import PdfWriter
+from weasyprint import HTML
+from branches.models import Branch
+from products.models import Category, Product
+from .charts import render_charts, bar_chart, pie_chart, line_chart
+from .report_data import (
+    sales_report_chunks, sales_report_items, sales_report_part_pages, sales_report_parts, visual_report_data,
+)
+
+
+def _get(model, pk):
+    return model.objects.filter(pk=pk).first() if pk else None
+
+
+def _write_pdf(html_string, base_url):
+    # Top level so it can be pickled into the pool
+    return HTML(string=html_string, base_url=base_url).write_pdf()
+
+
+def _page_count(html_string, base_url):
+    return len(HTML(string=html_string, base_url=base_url).render().pages)
+
+
+def write_pdfs(html_strings, base_url=None, workers=0):
+    """
+    Yield the PDF of each HTML document, in order. With workers, documents
+    are laid out concurrently in a process pool, at most 2 per worker in
+    flight so the HTML waiting to be rendered stays bounded.
+    """
+    if not workers:
+        for html_string in html_strings:
+            yield _write_pdf(html_string, base_url)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for html_string in html_strings:
+            pending.append(pool.submit(_write_pdf, html_string, base_url))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def merge_pdfs(pdfs):
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(io.BytesIO(pdf))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_sales_report(params, progress, base_url=None):
+    """
+    Lines are printed SALES_REPORT_PAGE_ROWS to a page, each page ending in
+    its subtotal. The pages are planned in one SQL query (sales_report_chunks)
+    and grouped into parts of about SALES_REPORT_CHUNK_ROWS lines; the cover
+    and every part are separate documents (WeasyPrint lays out a few hundred
+    rows at a time instead of one huge table), merged at the end. Since each
+    page holds a known set of lines, every page's number is known up front
+    and numbering runs on across the parts.
+
+    A part's subtotals are taken from the rows it prints
+    (sales_report_part_pages), and the cover, whose summary and grand total
+    add those up, is rendered last and put in front when merging.
+    """
+    start_date = parse_date(params['start_date'])
+    end_date = parse_date(params['end_date'])
+    branch = _get(Branch, params.get('branch'))
+    category = _get(Category, params.get('category'))
+    product = _get(Product, params.get('product'))
+
+    items = sales_report_items(start_date, end_date, branch, category, product)
+    page_rows = getattr(settings, 'SALES_REPORT_PAGE_ROWS', 15)
+    pages = sales_report_chunks(items, page_rows)
+    parts = sales_report_parts(pages, max(1, getattr(settings, 'SALES_REPORT_CHUNK_ROWS', 500) // page_rows))
+    progress(10)
+
+    template_path = 'analytics/pdf_template.html'
+    context = {
+        'start_date': start_date,
+        'end_date': end_date,
+        'branch': branch if branch else "All Branches",
+        'category': category if category else "All Categories",
+        'product': product if product else "All Products",
+        'parts': parts,
+    }
+
+    def grand_total():
+        return sum((part['revenue'] for part in parts), Decimal('0.00'))
+
+    # The cover's length depends on the summary (one row per part), not on
+    # its figures: lay it out once to count its pages
+    cover_pages = _page_count(
+        render_to_string(template_path, {**context, 'cover': True, 'total_revenue': grand_total()}), base_url
+    )
+    total_pages = cover_pages + len(pages)
+
+    def documents():
+        for part in parts:
+            part_pages = sales_report_part_pages(items, part)
+            for page in part_pages:
+                page['label'] = f"Page {cover_pages + page['number']} of {total_pages}"
+            yield render_to_string(template_path, {
+                **context, 'part': part, 'pages': part_pages, 'last': part is parts[-1],
+                'total_revenue': grand_total(),
+            })
+        # Every part has been read by now: the summary adds up what was printed
+        yield render_to_string(template_path, {
+            **context, 'cover': True, 'total_pages': total_pages,
+            'total_revenue': grand_total(),
+        })
+
+    pdfs = []
+    workers = getattr(settings, 'SALES_REPORT_RENDER_WORKERS', 2)
+    for done, pdf in enumerate(write_pdfs(documents(), base_url, workers), start=1):
+        pdfs.append(pdf)
+        progress(10 + 85 * done // (len(parts) + 1))
+
+    filename = f"sales_report_{now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return filename, merge_pdfs([pdfs[-1], *pdfs[:-1]])
+
+
+def render_visual_report(params, progress, base_url=None):
+    start_date = params['start_date']
+    end_date = params['end_date']
+
+    # --- Report data: every section from one pass over the rollups ---
+    report = visual_report_data(start_date, end_date)
+    progress(10)
+
+    branch_data_orders = report['branch_data_orders']
+    branch_data_revenue = report['branch_data_revenue']
+    category_data_orders = report['category_data_orders']
+    category_data_revenue = report['category_data_revenue']
+    top_products_qty = report['top_products_qty']
+    top_products_revenue = report['top_products_revenue']
+    daily_sales = report['daily_sales']
+
+    # --- Charts: rendered concurrently (and cached) by analytics.charts ---
+    charts = render_charts({
+        # SECTION 1: BRANCH ANALYSIS
+        'branch_orders_chart': bar_chart(
+            'Orders per Branch',
+            [x['branch__name'] for x in branch_data_orders], [x['total_orders'] for x in branch_data_orders],
+            color='#1abc9c', xlabel='Number of Orders'
+        ),
+        'branch_revenue_chart': bar_chart(
+            'Revenue per Branch',
+            [x['branch__name'] for x in branch_data_revenue], [x['total_revenue'] for x in branch_data_revenue],
+            color='#3498db', xlabel='Revenue (PKR)'
+        ),
+        # SECTION 2: CATEGORY ANALYSIS
+        'category_orders_chart': pie_chart(
+            'Sales Volume per Category',
+            [x['product__category__name'] for x in category_data_orders], [x['total_orders'] for x in category_data_orders]
+        ),
+        'category_revenue_chart': pie_chart(
+            'Revenue per Category',
+            [x['product__category__name'] for x in category_data_revenue], [x['total_revenue'] for x in category_data_revenue]
+        ),
+        # SECTION 3: TOP PRODUCTS
+        'product_qty_chart': bar_chart(
+            'Top 10 Products (Quantity Sold)',
+            [x['product__name'] for x in top_products_qty], [x['qty_sold'] for x in top_products_qty],
+            color='#f39c12', xlabel='Quantity'
+        ),
+        'product_revenue_chart': bar_chart(
+            'Top 10 Products (Revenue Generated)',
+            [x['product__name'] for x in top_products_revenue], [x['revenue'] for x in top_products_revenue],
+            color='#2ecc71', xlabel='Revenue'
+        ),
+        # SECTION 4: TRENDS
+        'overall_trend_chart': line_chart(
+            'Daily Sales Trend',
+            [x['day'].strftime('%Y-%m-%d') for x in daily_sales], [x['daily_revenue'] for x in daily_sales],
+            color='#8e44ad', xlabel='Date', ylabel='Revenue'
+        ),
+    })
+
+    context = {
+        'start_date': start_date,
+        'end_date': end_date,
+        'branch_data_orders': branch_data_orders,
+        'branch_data_revenue': branch_data_revenue,
+        'branch_orders_chart': charts['branch_orders_chart'],
+        'branch_revenue_chart': charts['branch_revenue_chart'],
+        'category_data_orders': category_data_orders,
+        'category_data_revenue': category_data_revenue,
+        'category_orders_chart': charts['category_orders_chart'],
+        'category_revenue_chart': charts['category_revenue_chart'],
+        'top_products_qty': top_products_qty,
+        'top_products_revenue': top_products_revenue,
+        'product_qty_chart': charts['product_qty_chart'],
+        'product_revenue_chart': charts['product_revenue_chart'],
+        'overall_trend_chart': charts['overall_trend_chart'],
+    }
+    progress(60)
+
+    # Generate PDF
+    html_string = render_to_string('analytics/visual_report.html', context)
+    filename = f"Visual_Report_{now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return filename, HTML(string=html_string, base_url=base_url).write_pdf()
+
+
+RENDERERS = {
+    'sales': render_sales_report,
+    'visual': render_visual_report,
+}
@@ -0,0 +1,141 @@
+"""
+Daily sales rollups.
+
+Reports read pre-aggregated facts instead of scanning Order / OrderItem:
+- DailyOrderRollup:   (day, branch, status) -> order_count, revenue
+- DailyProductRollup: (day, branch, product, category, status) -> units, revenue, order_count
+
+The rollups follow the order lifecycle events (orders.signals): a placed
+order is added under its status, a status change moves it from the old
+status to the new one. Changes made behind the events' back (queryset
+updates, edited items, deleted orders) are fixed by rebuild_rollups(),
+exposed as `manage.py rebuild_sales_rollups`.
+
+Days are local dates (TIME_ZONE), like TruncDay in the views used to give.
+Several rows may exist for the same key after a race; readers always Sum.
+"""
+import logging
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.dispatch import receiver
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from orders.signals import order_placed, order_status_changed
+from .models import DailyOrderRollup, DailyProductRollup
+
+logger = logging.getLogger(__name__)
+
+
+def _bump(model, key, deltas):
+    """Add deltas to the row for key, creating it if needed."""
+    updated = model.objects.filter(**key).update(**{
+        field: F(field) + value for field, value in deltas.items()
+    })
+    if not updated:
+        model.objects.create(**key, **deltas)
+
+
+def record_order(order, items, status, sign=1):
+    """Add (sign=1) or remove (sign=-1) an order and its lines under `status`."""
+    day = timezone.localdate(order.created_at)
+    _bump(DailyOrderRollup, {'day': day, 'branch_id': order.branch_id, 'status': status}, {
+        'order_count': sign,
+        'revenue': sign * Decimal(order.total_amount),
+    })
+
+    lines = {}
+    for item in items:
+        line = lines.setdefault(item['product_id'], {
+            'category_id': item.get('category_id'), 'units': 0, 'revenue': Decimal('0'),
+        })
+        line['units'] += item['quantity']
+        line['revenue'] += item['quantity'] * Decimal(item['price'])
+
+    for product_id, line in sorted(lines.items()):
+        key = {
+            'day': day,
+            'branch_id': order.branch_id,
+            'product_id': product_id,
+            'category_id': line['category_id'],
+            'status': status,
+        }
+        _bump(DailyProductRollup, key, {
+            'units': sign * line['units'],
+            'revenue': sign * line['revenue'],
+            'order_count': sign,
+        })
+
+
+@receiver(order_placed)
+def rollup_order_placed(sender, order, items, **kwargs):
+    try:
+        with transaction.atomic():
+            record_order(order, items, order.status)
+    except Exception as e:
+        logger.error(f"Error updating sales rollups for order {order.id}: {e}", exc_info=True)
+
+
+@receiver(order_status_changed)
+def rollup_order_status_changed(sender, order, old_status, new_status, items, **kwargs):
+    try:
+        with transaction.atomic():
+            record_order(order, items, old_status, sign=-1)
+            record_order(order, items, new_status)
+    except Exception as e:
+        logger.error(f"Error updating sales rollups for order {order.id}: {e}", exc_info=True)
+
+
+def rebuild_rollups(since=None):
+    """
+    Recompute the rollups from the order tables, for every day or from
+    `since` (a date) on. Returns the number of product rollup rows written.
+    """
+    orders = Order.objects.all()
+    items = OrderItem.objects.all()
+    if since is not None:
+        orders = orders.filter(created_at__date__gte=since)
+        items = items.filter(order__created_at__date__gte=since)
+
+    order_rows = orders.annotate(day=TruncDate('created_at')).values('day', 'branch_id', 'status').annotate(
+        order_count=Count('id'),
+        revenue=Sum('total_amount'),
+    ).order_by()
+    product_rows = items.annotate(
+        day=TruncDate('order__created_at'),
+        branch_id=F('order__branch_id'),
+        category_id=F('product__category_id'),
+        status=F('order__status'),
+    ).values('day', 'branch_id', 'product_id', 'category_id', 'status').annotate(
+        units=Sum('quantity'),
+        revenue=Sum(F('quantity') * F('price_at_purchase')),
+        order_count=Count('order_id', distinct=True),
+    ).order_by()
+
+    with transaction.atomic():
+        for model in (DailyOrderRollup, DailyProductRollup):
+            existing = model.objects.all()
+            if since is not None:
+                existing = existing.filter(day__gte=since)
+            existing.delete()
+        DailyOrderRollup.objects.bulk_create(
+            [DailyOrderRollup(**row) for row in order_rows.iterator()], batch_size=1000
+        )
+        product_objects = [DailyProductRollup(**row) for row in product_rows.iterator()]
+        DailyProductRollup.objects.bulk_create(product_objects, batch_size=1000)
+    return len(product_objects)
+
+
+def order_rollups(branch_id=None):
+    rows = DailyOrderRollup.objects.all()
+    if branch_id is not None:
+        rows = rows.filter(branch_id=branch_id)
+    return rows
+
+
+def product_rollups(branch_id=None):
+    rows = DailyProductRollup.objects.all()
+    if branch_id is not None:
+        rows = rows.filter(branch_id=branch_id)
+    return rows
@@ -0,0 +1,302 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from branches.models import Branch
+from orders.models import OrderItem
+from orders.services import place_order, cancel_order
+from products.models import Category, Product
+from .models import DailyOrderRollup, DailyProductRollup, ReportJob
+from .report_jobs import submit_job, process_jobs, evict_artifacts
+from .rollups import rebuild_rollups
+from .report_data import (
+    sales_report_chunks, sales_report_items, sales_report_part_pages, sales_report_parts, visual_report_data,
+)
+from .charts import render_charts, bar_chart, pie_chart, line_chart
+
+User = get_user_model()
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='rollup@example.com', password='password123', is_active=True)
+        self.branch = Branch.objects.create(name='Main', address='Somewhere', latitude=31.5, longitude=74.3)
+        self.category = Category.objects.create(name='Medicine')
+        self.panadol = Product.objects.create(name='Panadol', category=self.category, price=10, stock=100)
+        self.brufen = Product.objects.create(name='Brufen', category=self.category, price=25, stock=100)
+
+    def place(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_order(self.user, items, shipping_address='Addr', branch=self.branch)
+
+    def snapshot(self):
+        orders = {
+            (row['day'], row['branch_id'], row['status']): (row['orders'], row['revenue'])
+            for row in DailyOrderRollup.objects.values('day', 'branch_id', 'status').annotate(
+                orders=Sum('order_count'), revenue=Sum('revenue')
+            ) if row['orders']
+        }
+        products = {
+            (row['day'], row['product_id'], row['category_id'], row['status']): (row['units'], row['revenue'], row['orders'])
+            for row in DailyProductRollup.objects.values('day', 'product_id', 'category_id', 'status').annotate(
+                units=Sum('units'), revenue=Sum('revenue'), orders=Sum('order_count')
+            ) if row['orders']
+        }
+        return orders, products
+
+    def test_rollups_follow_placement_and_cancellation(self):
+        self.place({self.panadol.id: 2, self.brufen.id: 1})
+        order = self.place({self.panadol.id: 3})
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_order(order)
+
+        orders, products = self.snapshot()
+        day = timezone.localdate(order.created_at)
+        self.assertEqual(orders[(day, self.branch.id, 'Pending')], (1, 45))
+        self.assertEqual(orders[(day, self.branch.id, 'Cancelled')], (1, 30))
+        self.assertEqual(products[(day, self.panadol.id, self.category.id, 'Pending')], (2, 20, 1))
+        self.assertEqual(products[(day, self.panadol.id, self.category.id, 'Cancelled')], (3, 30, 1))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.place({self.panadol.id: 2, self.brufen.id: 1})
+        order = self.place({self.brufen.id: 4})
+        order.status = 'Shipped'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        incremental = self.snapshot()
+
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+        rebuild_rollups(since=timezone.localdate())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_visual_report_data_in_two_queries(self):
+        other = Branch.objects.create(name='Second', address='Elsewhere', latitude=31.4, longitude=74.2)
+        self.place({self.panadol.id: 2, self.brufen.id: 1})
+        self.place({self.brufen.id: 4})
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, {self.panadol.id: 9}, shipping_address='Addr', branch=other)
+
+        today = timezone.localdate()
+        with self.assertNumQueries(2):
+            report = visual_report_data(today, today)
+
+        self.assertEqual(
+            [(row['branch__name'], row['total_orders'], row['total_revenue']) for row in report['branch_data_orders']],
+            [('Main', 2, 145.0), ('Second', 1, 90.0)]
+        )
+        self.assertEqual([row['branch__name'] for row in report['branch_data_revenue']], ['Main', 'Second'])
+        self.assertEqual(
+            [(row['product__name'], row['qty_sold'], row['revenue']) for row in report['top_products_qty']],
+            [('Panadol', 11, 110.0), ('Brufen', 5, 125.0)]
+        )
+        self.assertEqual([row['product__name'] for row in report['top_products_revenue']], ['Brufen', 'Panadol'])
+        self.assertEqual(report['category_data_orders'][0]['total_orders'], 4)
+        self.assertEqual(report['daily_sales'], [{'day': today, 'daily_revenue': 235.0}])
+
+
+class ChartRenderingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.specs = {
+            'bars': bar_chart('Orders per Branch', ['Main', 'Second'], [3, 1], color='#1abc9c'),
+            'pie': pie_chart('Revenue per Category', ['Medicine', 'Care'], [Decimal('10.50'), 4]),
+            'trend': line_chart('Daily Sales Trend', ['2026-01-01', '2026-01-02'], [5, 7], color='#8e44ad'),
+        }
+
+    @override_settings(CHART_RENDER_WORKERS=2)
+    def test_charts_render_in_pool_and_are_cached(self):
+        charts = render_charts(self.specs, fmt='png', dpi=50)
+        self.assertEqual(set(charts), set(self.specs))
+        self.assertTrue(all(chart.startswith('data:image/png;base64,') for chart in charts.values()))
+
+        with patch('analytics.charts.render_chart') as render:
+            self.assertEqual(render_charts(self.specs, fmt='png', dpi=50), charts)
+        render.assert_not_called()
+
+    @override_settings(CHART_RENDER_WORKERS=0, CHART_FORMAT='svg')
+    def test_svg_output_in_process(self):
+        charts = render_charts({'bars': self.specs['bars']})
+        self.assertTrue(charts['bars'].startswith('data:image/svg+xml;base64,'))
+
+
+def fake_renderer(params, progress, base_url=None):
+    progress(50)
+    return f"report_{params['start_date']}.pdf", b'%PDF-1.4 ' + params['start_date'].encode()
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        renderer = patch('analytics.report_jobs.get_renderer', return_value=fake_renderer)
+        renderer.start()
+        self.addCleanup(renderer.stop)
+        self.staff = User.objects.create_user(email='staff@example.com', password='password123', is_active=True, is_staff=True)
+
+    def test_job_runs_and_identical_requests_are_deduplicated(self):
+        params = {'start_date': '2026-01-01', 'end_date': '2026-01-31'}
+        job = submit_job('visual', params)
+        self.assertEqual(submit_job('visual', dict(reversed(params.items()))), job)
+        self.assertNotEqual(submit_job('sales', params), job)
+
+        self.assertEqual(process_jobs(), job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.file_size), ('done', 100, len(b'%PDF-1.4 2026-01-01')))
+        # The finished artifact is reused instead of rendering again
+        self.assertEqual(submit_job('visual', params), job)
+
+        with override_settings(REPORT_REUSE_SECONDS=0):
+            self.assertNotEqual(submit_job('visual', params), job)
+
+    def test_failed_render_is_recorded(self):
+        job = submit_job('visual', {'start_date': '2026-01-01'})
+        with patch('analytics.report_jobs.get_renderer', return_value=lambda *args, **kwargs: 1 / 0):
+            process_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('division by zero', job.error)
+
+    def test_eviction_by_age_and_size(self):
+        jobs = [submit_job('visual', {'start_date': f'2026-01-0{day}'}) for day in (1, 2, 3)]
+        while process_jobs():
+            pass
+        ReportJob.objects.filter(pk=jobs[0].pk).update(finished_at=timezone.now() - timedelta(days=2))
+        ReportJob.objects.filter(pk=jobs[1].pk).update(finished_at=timezone.now() - timedelta(minutes=5))
+        path = ReportJob.objects.get(pk=jobs[0].pk).file.path
+
+        # jobs[0] is too old, jobs[1] no longer fits next to the newer jobs[2]
+        self.assertEqual(evict_artifacts(max_age=timedelta(days=1), max_bytes=25), 2)
+        self.assertEqual(
+            list(ReportJob.objects.filter(pk__in=[job.pk for job in jobs]).order_by('params').values_list('status', flat=True)),
+            ['expired', 'expired', 'done']
+        )
+        self.assertFalse(os.path.exists(path))
+
+    def test_views_submit_poll_and_download(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('visual_report'), {'start_date': '2026-01-01', 'end_date': '2026-01-31'})
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse('report_job', args=[job.id]))
+        self.assertEqual(self.client.post(reverse('visual_report'), {'start_date': 'soon'}).status_code, 400)
+
+        status = self.client.get(reverse('report_job_status', args=[job.id])).json()
+        self.assertEqual((status['status'], status['download_url']), ('queued', None))
+        self.assertEqual(self.client.get(reverse('report_job_download', args=[job.id])).status_code, 404)
+
+        process_jobs()
+        status = self.client.get(reverse('report_job_status', args=[job.id])).json()
+        self.assertEqual(status['status'], 'done')
+        response = self.client.get(status['download_url'])
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 2026-01-01')
+        self.assertEqual(response['Cache-Control'], 'no-cache, no-store, must-revalidate')
+
+
+class SalesExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(email='finance@example.com', password='password123', is_active=True, is_staff=True)
+        self.branch = Branch.objects.create(name='Main', address='Somewhere', latitude=31.5, longitude=74.3)
+        category = Category.objects.create(name='Medicine')
+        self.panadol = Product.objects.create(name='Panadol', category=category, price=10, stock=100)
+        self.brufen = Product.objects.create(name='Brufen', category=Category.objects.create(name='Care'), price=25, stock=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.staff, {self.panadol.id: 2, self.brufen.id: 1}, shipping_address='Addr', branch=self.branch)
+        self.client.force_login(self.staff)
+        today = timezone.localdate().isoformat()
+        self.form = {'start_date': today, 'end_date': today}
+
+    def test_csv_is_streamed(self):
+        response = self.client.post(reverse('sales_report'), {**self.form, 'export_format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Order ID,Date,Branch,Product,Category,Qty,Unit Price,Total')
+        self.assertEqual(len(lines), 3)
+        self.assertIn(f',{self.form["start_date"]},Main,Panadol,Medicine,2,10.00,20', '\n'.join(lines))
+        self.assertIn(',Main,Brufen,Care,1,25.00,25', '\n'.join(lines))
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+        response = self.client.post(reverse('sales_report'), {**self.form, 'export_format': 'xlsx', 'product': self.panadol.id})
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook['Sales'].iter_rows(values_only=True))
+        self.assertEqual(rows[0][:4], ('Order ID', 'Date', 'Branch', 'Product'))
+        self.assertEqual(rows[1][2:], ('Main', 'Panadol', 'Medicine', 2, 10, 20))
+        self.assertEqual(len(rows), 2)
+
+
+class SalesReportChunkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='chunks@example.com', password='password123', is_active=True)
+        self.branch = Branch.objects.create(name='Main', address='Somewhere', latitude=31.5, longitude=74.3)
+        category = Category.objects.create(name='Medicine')
+        self.products = [Product.objects.create(name=f'Product {n}', category=category, price=n, stock=100) for n in range(1, 6)]
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, {product.id: 1 for product in self.products}, shipping_address='Addr', branch=self.branch)
+            place_order(self.user, {self.products[0].id: 3}, shipping_address='Addr', branch=self.branch)
+        today = timezone.localdate()
+        self.items = sales_report_items(today, today)
+
+    def test_chunks_are_totalled_in_one_query(self):
+        with self.assertNumQueries(1):
+            chunks = sales_report_chunks(self.items, 4)
+        self.assertEqual([(chunk['number'], chunk['lines'], chunk['units']) for chunk in chunks], [(1, 4, 4), (2, 2, 4)])
+        self.assertEqual([chunk['revenue'] for chunk in chunks], [Decimal('10.00'), Decimal('8.00')])
+
+        ids = list(self.items.order_by('id').values_list('id', flat=True))
+        self.assertEqual((chunks[0]['first_id'], chunks[0]['last_id']), (ids[0], ids[3]))
+        self.assertEqual((chunks[1]['first_id'], chunks[1]['last_id']), (ids[4], ids[5]))
+
+    def test_pages_are_grouped_into_parts(self):
+        pages = sales_report_chunks(self.items, 2)
+        parts = sales_report_parts(pages, 2)
+        self.assertEqual([[page['number'] for page in part['pages']] for part in parts], [[1, 2], [3]])
+        self.assertEqual([(part['lines'], part['units'], part['revenue']) for part in parts], [
+            (4, 4, Decimal('10.00')), (2, 4, Decimal('8.00')),
+        ])
+        self.assertEqual((parts[1]['first_id'], parts[1]['last_id']), (pages[2]['first_id'], pages[2]['last_id']))
+
+    def test_part_document_prints_page_subtotals_and_running_page_numbers(self):
+        pages = sales_report_chunks(self.items, 2)
+        parts = sales_report_parts(pages, 2)
+        part_pages = sales_report_part_pages(self.items, parts[0])
+        for page in part_pages:
+            page['label'] = f"Page {3 + page['number']} of 6"
+        html = render_to_string('analytics/pdf_template.html', {
+            'part': parts[0], 'parts': parts, 'pages': part_pages, 'last': False, 'total_revenue': Decimal('18.00'),
+        })
+        self.assertEqual(html.count('<span class="badge">'), 4)
+        self.assertEqual(html.count('Page subtotal'), 2)
+        self.assertIn('Part 1 of 2', html)
+        self.assertIn('Page 4 of 6', html)
+        self.assertIn('Page 5 of 6', html)
+        self.assertNotIn('GRAND TOTAL', html)
+        self.assertNotIn('title-page-container"', html)
+
+    def test_page_subtotals_match_the_rows_read(self):
+        pages = sales_report_chunks(self.items, 2)
+        parts = sales_report_parts(pages, 2)
+        # A line of page 1 goes away after the pages were planned
+        OrderItem.objects.filter(pk=pages[0]['first_id']).delete()
+        with self.assertNumQueries(1):
+            part_pages = sales_report_part_pages(self.items, parts[0])
+        self.assertEqual([[item.id for item in page['items']] for page in part_pages], [
+            [pages[0]['last_id']], [pages[1]['first_id'], pages[1]['last_id']],
+        ])
+        for page in part_pages:
+            self.assertEqual(page['lines'], len(page['items']))
+            self.assertEqual(page['units'], sum(item.quantity for item in page['items']))
+            self.assertEqual(page['revenue'], sum(item.total_price for item in page['items']))
+        self.assertEqual((parts[0]['lines'], parts[0]['revenue']), (3, sum(page['revenue'] for page in part_pages)))
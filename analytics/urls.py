@@ -1,10 +1,16 @@
 from django.urls import path
-from .views import DashboardStatsView, AnalyticsHubView, AnalyticsReportView, sales_report_view, visual_report_view
+from .views import (
+    DashboardStatsView, AnalyticsHubView, AnalyticsReportView, sales_report_view, visual_report_view,
+    report_job_view, report_job_status, report_job_download,
+)
 
 urlpatterns = [
     path('analytics/dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
     path('charts/', AnalyticsHubView.as_view(), name='admin-charts'),
     path('reports/sales/', sales_report_view, name='sales_report'),
     path('reports/visual/', visual_report_view, name='visual_report'),
+    path('reports/jobs/<uuid:job_id>/', report_job_view, name='report_job'),
+    path('reports/jobs/<uuid:job_id>/status/', report_job_status, name='report_job_status'),
+    path('reports/jobs/<uuid:job_id>/download/', report_job_download, name='report_job_download'),
     path('reports/<str:report_type>/', AnalyticsReportView.as_view(), name='analytics-report'),
 ]
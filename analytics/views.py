@@ -3,37 +3,37 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from rest_framework import status, renderers
 from rest_framework.authentication import SessionAuthentication
-from django.db.models import Sum, Count, F
-from django.db.models.functions import TruncMonth, TruncDay
-from django.utils.timezone import now
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils.timezone import now, localdate
 from datetime import timedelta
 from orders.models import Order
 from users.models import User
 from products.models import Product
 import json
 from django.core.serializers.json import DjangoJSONEncoder
-import matplotlib
-matplotlib.use('Agg') # Set backend to non-interactive
-import matplotlib.pyplot as plt
-import io
-import base64
 from django.db import connection
-from django.shortcuts import render
-from django.http import HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, JsonResponse, FileResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_date
 from django.contrib.admin.views.decorators import staff_member_required
 import os
-from django.template.loader import render_to_string
-from weasyprint import HTML, CSS
 from .forms import SalesReportForm
-from orders.models import OrderItem
+from .rollups import order_rollups, product_rollups
+from .models import ReportJob
+from .report_jobs import submit_job
+from .report_data import sales_report_items
+from .exports import csv_response, xlsx_response
 
 class DashboardStatsView(APIView):
     authentication_classes = [SessionAuthentication]
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        total_sales = Order.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-        total_orders = Order.objects.count()
+        totals = order_rollups().aggregate(total=Sum('revenue'), orders=Sum('order_count'))
+        total_sales = totals['total'] or 0
+        total_orders = totals['orders'] or 0
         total_users = User.objects.count()
         low_stock_products = Product.objects.filter(stock__lt=10).count()
 
@@ -72,10 +72,13 @@ class AnalyticsReportView(APIView):
         branch_id = request.GET.get('branch', 'all')
         branches = Branch.objects.all().values('id', 'name')
         
-        # Base Querysets
+        # Base Querysets (report figures come from the daily rollups, see analytics.rollups)
+        selected_branch = None if branch_id == 'all' else branch_id
         orders = Order.objects.all()
-        if branch_id != 'all':
-            orders = orders.filter(branch_id=branch_id)
+        if selected_branch is not None:
+            orders = orders.filter(branch_id=selected_branch)
+        daily_orders = order_rollups(selected_branch)
+        daily_products = product_rollups(selected_branch)
             
         data = {}
         chart_type = 'bar' # Default
@@ -87,31 +90,29 @@ class AnalyticsReportView(APIView):
         
         if report_type == 'daily_sales':
             title = "Daily Sales (Last 30 Days)"
-            thirty_days_ago = now() - timedelta(days=30)
-            daily = orders.filter(created_at__gte=thirty_days_ago).annotate(
-                day=TruncDay('created_at')
-            ).values('day').annotate(total=Sum('total_amount')).order_by('day')
+            thirty_days_ago = localdate() - timedelta(days=30)
+            daily = daily_orders.filter(day__gte=thirty_days_ago).values('day').annotate(
+                total=Sum('revenue'), orders=Sum('order_count')
+            ).filter(orders__gt=0).order_by('day')
             
             data = [{'day': x['day'].strftime('%Y-%m-%d'), 'total': float(x['total'])} for x in daily]
             chart_type = 'line'
 
         elif report_type == 'monthly_sales':
             title = "Monthly Sales (Last 6 Months)"
-            six_months_ago = now() - timedelta(days=180)
-            monthly = orders.filter(created_at__gte=six_months_ago).annotate(
-                period=TruncMonth('created_at')
-            ).values('period').annotate(total=Sum('total_amount')).order_by('period')
+            six_months_ago = localdate() - timedelta(days=180)
+            monthly = daily_orders.filter(day__gte=six_months_ago).annotate(
+                period=TruncMonth('day')
+            ).values('period').annotate(
+                total=Sum('revenue'), orders=Sum('order_count')
+            ).filter(orders__gt=0).order_by('period')
             
             data = [{'period': x['period'].strftime('%Y-%m'), 'total': float(x['total'])} for x in monthly]
             chart_type = 'line'
 
         elif report_type == 'top_customers':
             title = "Top 10 Customers"
-            # Annotate manually because we need to filter orders inside the annotation
-            # Standard annotation User.objects.annotate(sum=Sum('orders__total')) doesn't respect external filter easily without Subquery
-            # Simplest for this scale: ID list approach or filtering
-            
-            # Better approach: Filter Order first, then aggregate by User
+            # Per-customer figures are not rolled up, aggregate the (filtered) orders directly
             top_users = orders.values('user__email').annotate(
                 total_spent=Sum('total_amount')
             ).order_by('-total_spent')[:10]
@@ -120,26 +121,25 @@ class AnalyticsReportView(APIView):
 
         elif report_type == 'top_products':
             title = "Top 10 Selling Products"
-            # Filter OrderItems by the filtered orders
-            top_prods = Order.objects.filter(id__in=orders.values('id')).values('items__product__name').annotate(
-                count=Sum('items__quantity')
-            ).order_by('-count')[:10]
+            top_prods = daily_products.values('product__name').annotate(
+                count=Sum('units')
+            ).filter(count__gt=0).order_by('-count')[:10]
             
             # Cleaning up the key name
-            data = [{'name': x['items__product__name'], 'count': x['count']} for x in top_prods]
+            data = [{'name': x['product__name'], 'count': x['count']} for x in top_prods]
 
         elif report_type == 'top_categories': # NEW
             title = "Top Selling Categories"
-            top_cats = Order.objects.filter(id__in=orders.values('id')).values('items__product__category__name').annotate(
-                count=Sum('items__quantity')
-            ).order_by('-count')[:10]
+            top_cats = daily_products.values('category__name').annotate(
+                count=Sum('units')
+            ).filter(count__gt=0).order_by('-count')[:10]
             
-            data = [{'name': x['items__product__category__name'], 'count': x['count']} for x in top_cats]
+            data = [{'name': x['category__name'], 'count': x['count']} for x in top_cats]
             chart_type = 'pie'
 
         elif report_type == 'order_status':
             title = "Order Status Ratio"
-            status_counts = orders.values('status').annotate(count=Count('id'))
+            status_counts = daily_orders.values('status').annotate(count=Sum('order_count')).filter(count__gt=0).order_by('status')
             data = list(status_counts)
             chart_type = 'doughnut'
 
@@ -147,7 +147,9 @@ class AnalyticsReportView(APIView):
             title = "Orders per Branch"
             # For this report, 'all' branch filter doesn't make sense if we want to compare branches
             # But if user selects a branch, we show only that branch's bar? Yes.
-            branch_counts = orders.exclude(branch__isnull=True).values('branch__name').annotate(count=Count('id')).order_by('-count')
+            branch_counts = daily_orders.exclude(branch__isnull=True).values('branch__name').annotate(
+                count=Sum('order_count')
+            ).filter(count__gt=0).order_by('-count')
             data = list(branch_counts)
 
         context = {
@@ -163,67 +165,40 @@ class AnalyticsReportView(APIView):
 
 
 
+def _job_params(**params):
+    # JSON friendly: dates as ISO strings, model instances as their pk
+    return {
+        key: value.isoformat() if hasattr(value, 'isoformat') else getattr(value, 'pk', value)
+        for key, value in params.items()
+    }
+
+
 @staff_member_required
 def sales_report_view(request):
     if request.method == 'POST':
         form = SalesReportForm(request.POST)
         if form.is_valid():
-            # Get cleaned data
-            branch = form.cleaned_data.get('branch')
-            category = form.cleaned_data.get('category')
-            product = form.cleaned_data.get('product')
-            start_date = form.cleaned_data.get('start_date')
-            end_date = form.cleaned_data.get('end_date')
-
-            # Build Query
-            items = OrderItem.objects.filter(
-                order__created_at__date__gte=start_date,
-                order__created_at__date__lte=end_date
-            ).exclude(
-                product__isnull=True
-            ).select_related('order', 'product', 'order__branch', 'product__category').annotate(
-                total_price=F('quantity') * F('price_at_purchase')
-            )
-
-            if branch:
-                items = items.filter(order__branch=branch)
-            if category:
-                items = items.filter(product__category=category)
-            if product:
-                items = items.filter(product=product)
-
-            # Calculate Grand Total
-            total_revenue = items.aggregate(
-                total=Sum(F('quantity') * F('price_at_purchase'))
-            )['total'] or 0
-
-            # Generate PDF via WeasyPrint
-            template_path = 'analytics/pdf_template.html'
-            context = {
-                'items': items,
-                'start_date': start_date,
-                'end_date': end_date,
-                'branch': branch if branch else "All Branches",
-                'category': category if category else "All Categories",
-                'product': product if product else "All Products",
-                'total_revenue': total_revenue,
-            }
-            
-            html_string = render_to_string(template_path, context)
-
-            response = HttpResponse(content_type='application/pdf')
-            timestamp = now().strftime("%Y%m%d_%H%M%S")
-            filename = f"sales_report_{timestamp}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            # Anti-caching headers for IDM/Browsers
-            response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-            response['Pragma'] = 'no-cache'
-            response['Expires'] = '0'
-            
-            HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf(response)
-            
-            return response
+            export_format = form.cleaned_data.get('export_format')
+            if export_format in ('csv', 'xlsx'):
+                # Spreadsheets are streamed straight away, see analytics.exports
+                items = sales_report_items(
+                    form.cleaned_data.get('start_date'), form.cleaned_data.get('end_date'),
+                    form.cleaned_data.get('branch'), form.cleaned_data.get('category'), form.cleaned_data.get('product'),
+                )
+                filename = f"sales_report_{now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+                if export_format == 'csv':
+                    return csv_response(items, filename)
+                return xlsx_response(items, filename)
+
+            # The PDF is rendered by the report worker, see analytics.report_jobs
+            job = submit_job('sales', _job_params(
+                start_date=form.cleaned_data.get('start_date'),
+                end_date=form.cleaned_data.get('end_date'),
+                branch=form.cleaned_data.get('branch'),
+                category=form.cleaned_data.get('category'),
+                product=form.cleaned_data.get('product'),
+            ), user=request.user, base_url=request.build_absolute_uri('/'))
+            return redirect('report_job', job_id=job.id)
     else:
         form = SalesReportForm()
 
@@ -232,166 +207,40 @@ def sales_report_view(request):
 @staff_member_required
 def visual_report_view(request):
     if request.method == 'POST':
-        start_date = request.POST.get('start_date')
-        end_date = request.POST.get('end_date')
-        
-        # --- Common Filters ---
-        orders = Order.objects.filter(created_at__date__gte=start_date, created_at__date__lte=end_date)
-        order_items = OrderItem.objects.filter(order__in=orders)
-
-        # Helper to generate base64 plot
-        def get_plot_url():
-            img = io.BytesIO()
-            plt.savefig(img, format='png', bbox_inches='tight')
-            img.seek(0)
-            plot_url = base64.b64encode(img.getvalue()).decode()
-            plt.close()
-            return f"data:image/png;base64,{plot_url}"
-
-        # ==========================================
-        # SECTION 1: BRANCH ANALYSIS
-        # ==========================================
-        # 1a. Branch by Orders
-        branch_data_orders = orders.exclude(branch__isnull=True).values('branch__name').annotate(
-            total_orders=Count('id'),
-            total_revenue=Sum('total_amount')
-        ).order_by('-total_orders')
-
-        # 1b. Branch by Revenue
-        branch_data_revenue = orders.exclude(branch__isnull=True).values('branch__name').annotate(
-            total_orders=Count('id'),
-            total_revenue=Sum('total_amount')
-        ).order_by('-total_revenue')
-        
-        # 1a. Branch Orders Chart
-        plt.figure(figsize=(10, 6))
-        # Use reversed lists so the highest value is at the top
-        plt.barh([x['branch__name'] for x in branch_data_orders][::-1], [x['total_orders'] for x in branch_data_orders][::-1], color='#1abc9c')
-        plt.title('Orders per Branch')
-        plt.xlabel('Number of Orders')
-        plt.tight_layout()
-        branch_orders_chart = get_plot_url()
-
-        # 1b. Branch Revenue Chart
-        plt.figure(figsize=(10, 6))
-        plt.barh([x['branch__name'] for x in branch_data_revenue][::-1], [x['total_revenue'] for x in branch_data_revenue][::-1], color='#3498db')
-        plt.title('Revenue per Branch')
-        plt.xlabel('Revenue (PKR)')
-        plt.tight_layout()
-        branch_revenue_chart = get_plot_url()
-
-        # ==========================================
-        # SECTION 2: CATEGORY ANALYSIS
-        # ==========================================
-        # 2a. Category by Orders
-        category_data_orders = order_items.values('product__category__name').annotate(
-            total_orders=Count('id'), 
-            total_revenue=Sum(F('quantity') * F('price_at_purchase'))
-        ).order_by('-total_orders')
-
-        # 2b. Category by Revenue
-        category_data_revenue = order_items.values('product__category__name').annotate(
-            total_orders=Count('id'), 
-            total_revenue=Sum(F('quantity') * F('price_at_purchase'))
-        ).order_by('-total_revenue')
-
-        # 2a. Category Orders Chart
-        plt.figure(figsize=(8, 6))
-        plt.pie([x['total_orders'] for x in category_data_orders], labels=[x['product__category__name'] for x in category_data_orders], autopct='%1.1f%%', startangle=140, colors=plt.cm.Set3.colors)
-        plt.title('Sales Volume per Category')
-        plt.tight_layout()
-        category_orders_chart = get_plot_url()
-
-        # 2b. Category Revenue Chart
-        plt.figure(figsize=(8, 6))
-        plt.pie([x['total_revenue'] for x in category_data_revenue], labels=[x['product__category__name'] for x in category_data_revenue], autopct='%1.1f%%', startangle=140, colors=plt.cm.Set3.colors)
-        plt.title('Revenue per Category')
-        plt.tight_layout()
-        category_revenue_chart = get_plot_url()
-
-        # ==========================================
-        # SECTION 3: TOP PRODUCTS
-        # ==========================================
-        # 3a. Top Products by Quantity
-        top_products_qty = order_items.values('product__name').annotate(
-            qty_sold=Sum('quantity'),
-            revenue=Sum(F('quantity') * F('price_at_purchase'))
-        ).order_by('-qty_sold')[:10]
-
-        # 3b. Top Products by Revenue
-        top_products_revenue = order_items.values('product__name').annotate(
-            qty_sold=Sum('quantity'),
-            revenue=Sum(F('quantity') * F('price_at_purchase'))
-        ).order_by('-revenue')[:10]
-
-        # Chart 3a: Qty
-        plt.figure(figsize=(10, 6))
-        plt.barh([x['product__name'] for x in top_products_qty][::-1], [x['qty_sold'] for x in top_products_qty][::-1], color='#f39c12')
-        plt.title('Top 10 Products (Quantity Sold)')
-        plt.xlabel('Quantity')
-        plt.tight_layout()
-        product_qty_chart = get_plot_url()
-
-        # Chart 3b: Revenue
-        plt.figure(figsize=(10, 6))
-        plt.barh([x['product__name'] for x in top_products_revenue][::-1], [x['revenue'] for x in top_products_revenue][::-1], color='#2ecc71')
-        plt.title('Top 10 Products (Revenue Generated)')
-        plt.xlabel('Revenue')
-        plt.tight_layout()
-        product_revenue_chart = get_plot_url()
-
-        # ==========================================
-        # SECTION 4: TRENDS
-        # ==========================================
-        # 4a. Overall Sales Trend
-        daily_sales = orders.annotate(day=TruncDay('created_at')).values('day').annotate(
-            daily_revenue=Sum('total_amount')
-        ).order_by('day')
-        
-        dates = [x['day'].strftime('%Y-%m-%d') for x in daily_sales]
-        revenues = [x['daily_revenue'] for x in daily_sales]
-
-        plt.figure(figsize=(12, 6))
-        plt.plot(dates, revenues, marker='o', linestyle='-', color='#8e44ad', linewidth=2)
-        plt.fill_between(dates, revenues, color='#8e44ad', alpha=0.3)
-        plt.title('Daily Sales Trend')
-        plt.xlabel('Date')
-        plt.ylabel('Revenue')
-        plt.xticks(rotation=45)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        overall_trend_chart = get_plot_url()
+        start_date = parse_date(request.POST.get('start_date') or '')
+        end_date = parse_date(request.POST.get('end_date') or '')
+        if not start_date or not end_date:
+            return HttpResponse("Valid start_date and end_date are required", status=400)
 
-        context = {
-            'start_date': start_date,
-            'end_date': end_date,
-            'branch_data_orders': branch_data_orders,
-            'branch_data_revenue': branch_data_revenue,
-            'branch_orders_chart': branch_orders_chart,
-            'branch_revenue_chart': branch_revenue_chart,
-            'category_data_orders': category_data_orders,
-            'category_data_revenue': category_data_revenue,
-            'category_orders_chart': category_orders_chart,
-            'category_revenue_chart': category_revenue_chart,
-            'top_products_qty': top_products_qty,
-            'top_products_revenue': top_products_revenue,
-            'product_qty_chart': product_qty_chart,
-            'product_revenue_chart': product_revenue_chart,
-            'overall_trend_chart': overall_trend_chart,
-        }
+        job = submit_job('visual', _job_params(start_date=start_date, end_date=end_date),
+                         user=request.user, base_url=request.build_absolute_uri('/'))
+        return redirect('report_job', job_id=job.id)
 
-        # Generate PDF
-        html_string = render_to_string('analytics/visual_report.html', context)
-        response = HttpResponse(content_type='application/pdf')
-        filename = f"Visual_Report_{now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Anti-caching headers for IDM/Browsers
-        response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
+    return HttpResponse("Method not allowed", status=405)
 
-        HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf(response)
-        return response
+@staff_member_required
+def report_job_view(request, job_id):
+    job = get_object_or_404(ReportJob, pk=job_id)
+    return render(request, 'analytics/report_job.html', {'job': job, 'title': job.get_kind_display()})
 
-    return HttpResponse("Method not allowed", status=405)
+@staff_member_required
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, pk=job_id)
+    return JsonResponse({
+        'id': str(job.id),
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'download_url': reverse('report_job_download', args=[job.id]) if job.status == 'done' else None,
+    })
+
+@staff_member_required
+def report_job_download(request, job_id):
+    job = get_object_or_404(ReportJob, pk=job_id, status='done')
+    response = FileResponse(job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name),
+                            content_type='application/pdf')
+    # Anti-caching headers for IDM/Browsers
+    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    response['Pragma'] = 'no-cache'
+    response['Expires'] = '0'
+    return response
@@ -1,8 +1,17 @@
 from django.contrib import admin
-from .models import Branch
+from .models import Branch, BranchStock
 
 @admin.register(Branch)
 class BranchAdmin(admin.ModelAdmin):
     list_display = ('name', 'phone', 'latitude', 'longitude', 'is_active')
     search_fields = ('name', 'address')
     list_editable = ('is_active',)
+
+@admin.register(BranchStock)
+class BranchStockAdmin(admin.ModelAdmin):
+    list_display = ('product', 'branch', 'quantity', 'updated_at')
+    list_filter = ('branch',)
+    search_fields = ('product__name',)
+    list_select_related = ('product', 'branch')
+    raw_id_fields = ('product',)
+    list_editable = ('quantity',)
@@ -0,0 +1,95 @@
+"""
+In-process nearest-branch lookups.
+
+Active branches are kept as a NumPy array of unit vectors (plus their
+serialized data), so a lookup is one vectorized dot product over all
+branches and an argpartition for the top k, with no database query.
+
+The index is built on first use and dropped when a Branch is saved or
+deleted (branches.signals); other processes see the bumped shared version
+and rebuild on their next lookup.
+"""
+import threading
+import numpy as np
+from django.core.cache import cache
+from .models import Branch
+from .serializers import BranchSerializer
+
+VERSION_CACHE_KEY = 'branches:geo_version'
+EARTH_RADIUS_KM = 6371
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from (lat, lon) to each of lats/lons (arrays)."""
+    points = _unit_vectors(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+    return _distances(_unit_vectors(lat, lon), points)
+
+
+def _distances(origin, points):
+    # Chord length between unit vectors -> arc length; stable for short distances unlike acos(dot)
+    chord = np.linalg.norm(points - origin, axis=-1)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+class BranchIndex:
+    def __init__(self, branches):
+        self.data = []
+        for branch in branches:
+            branch_data = BranchSerializer(branch).data
+            branch_data['google_maps_url'] = f"https://www.google.com/maps/dir/?api=1&destination={branch.latitude},{branch.longitude}"
+            self.data.append(branch_data)
+        self.points = _unit_vectors(
+            np.array([branch.latitude for branch in branches], dtype=float),
+            np.array([branch.longitude for branch in branches], dtype=float),
+        ).reshape(-1, 3)
+
+    @classmethod
+    def build(cls):
+        return cls(list(Branch.objects.filter(is_active=True).order_by('id')))
+
+    def __len__(self):
+        return len(self.data)
+
+    def nearest(self, lat, lon, limit=None, radius_km=None):
+        """[(branch data, distance_km), ...] nearest first, at most `limit`, within `radius_km`."""
+        distances = _distances(_unit_vectors(lat, lon), self.points)
+        candidates = np.arange(len(distances))
+        if radius_km is not None:
+            candidates = candidates[distances <= radius_km]
+        if limit is not None and limit < len(candidates):
+            # Top k without sorting everything
+            candidates = candidates[np.argpartition(distances[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(distances[candidates], kind='stable')]
+        return [(self.data[i], float(distances[i])) for i in candidates]
+
+
+_index = None
+_index_version = None
+_build_lock = threading.Lock()
+
+
+def get_index():
+    global _index, _index_version
+    version = cache.get(VERSION_CACHE_KEY, 0)
+    if _index is None or version != _index_version:
+        with _build_lock:
+            if _index is None or version != _index_version:
+                _index = BranchIndex.build()
+                _index_version = version
+    return _index
+
+
+def invalidate():
+    """Drop this process's index and tell the other processes theirs is stale."""
+    global _index
+    _index = None
+    if not cache.add(VERSION_CACHE_KEY, 1, None):
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            pass
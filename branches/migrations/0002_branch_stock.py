@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('products', '0006_product_import_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='branches.branch')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='branch_stock', to='products.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Branch stock',
+                'indexes': [models.Index(fields=['product', 'branch', 'quantity'], name='branch_stock_product_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'product'), name='branch_stock_unique')],
+            },
+        ),
+    ]
@@ -15,3 +15,34 @@ class Branch(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class BranchStock(models.Model):
+    """
+    Units of a product on hand at a branch. Orders placed for a branch take
+    stock from here as well as from Product.stock (see orders.stock).
+    A product with no row at a branch has none there.
+
+    Branches start without rows and keep filling orders from Product.stock
+    alone until their stock is loaded (admin or import); from their first
+    row on, every order for the branch must be covered here too. Load a
+    branch's full stock in one go so a partial load does not turn away orders
+    for the products not entered yet.
+    """
+    branch = models.ForeignKey(Branch, related_name='stock', on_delete=models.CASCADE)
+    product = models.ForeignKey('products.Product', related_name='branch_stock', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Branch stock"
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'product'], name='branch_stock_unique'),
+        ]
+        indexes = [
+            # Cart availability: product first, answered from the index alone
+            models.Index(fields=['product', 'branch', 'quantity'], name='branch_stock_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} @ {self.branch}: {self.quantity}"
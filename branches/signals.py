@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Branch
+from . import geo
+
+
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def invalidate_geo_index(sender, **kwargs):
+    # Now and again on commit, so an index rebuilt mid-transaction is not kept
+    geo.invalidate()
+    transaction.on_commit(geo.invalidate)
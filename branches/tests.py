@@ -0,0 +1,69 @@
+import math
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Branch
+from . import geo
+
+
+def reference_haversine(lat1, lon1, lat2, lon2):
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = math.sin(d_lat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+class NearestBranchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        geo.invalidate()
+        self.url = reverse('nearest-branch')
+        self.origin = {'lat': 33.6844, 'long': 73.0479}
+        for name, lat, lon in [
+            ('Blue Area', 33.7104, 73.0601),
+            ('Saddar', 33.5973, 73.0479),
+            ('Lahore', 31.5204, 74.3587),
+            ('Karachi', 24.8607, 67.0011),
+        ]:
+            Branch.objects.create(name=name, address='-', phone='-', latitude=lat, longitude=lon)
+        Branch.objects.create(name='Closed', address='-', phone='-', latitude=33.6844, longitude=73.0479, is_active=False)
+
+    def test_sorted_by_distance(self):
+        response = self.client.get(self.url, self.origin)
+        self.assertEqual([b['name'] for b in response.data], ['Blue Area', 'Saddar', 'Lahore', 'Karachi'])
+        for branch in response.data:
+            expected = reference_haversine(33.6844, 73.0479, branch['latitude'], branch['longitude'])
+            self.assertAlmostEqual(branch['distance_km'], round(expected, 2), delta=0.01)
+            self.assertIn('google_maps_url', branch)
+
+    def test_limit_and_radius(self):
+        response = self.client.get(self.url, {**self.origin, 'limit': 2})
+        self.assertEqual([b['name'] for b in response.data], ['Blue Area', 'Saddar'])
+        response = self.client.get(self.url, {**self.origin, 'radius': 300})
+        self.assertEqual([b['name'] for b in response.data], ['Blue Area', 'Saddar', 'Lahore'])
+        response = self.client.get(self.url, {**self.origin, 'radius': 1})
+        self.assertEqual(response.data, [])
+        for bad in [{'limit': 0}, {'limit': 'x'}, {'radius': '-1'}]:
+            self.assertEqual(self.client.get(self.url, {**self.origin, **bad}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_is_cached_until_a_branch_changes(self):
+        self.client.get(self.url, self.origin)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, self.origin)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        nearby = Branch.objects.create(name='F-7', address='-', phone='-', latitude=33.6845, longitude=73.0480)
+        response = self.client.get(self.url, {**self.origin, 'limit': 1})
+        self.assertEqual(response.data[0]['name'], 'F-7')
+
+        nearby.is_active = False
+        nearby.save()
+        response = self.client.get(self.url, {**self.origin, 'limit': 1})
+        self.assertEqual(response.data[0]['name'], 'Blue Area')
+
+    def test_no_branches(self):
+        Branch.objects.all().delete()
+        self.assertEqual(self.client.get(self.url, self.origin).status_code, status.HTTP_404_NOT_FOUND)
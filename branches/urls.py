@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BranchViewSet, NearestBranchView
+from .views import BranchViewSet, NearestBranchView, BranchAvailabilityView
 
 router = DefaultRouter()
 router.register(r'branches', BranchViewSet, basename='branch')
 
 urlpatterns = [
     path('branches/nearest/', NearestBranchView.as_view(), name='nearest-branch'),
+    path('branches/availability/', BranchAvailabilityView.as_view(), name='branch-availability'),
     path('', include(router.urls)),
 ]
@@ -2,14 +2,16 @@ from rest_framework import viewsets, generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticatedOrReadOnly
-import math
 from .models import Branch
 from .serializers import BranchSerializer
+from . import geo
+from orders.stock import branches_with_stock, merge_quantities
 
 class BranchViewSet(viewsets.ModelViewSet):
     queryset = Branch.objects.filter(is_active=True)
     serializer_class = BranchSerializer
     permission_classes = [IsAuthenticatedOrReadOnly] # Admin can edit, others read
+    pagination_class = None # Small reference list without created_at, returned whole
 
     def get_permissions(self):
          if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -17,6 +19,10 @@ class BranchViewSet(viewsets.ModelViewSet):
          return [AllowAny()]
 
 class NearestBranchView(APIView):
+    """
+    Active branches nearest first, from the in-process index (branches.geo).
+    Optional `limit` (top k) and `radius` (km).
+    """
     permission_classes = [AllowAny]
 
     def get(self, request):
@@ -25,44 +31,63 @@ class NearestBranchView(APIView):
             user_long = float(request.query_params.get('long'))
         except (TypeError, ValueError):
             return Response({"error": "Invalid or missing 'lat' and 'long' parameters."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = request.query_params.get('limit')
+            limit = int(limit) if limit else None
+            radius = request.query_params.get('radius')
+            radius = float(radius) if radius else None
+            if (limit is not None and limit < 1) or (radius is not None and not radius >= 0):
+                raise ValueError
+        except ValueError:
+            return Response({"error": "'limit' must be a positive integer and 'radius' a distance in km."}, status=status.HTTP_400_BAD_REQUEST)
 
-        branches = Branch.objects.filter(is_active=True)
-        if not branches.exists():
+        index = geo.get_index()
+        if not len(index):
             return Response({"error": "No branches found."}, status=status.HTTP_404_NOT_FOUND)
 
-        branch_distances = []
-        for branch in branches:
-            dist = self.haversine(user_lat, user_long, branch.latitude, branch.longitude)
-            branch_distances.append((branch, dist))
+        data = [
+            {**branch_data, 'distance_km': round(dist, 2)}
+            for branch_data, dist in index.nearest(user_lat, user_long, limit=limit, radius_km=radius)
+        ]
+        return Response(data, status=status.HTTP_200_OK)
+
+class BranchAvailabilityView(APIView):
+    """
+    Branches that can fill the whole cart:
+    ?items=<product_id>:<qty>,<product_id>:<qty>[&lat=..&long=..]
+    Nearest first when a location is given.
+    """
+    permission_classes = [AllowAny]
 
-        # Sort by distance
-        branch_distances.sort(key=lambda x: x[1])
+    def get(self, request):
+        try:
+            quantities = merge_quantities(
+                item.split(':', 1) if ':' in item else (item, 1)
+                for item in request.query_params.get('items', '').split(',') if item.strip()
+            )
+        except ValueError:
+            return Response({"error": "'items' must look like 12:2,15:1 (product_id:quantity)."}, status=status.HTTP_400_BAD_REQUEST)
+        if not quantities:
+            return Response({"error": "Missing 'items' parameter."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get all sorted branches
-        sorted_branches = branch_distances
+        location = None
+        if 'lat' in request.query_params or 'long' in request.query_params:
+            try:
+                location = (float(request.query_params.get('lat')), float(request.query_params.get('long')))
+            except (TypeError, ValueError):
+                return Response({"error": "Invalid 'lat' and 'long' parameters."}, status=status.HTTP_400_BAD_REQUEST)
 
+        branches = list(branches_with_stock(quantities).order_by('name', 'id'))
         data = []
-        for branch, dist in sorted_branches:
-            serializer = BranchSerializer(branch)
-            branch_data = serializer.data
-            branch_data['distance_km'] = round(dist, 2)
-            # Add Google Maps Navigation URL for convenience
+        for branch in branches:
+            branch_data = BranchSerializer(branch).data
             branch_data['google_maps_url'] = f"https://www.google.com/maps/dir/?api=1&destination={branch.latitude},{branch.longitude}"
             data.append(branch_data)
-            
+        if location is not None and branches:
+            distances = geo.haversine_km(
+                *location, [branch.latitude for branch in branches], [branch.longitude for branch in branches]
+            )
+            for branch_data, dist in zip(data, distances):
+                branch_data['distance_km'] = round(float(dist), 2)
+            data.sort(key=lambda branch_data: branch_data['distance_km'])
         return Response(data, status=status.HTTP_200_OK)
-
-    def haversine(self, lat1, lon1, lat2, lon2):
-        R = 6371  # Earth radius in kilometers
-
-        d_lat = math.radians(lat2 - lat1)
-        d_lon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(d_lat / 2) * math.sin(d_lat / 2) +
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-             math.sin(d_lon / 2) * math.sin(d_lon / 2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
-        
-        return distance
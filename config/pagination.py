@@ -0,0 +1,130 @@
+import json
+from functools import reduce
+from operator import or_
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, LimitOffsetPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the full ordering, newest first by default.
+
+    DRF's CursorPagination keys on the first ordering field plus an offset,
+    which breaks down when that field is not unique (e.g. `?ordering=price`).
+    Here the cursor holds the value of every ordering field and the id is
+    always appended as a tie-breaker, so the next page is
+        WHERE (a, id) < (:a, :id) ORDER BY a DESC, id DESC LIMIT n
+    (spelled out as OR'ed comparisons): an index range scan whose cost does
+    not grow with the table, and cursors stay stable while new rows are
+    inserted at the top (infinite scroll in the mobile app).
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip('-') == 'id' for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        self.position = self.decode_position(queryset.model, self.cursor)
+
+        # A previous page is read backwards from the cursor, then flipped
+        ordering = [_flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(_after(ordering, self.position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        return self.page
+
+    def decode_position(self, model, cursor):
+        if cursor is None or cursor.position is None:
+            return None
+        try:
+            values = json.loads(cursor.position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (ValueError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, obj, reverse):
+        if obj is None:
+            values = self.position
+        else:
+            values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        position = json.dumps([_plain(value) for value in values])
+        return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=position))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._link(self.page[-1] if self.page else None, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self._link(self.page[0] if self.page else None, reverse=True)
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _after(ordering, position):
+    """Rows strictly after `position` in `ordering`: a > x OR (a = x AND b > y) OR ..."""
+    clauses, equal = [], {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        clauses.append(Q(**equal, **{f'{name}__{lookup}': value}))
+        equal[name] = value
+    return reduce(or_, clauses)
+
+
+def _plain(value):
+    # Full precision: the next page compares against exactly this value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return str(value)
+
+
+class CreatedAtCursorPagination(KeysetCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class DateJoinedCursorPagination(KeysetCursorPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class SearchResultsPagination(LimitOffsetPagination):
+    """Offset pagination for relevance-ranked results, which have no stable keyset."""
+    default_limit = 20
+    max_limit = 100
@@ -7,7 +7,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -99,6 +103,42 @@ DATABASES = {
     }
 }
 
+# Shared by every worker process: cached documents (home feed, charts) and the
+# versions that tell other processes to rebuild their in-memory indexes
+# (autocomplete, branch locations) must be seen by all of them, which the
+# default per-process LocMemCache cannot do. Files work for every process on
+# this host (the SQLite database ties us to one); set REDIS_URL to use Redis
+# instead (needs redis-py).
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Tests clear the cache: give each test run its own throwaway directory so a
+# run never wipes the cache of the server (or Redis) on this machine. Still a
+# shared backend, as products.E001 requires.
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    TEST_CACHE_DIR = tempfile.mkdtemp(prefix='pharmacy-test-cache-')
+    atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': TEST_CACHE_DIR,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
 # Email Configuration (Gmail SMTP)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -161,6 +201,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.CreatedAtCursorPagination',
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle',
@@ -190,6 +231,39 @@ SIMPLE_JWT = {
 
 OTP_EXPIRATION_MINUTES = 10
 
+# Home feed cache (seconds). Invalidated on product/category/order changes.
+HOME_FEED_CACHE_TIMEOUT = 60 * 60
+
+# Max age (seconds) of the in-process autocomplete index before it is rebuilt
+AUTOCOMPLETE_MAX_AGE = 60 * 60
+
+# Push outbox (delivered by `manage.py send_pushes`)
+PUSH_TRANSPORT = 'notifications.push.FirebaseTransport'
+PUSH_MAX_ATTEMPTS = 5
+PUSH_RETRY_BASE_SECONDS = 30
+
+# Report charts (analytics.charts): 'png' or 'svg', resolution, render processes
+CHART_FORMAT = 'png'
+CHART_DPI = 100
+CHART_RENDER_WORKERS = 4
+CHART_CACHE_TIMEOUT = 60 * 60
+
+# Background PDF reports (rendered by `manage.py run_report_jobs` into MEDIA_ROOT/reports)
+REPORT_REUSE_SECONDS = 15 * 60  # identical requests get the finished file for this long
+REPORT_ARTIFACT_MAX_AGE = 24 * 60 * 60
+REPORT_ARTIFACT_MAX_BYTES = 500 * 1024 * 1024
+# Sales report PDFs: lines per printed page (each page gets an SQL subtotal; must fit
+# on one A4 page), and lines per separately laid out document (rounded down to whole
+# pages), rendered by this many processes (0: in process)
+SALES_REPORT_PAGE_ROWS = 15
+SALES_REPORT_CHUNK_ROWS = 500
+SALES_REPORT_RENDER_WORKERS = 2
+
+# Product bulk uploads larger than this are imported in the background
+# (`manage.py run_product_imports`), committed in chunks of PRODUCT_IMPORT_CHUNK_ROWS rows
+PRODUCT_IMPORT_SYNC_MAX_BYTES = 10 * 1024 * 1024
+PRODUCT_IMPORT_CHUNK_ROWS = 5000
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True # For dev only, change in prod
 
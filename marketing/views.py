@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAdminUser
 from .models import Banner
 from .serializers import BannerSerializer
+from notifications.push import enqueue_all_devices_push
 
 class BannerViewSet(viewsets.ModelViewSet):
     queryset = Banner.objects.filter(is_active=True).order_by('-created_at')
@@ -25,8 +26,12 @@ class SendNotificationView(APIView):
         if not title or not body:
              return Response({"error": "Title and Body required."}, status=status.HTTP_400_BAD_REQUEST)
              
-        # Placeholder for Firebase Logic
-        # 1. Get all FCM tokens from users (requires adding fcm_token field to User model)
-        # 2. Use firebase_admin to send multicast message
-        
-        return Response({"success": True, "message": f"Notification '{title}' queued for sending."}, status=status.HTTP_200_OK)
+        # The `send_pushes` worker multicasts it to every registered device,
+        # 500 tokens per FCM call, outside this request
+        push = enqueue_all_devices_push(title, body)
+
+        return Response({
+            "success": True,
+            "message": f"Notification '{title}' queued for sending.",
+            "push_id": push.id,
+        }, status=status.HTTP_202_ACCEPTED)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, BroadcastNotification
+from .models import Notification, BroadcastNotification, PushMessage
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -12,3 +12,9 @@ class BroadcastNotificationAdmin(admin.ModelAdmin):
     list_display = ('title', 'created_at')
     search_fields = ('title', 'body')
 
+
+@admin.register(PushMessage)
+class PushMessageAdmin(admin.ModelAdmin):
+    list_display = ('title', 'user', 'topic', 'all_devices', 'status', 'attempts', 'created_at', 'sent_at')
+    search_fields = ('title', 'user__email', 'last_error')
+    list_filter = ('status', 'created_at')
@@ -0,0 +1,80 @@
+"""
+Unread badge counters.
+
+Reading a badge is one primary-key lookup on UnreadCounter plus the cached
+number of broadcasts, instead of counting the notification table. Counters
+are adjusted with F() updates from notifications.signals. A user without a
+row yet gets one built from the real tables on first read (refresh_counter).
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import BroadcastNotification, BroadcastStatus, Notification, UnreadCounter
+
+BROADCAST_COUNT_CACHE_KEY = 'notifications:broadcast_count'
+# Bounds staleness in processes that miss the invalidation (per-process caches)
+BROADCAST_COUNT_TIMEOUT = 60
+
+
+def broadcast_count():
+    count = cache.get(BROADCAST_COUNT_CACHE_KEY)
+    if count is None:
+        count = BroadcastNotification.objects.count()
+        cache.set(BROADCAST_COUNT_CACHE_KEY, count, BROADCAST_COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_broadcast_count():
+    cache.delete(BROADCAST_COUNT_CACHE_KEY)
+
+
+def refresh_counter(user_id):
+    """Recount a user's unread notifications from scratch and store the result."""
+    values = {
+        'personal_unread': Notification.objects.filter(user_id=user_id, is_read=False).count(),
+        'broadcasts_handled': BroadcastStatus.objects.filter(user_id=user_id).exclude(
+            is_read=False, is_deleted=False
+        ).count(),
+    }
+    try:
+        with transaction.atomic():
+            counter, _ = UnreadCounter.objects.update_or_create(user_id=user_id, defaults=values)
+    except IntegrityError:
+        # Another first read inserted the row meanwhile (use theirs, it counted
+        # the same tables), or the user was deleted (None)
+        return UnreadCounter.objects.filter(user_id=user_id).first()
+    return counter
+
+
+def adjust_counter(user_id, personal=0, broadcasts_handled=0):
+    """
+    Apply a delta. Users without a counter are left alone: their first read
+    counts from scratch, which already includes this change.
+    """
+    if personal or broadcasts_handled:
+        UnreadCounter.objects.filter(user_id=user_id).update(
+            personal_unread=F('personal_unread') + personal,
+            broadcasts_handled=F('broadcasts_handled') + broadcasts_handled,
+        )
+
+
+def _total(counter):
+    return max(counter.personal_unread + broadcast_count() - counter.broadcasts_handled, 0)
+
+
+def get_unread_count(user):
+    """Badge number for a user (None = anonymous, who only sees broadcasts)."""
+    if user is None:
+        return broadcast_count()
+    counter = UnreadCounter.objects.filter(user_id=user.pk).first() or refresh_counter(user.pk)
+    return _total(counter) if counter else 0
+
+
+def get_unread_counts(user_ids):
+    """Badge numbers for several users with one query."""
+    counters = UnreadCounter.objects.in_bulk(list(user_ids))
+    counts = {}
+    for user_id in user_ids:
+        counter = counters.get(user_id) or refresh_counter(user_id)
+        counts[user_id] = _total(counter) if counter else 0
+    return counts
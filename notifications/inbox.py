@@ -0,0 +1,98 @@
+"""
+The notification inbox: personal notifications and broadcasts merged into a
+single timeline.
+
+Both sides are selected into the same columns and combined with UNION ALL,
+so the database does the merge, ordering and page cut:
+- personal rows come from the (user, -created_at, -id) index
+- broadcasts are LEFT JOINed with the user's BroadcastStatus (deleted ones
+  are dropped, missing status means unread) and get negative ids
+Pages are keyset based on (created_at, id), so each page costs about
+page_size rows no matter how many notifications a user has accumulated.
+"""
+import base64
+from django.db import connection
+from django.db.models import BooleanField, F, FilteredRelation, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from .models import Notification, BroadcastNotification
+
+COLUMNS = ('inbox_id', 'inbox_title', 'inbox_body', 'inbox_is_read', 'inbox_created_at')
+
+
+def _personal(user):
+    return Notification.objects.filter(user=user).annotate(
+        inbox_id=F('id'),
+        inbox_title=F('title'),
+        inbox_body=F('body'),
+        inbox_is_read=F('is_read'),
+        inbox_created_at=F('created_at'),
+    )
+
+
+def _broadcasts(user):
+    queryset = BroadcastNotification.objects.all()
+    if user is None:
+        is_read = Value(False, output_field=BooleanField())
+    else:
+        queryset = queryset.annotate(
+            status=FilteredRelation('broadcaststatus', condition=Q(broadcaststatus__user=user))
+        ).filter(Q(status__is_deleted__isnull=True) | Q(status__is_deleted=False))
+        is_read = Coalesce(F('status__is_read'), Value(False), output_field=BooleanField())
+    return queryset.annotate(
+        inbox_id=F('id') * -1, # Negative ID for broadcasts
+        inbox_title=F('title'),
+        inbox_body=F('body'),
+        inbox_is_read=is_read,
+        inbox_created_at=F('created_at'),
+    )
+
+
+def _before(queryset, cursor):
+    created_at, inbox_id = cursor
+    return queryset.filter(
+        Q(inbox_created_at__lt=created_at) | Q(inbox_created_at=created_at, inbox_id__lt=inbox_id)
+    )
+
+
+def timeline(user=None, cursor=None, limit=None):
+    """
+    Return inbox rows (dicts with id, title, body, is_read, created_at),
+    newest first, strictly after `cursor` = (created_at, id) if given.
+    Anonymous users (user=None) only see broadcasts.
+    """
+    parts = [_broadcasts(user)]
+    if user is not None:
+        parts.append(_personal(user))
+    if cursor is not None:
+        parts = [_before(part, cursor) for part in parts]
+    parts = [part.values_list(*COLUMNS).order_by() for part in parts]
+    if limit is not None and connection.features.supports_slicing_ordering_in_compound:
+        # Each side only needs its own first `limit` rows (cheap index scans)
+        parts = [part.order_by('-inbox_created_at', '-inbox_id')[:limit] for part in parts]
+
+    queryset = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    queryset = queryset.order_by('-inbox_created_at', '-inbox_id')
+    if limit is not None:
+        queryset = queryset[:limit]
+    return [
+        {'id': pk, 'title': title, 'body': body, 'is_read': bool(is_read), 'created_at': created_at}
+        for pk, title, body, is_read, created_at in queryset
+    ]
+
+
+def encode_cursor(row):
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(value):
+    """Returns (created_at, id); raises ValueError on a malformed cursor."""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if created_at is None:
+        raise ValueError("Invalid cursor")
+    return created_at, int(pk)
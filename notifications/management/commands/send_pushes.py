@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from notifications.push import process_outbox
+
+class Command(BaseCommand):
+    help = 'Delivers queued push notifications (runs until interrupted unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the due messages and exit')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                handled = process_outbox(batch_size=options['batch_size'], workers=options['workers'])
+                total += handled
+                if handled:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} push messages."))
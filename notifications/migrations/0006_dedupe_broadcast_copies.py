@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.db import migrations
+
+# Per-user copies were bulk_created right after the broadcast was saved
+COPY_WINDOW = timedelta(minutes=10)
+
+
+def dedupe_broadcast_copies(apps, schema_editor):
+    """
+    Broadcasts used to be copied into one Notification row per user.
+    Drop those copies (the broadcast itself is already merged into every
+    list) and keep their read state as BroadcastStatus rows.
+    """
+    Notification = apps.get_model('notifications', 'Notification')
+    BroadcastNotification = apps.get_model('notifications', 'BroadcastNotification')
+    BroadcastStatus = apps.get_model('notifications', 'BroadcastStatus')
+
+    for broadcast in BroadcastNotification.objects.order_by('id').iterator():
+        copies = Notification.objects.filter(
+            order__isnull=True,
+            title=broadcast.title,
+            body=broadcast.body,
+            created_at__gte=broadcast.created_at,
+            created_at__lt=broadcast.created_at + COPY_WINDOW,
+        )
+        read_by = set(copies.filter(is_read=True).values_list('user_id', flat=True))
+        if read_by:
+            BroadcastStatus.objects.filter(broadcast=broadcast, user_id__in=read_by).update(is_read=True)
+            BroadcastStatus.objects.bulk_create(
+                [BroadcastStatus(broadcast=broadcast, user_id=user_id, is_read=True) for user_id in read_by],
+                ignore_conflicts=True
+            )
+        copies.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_push_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_broadcast_copies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_dedupe_broadcast_copies'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['-created_at', '-id'], name='broadcast_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_unread_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushmessage',
+            name='all_devices',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_push_all_devices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushmessage',
+            name='pending_token_ranges',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
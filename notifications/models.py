@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Notification(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='notifications', on_delete=models.CASCADE)
@@ -9,11 +10,19 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Read state as last loaded/saved, used to keep UnreadCounter in sync (see notifications.signals)
+        self._loaded_is_read = self.__dict__.get('is_read')
+
     def __str__(self):
         return f"Notification for {self.user.email} - {self.title}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created_idx'),
+        ]
 
 class BroadcastNotification(models.Model):
     title = models.CharField(max_length=255)
@@ -26,6 +35,9 @@ class BroadcastNotification(models.Model):
     class Meta:
         verbose_name = "Broadcast Notification"
         verbose_name_plural = "Broadcast Notifications"
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='broadcast_created_idx'),
+        ]
 
 class BroadcastStatus(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -34,7 +46,75 @@ class BroadcastStatus(models.Model):
     is_deleted = models.BooleanField(default=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Whether the broadcast was read or deleted as last loaded/saved (None means unknown)
+        self._loaded_handled = self.handled if 'is_read' in self.__dict__ and 'is_deleted' in self.__dict__ else None
+
+    @property
+    def handled(self):
+        """Read or deleted broadcasts no longer count as unread."""
+        return self.is_read or self.is_deleted
+
     class Meta:
         unique_together = ('user', 'broadcast')
         verbose_name = "Broadcast Status"
         verbose_name_plural = "Broadcast Statuses"
+
+class PushMessage(models.Model):
+    """
+    Outbox of pending Firebase pushes.
+    Rows are written in the request (cheap insert) and delivered by the
+    `send_pushes` worker, so request latency never includes FCM round trips.
+    Either `user` (their current fcm_token is used at delivery) or `topic` is set,
+    or `all_devices` for a fan-out to every registered device (admin sends).
+    A fan-out that only partly went out keeps the [first, last] token ranges
+    still to send in `pending_token_ranges`, and its retry sends only those.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='push_messages')
+    topic = models.CharField(max_length=255, blank=True)
+    all_devices = models.BooleanField(default=False)
+    pending_token_ranges = models.JSONField(null=True, blank=True)
+    notification = models.ForeignKey(Notification, on_delete=models.SET_NULL, null=True, blank=True, related_name='push_messages')
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    provider_message_id = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Push {self.id} ({self.status}) - {self.title}"
+
+    class Meta:
+        verbose_name = "Push Message"
+        verbose_name_plural = "Push Messages"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='push_status_next_attempt_idx'),
+        ]
+
+class UnreadCounter(models.Model):
+    """
+    Denormalized unread badge for a user, kept in sync by notifications.signals.
+    Unread total = personal_unread + number of broadcasts - broadcasts_handled,
+    so a new broadcast does not have to touch every user's row.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    personal_unread = models.IntegerField(default=0)
+    broadcasts_handled = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Unread counter for user {self.user_id}"
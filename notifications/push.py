@@ -0,0 +1,409 @@
+"""
+Push delivery through the PushMessage outbox.
+
+enqueue_* functions only insert outbox rows. The `send_pushes` management
+command claims due rows in batches and hands them to the configured
+transport (settings.PUSH_TRANSPORT), then records the outcome: sent,
+retried later with exponential backoff, or failed.
+
+Sends are batched the way FCM allows: pushes with an identical payload go
+out as one multicast per 500 tokens, the rest through send_each in chunks
+of 500, and the chunks run concurrently. Dead tokens are cleared with a
+single UPDATE per batch.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import chain, islice
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from firebase_admin import messaging
+from .counters import get_unread_counts
+from .models import PushMessage
+
+logger = logging.getLogger(__name__)
+
+# A claimed row not finished within this window is assumed lost (worker died)
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+# FCM accepts at most 500 messages / tokens per send_each(_for_multicast) call
+FCM_BATCH_SIZE = 500
+
+
+class InvalidToken(Exception):
+    """The device token is dead; do not retry and forget the token."""
+
+
+class FirebaseTransport:
+    """
+    Both methods return one (message_id, exception) pair per message / token,
+    in order. Unregistered and mismatched tokens are reported as InvalidToken.
+    """
+    def send_each(self, messages):
+        return self._results(messaging.send_each(messages))
+
+    def send_multicast(self, multicast):
+        return self._results(messaging.send_each_for_multicast(multicast))
+
+    def _results(self, batch):
+        results = []
+        for response in batch.responses:
+            error = response.exception
+            if isinstance(error, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+                error = InvalidToken(str(error))
+            results.append((response.message_id, error))
+        return results
+
+
+class FakeTransport:
+    """
+    In-memory transport for tests and local development.
+    Delivered messages are collected in `FakeTransport.sent` (multicasts are
+    expanded to one Message per token) and every FCM call is recorded in
+    `calls` as (method, size). Tokens listed in `invalid_tokens` behave as
+    unregistered; the next `fail_next` calls fail as a whole.
+    """
+    sent = []
+    calls = []
+    invalid_tokens = set()
+    fail_next = 0
+
+    @classmethod
+    def reset(cls):
+        cls.sent = []
+        cls.calls = []
+        cls.invalid_tokens = set()
+        cls.fail_next = 0
+
+    def _check_call(self, method, size):
+        FakeTransport.calls.append((method, size))
+        if FakeTransport.fail_next > 0:
+            FakeTransport.fail_next -= 1
+            raise ConnectionError("Simulated FCM outage")
+
+    def _deliver(self, message):
+        if message.token and message.token in FakeTransport.invalid_tokens:
+            return None, InvalidToken("Simulated unregistered token")
+        FakeTransport.sent.append(message)
+        return f"fake-{len(FakeTransport.sent)}", None
+
+    def send_each(self, messages):
+        self._check_call('send_each', len(messages))
+        return [self._deliver(message) for message in messages]
+
+    def send_multicast(self, multicast):
+        self._check_call('send_multicast', len(multicast.tokens))
+        return [
+            self._deliver(messaging.Message(
+                notification=multicast.notification,
+                data=multicast.data,
+                android=multicast.android,
+                token=token,
+            ))
+            for token in multicast.tokens
+        ]
+
+
+def get_transport():
+    return import_string(getattr(settings, 'PUSH_TRANSPORT', 'notifications.push.FirebaseTransport'))()
+
+
+def enqueue_notification_push(notification):
+    data = {"click_action": "FLUTTER_NOTIFICATION_CLICK"}
+    # Dynamic Order Linking
+    if notification.order_id:
+        data["type"] = "order_update"
+        data["order_id"] = str(notification.order_id)
+    return PushMessage.objects.create(
+        user_id=notification.user_id,
+        notification=notification,
+        title=notification.title,
+        body=notification.body,
+        data=data,
+    )
+
+
+def enqueue_topic_push(topic, title, body, data=None):
+    return PushMessage.objects.create(topic=topic, title=title, body=body, data=data or {})
+
+
+def enqueue_all_devices_push(title, body, data=None):
+    """Queue one payload for every registered device; the worker does the fan-out (send_to_all_users)."""
+    return PushMessage.objects.create(all_devices=True, title=title, body=body, data=data or {})
+
+
+def _message_fields(title, body, data, click_action=True):
+    # Android-specific configuration shared by single and multicast messages
+    return {
+        'notification': messaging.Notification(title=title, body=body),
+        'data': data or None,
+        'android': messaging.AndroidConfig(
+            priority='high',
+            notification=messaging.AndroidNotification(
+                channel_id='high_importance_channel',
+                click_action='FLUTTER_NOTIFICATION_CLICK' if click_action else None,
+                icon='@mipmap/ic_launcher', # Correct Icon Name
+            ),
+        ),
+    }
+
+
+def _push_data(push):
+    data = dict(push.data)
+    if getattr(push, 'badge', None) is not None:
+        data["badge"] = str(push.badge)
+    return data
+
+
+def build_message(push, token=None):
+    return messaging.Message(
+        token=token,
+        topic=push.topic or None,
+        **_message_fields(push.title, push.body, _push_data(push), click_action=bool(push.user_id)),
+    )
+
+
+def build_multicast(push, tokens):
+    """One message for every token; all pushes sharing it have push's payload."""
+    return messaging.MulticastMessage(
+        tokens=list(tokens),
+        **_message_fields(push.title, push.body, _push_data(push)),
+    )
+
+
+def chunked(iterable, size=FCM_BATCH_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def run_concurrently(calls, workers):
+    """
+    Run (fn, args) pairs on a thread pool and return their results in order.
+    A call that raises yields the exception instead of a result.
+    """
+    def run(call):
+        fn, args = call
+        try:
+            return fn(*args)
+        except Exception as e:
+            return e
+
+    calls = list(calls)
+    if not calls:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(calls)))) as pool:
+        return list(pool.map(run, calls))
+
+
+def clear_tokens(tokens):
+    """Forget dead device tokens in a single UPDATE."""
+    tokens = {token for token in tokens if token}
+    if not tokens:
+        return 0
+    return get_user_model().objects.filter(fcm_token__in=tokens).update(fcm_token=None)
+
+
+def claim_batch(batch_size):
+    """Mark up to batch_size due messages as 'sending' and return them."""
+    now = timezone.now()
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', claimed_at__lt=now - CLAIM_TIMEOUT)
+    with transaction.atomic():
+        ids = list(
+            PushMessage.objects.select_for_update(skip_locked=True)
+            .filter(due).order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        PushMessage.objects.filter(id__in=ids).update(
+            status='sending', claimed_at=now, attempts=F('attempts') + 1
+        )
+    return list(PushMessage.objects.filter(id__in=ids).select_related('user').order_by('id'))
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'PUSH_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 60 * 60))
+
+
+def _plan_sends(pushes, transport):
+    """
+    Group sendable pushes into FCM calls: identical user payloads become
+    multicasts, everything else (topics, one-off payloads) goes via send_each.
+    Returns a list of (pushes, (fn, args)).
+    """
+    groups = {}
+    singles = []
+    for push in pushes:
+        if not push.user_id:
+            singles.append(push)
+            continue
+        key = (push.title, push.body, json.dumps(_push_data(push), sort_keys=True))
+        groups.setdefault(key, []).append(push)
+
+    plan = []
+    for group in groups.values():
+        if len(group) == 1:
+            singles.extend(group)
+            continue
+        for chunk in chunked(group):
+            multicast = build_multicast(chunk[0], [push.user.fcm_token for push in chunk])
+            plan.append((chunk, (transport.send_multicast, (multicast,))))
+    for chunk in chunked(singles):
+        messages = [build_message(push, token=push.user.fcm_token if push.user_id else None) for push in chunk]
+        plan.append((chunk, (transport.send_each, (messages,))))
+    return plan
+
+
+def deliver_batch(pushes, transport=None, workers=8):
+    """Send claimed pushes and persist their outcomes. Returns outcome counts."""
+    if not pushes:
+        return {}
+    transport = transport or get_transport()
+    badges = get_unread_counts({push.user_id for push in pushes if push.user_id})
+
+    outcomes = []  # (push, outcome, detail)
+    sendable = []
+    for push in pushes:
+        if push.all_devices:
+            # A retry only goes to the token ranges the previous attempt could not reach
+            try:
+                result, retry_ranges = _multicast(
+                    _device_tokens(push.pending_token_ranges), push, transport, workers
+                )
+            except Exception as e:
+                outcomes.append((push, 'error', str(e)))
+            else:
+                push.pending_token_ranges = retry_ranges or None
+                summary = ", ".join(f"{key}={value}" for key, value in result.items())
+                outcomes.append((push, 'error' if retry_ranges else 'sent', summary))
+            continue
+        if push.user_id:
+            if not push.user.fcm_token:
+                outcomes.append((push, 'skipped', "User has no FCM token"))
+                continue
+            push.badge = badges.get(push.user_id, 0)
+        sendable.append(push)
+
+    plan = _plan_sends(sendable, transport)
+    responses = run_concurrently([call for _, call in plan], workers)
+    for (chunk, _), response in zip(plan, responses):
+        if isinstance(response, Exception):
+            # The whole call failed (network, auth...), retry every message in it
+            response = [(None, response)] * len(chunk)
+        for push, (message_id, error) in zip(chunk, response):
+            if error is None:
+                outcomes.append((push, 'sent', message_id))
+            elif isinstance(error, InvalidToken):
+                outcomes.append((push, 'invalid_token', str(error)))
+            else:
+                outcomes.append((push, 'error', str(error)))
+
+    now = timezone.now()
+    max_attempts = getattr(settings, 'PUSH_MAX_ATTEMPTS', 5)
+    counts = {}
+    dead_tokens = set()
+    for push, outcome, detail in outcomes:
+        counts[outcome] = counts.get(outcome, 0) + 1
+        if outcome == 'sent':
+            push.status, push.sent_at, push.provider_message_id, push.last_error = 'sent', now, detail or '', ''
+        elif outcome in ('skipped', 'invalid_token'):
+            push.status, push.last_error = 'failed', detail
+            if outcome == 'invalid_token':
+                dead_tokens.add(push.user.fcm_token)
+        elif push.attempts >= max_attempts:
+            push.status, push.last_error = 'failed', detail
+        else:
+            push.status, push.last_error = 'pending', detail
+            push.next_attempt_at = now + retry_delay(push.attempts)
+        if outcome != 'sent':
+            logger.warning(f"Push {push.id} {outcome}: {detail}")
+
+    PushMessage.objects.bulk_update(
+        pushes, ['status', 'sent_at', 'provider_message_id', 'last_error', 'next_attempt_at', 'pending_token_ranges']
+    )
+    clear_tokens(dead_tokens)
+    return counts
+
+
+def process_outbox(batch_size=100, workers=8, transport=None):
+    """Claim and deliver one batch. Returns the number of messages handled."""
+    pushes = claim_batch(batch_size)
+    deliver_batch(pushes, transport=transport, workers=workers)
+    return len(pushes)
+
+
+def send_to_tokens(tokens, title, body, data=None, transport=None, workers=8):
+    """
+    Multicast one payload to any number of device tokens, 500 per FCM call,
+    with the calls running concurrently. Dead tokens are cleared afterwards.
+    Returns {"sent": n, "failed": n, "invalid_tokens": n}.
+    """
+    counts, _ = _multicast(tokens, PushMessage(title=title, body=body, data=data or {}), transport, workers)
+    return counts
+
+
+def _multicast(tokens, template, transport=None, workers=8):
+    """
+    Send template's payload to tokens (see send_to_tokens).
+    Returns (counts, retry_ranges): retry_ranges are [first, last] runs of
+    consecutive tokens whose call or delivery failed and may be retried.
+    """
+    transport = transport or get_transport()
+    chunks = list(chunked(tokens))
+    responses = run_concurrently(
+        [(transport.send_multicast, (build_multicast(template, chunk),)) for chunk in chunks], workers
+    )
+
+    counts = {"sent": 0, "failed": 0, "invalid_tokens": 0}
+    retry_ranges = []
+    dead_tokens = set()
+    for chunk, response in zip(chunks, responses):
+        if isinstance(response, Exception):
+            logger.error(f"Multicast of {len(chunk)} tokens failed: {response}")
+            counts["failed"] += len(chunk)
+            retry_ranges.append([chunk[0], chunk[-1]])
+            continue
+        run = None
+        for token, (message_id, error) in zip(chunk, response):
+            if error is None:
+                counts["sent"] += 1
+            elif isinstance(error, InvalidToken):
+                counts["invalid_tokens"] += 1
+                dead_tokens.add(token)
+            else:
+                counts["failed"] += 1
+                if run is None:
+                    run = [token, token]
+                    retry_ranges.append(run)
+                else:
+                    run[1] = token
+                continue
+            run = None
+    clear_tokens(dead_tokens)
+    return counts, retry_ranges
+
+
+def _device_tokens(ranges=None):
+    """Distinct registered tokens in token order, optionally only within [first, last] ranges."""
+    tokens = (
+        get_user_model().objects.filter(is_active=True, fcm_token__isnull=False)
+        .exclude(fcm_token='').values_list('fcm_token', flat=True).distinct().order_by('fcm_token')
+    )
+    if ranges is None:
+        return tokens.iterator(chunk_size=FCM_BATCH_SIZE)
+    return chain.from_iterable(
+        tokens.filter(fcm_token__range=(first, last)).iterator(chunk_size=FCM_BATCH_SIZE) for first, last in ranges
+    )
+
+
+def send_to_all_users(title, body, data=None, transport=None, workers=8):
+    """Push a payload to every user with a registered device."""
+    counts, _ = _multicast(
+        _device_tokens(), PushMessage(title=title, body=body, data=data or {}), transport, workers
+    )
+    return counts
@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from firebase_admin import messaging
-from .models import Notification, BroadcastNotification
+from .models import Notification, BroadcastNotification, BroadcastStatus
+from .push import enqueue_notification_push, enqueue_topic_push
+from .counters import adjust_counter, invalidate_broadcast_count
 import logging
 
 # Configure logging
@@ -15,108 +16,64 @@ logger.setLevel(logging.INFO)
 @receiver(post_save, sender=Notification)
 def send_push_on_notification_creation(sender, instance, created, **kwargs):
     """
-    Trigger a Firebase Push Notification whenever a Notification object is created.
+    Queue a Firebase Push Notification whenever a Notification object is created.
+    Delivery happens in the `send_pushes` worker, not in this request.
     """
     if created:
-        logger.info(f"Notification created: {instance.title} for user {instance.user.id}")
-        
-        if not instance.user.fcm_token:
-            logger.warning(f"User {instance.user.id} has no FCM token. Skipping push.")
-            return
-
-        logger.info(f"User has FCM token: {instance.user.fcm_token[:10]}...")
-        
-        # Calculate unread count for badge
-        unread_count = Notification.objects.filter(user=instance.user, is_read=False).count()
-        
-        # Prepare Data Payload
-        data_payload = {
-            "click_action": "FLUTTER_NOTIFICATION_CLICK",
-            "badge": str(unread_count),
-        }
-        
-        # Dynamic Order Linking
-        if instance.order:
-            data_payload["type"] = "order_update"
-            data_payload["order_id"] = str(instance.order.id)
-            logger.info(f"Attached Order ID {instance.order.id} to payload.")
-        
+        logger.info(f"Notification created: {instance.title} for user {instance.user_id}")
         try:
-            # Create the message with Android-specific configuration
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=instance.title, 
-                    body=instance.body
-                ),
-                data=data_payload,
-                android=messaging.AndroidConfig(
-                    priority='high',
-                    notification=messaging.AndroidNotification(
-                        channel_id='high_importance_channel',
-                        click_action='FLUTTER_NOTIFICATION_CLICK',
-                        icon='@mipmap/ic_launcher', # Correct Icon Name
-                    ),
-                ),
-                token=instance.user.fcm_token,
-            )
-            response = messaging.send(message)
-            logger.info(f"Successfully sent push: {response}")
-        
-        except messaging.UnregisteredError:
-            logger.warning(f"Token {instance.user.fcm_token[:10]}... is invalid/unregistered. Removing from user.")
-            instance.user.fcm_token = None
-            instance.user.save()
-        except messaging.SenderIdMismatchError:
-            logger.error(f"SENDER ID MISMATCH! Token {instance.user.fcm_token[:10]}... belongs to a different Firebase project than the serviceAccountKey.json.")
-            instance.user.fcm_token = None
-            instance.user.save()
+            push = enqueue_notification_push(instance)
+            logger.info(f"Queued push {push.id} for user {instance.user_id}")
         except Exception as e:
-            logger.error(f"Error sending custom push: {e}", exc_info=True)
+            logger.error(f"Error queueing custom push: {e}", exc_info=True)
 
 @receiver(post_save, sender=BroadcastNotification)
 def send_broadcast_push(sender, instance, created, **kwargs):
     """
-    Trigger a Firebase TOPIC Push Notification when a BroadcastNotification is created.
+    Queue a Firebase TOPIC Push Notification when a BroadcastNotification is created.
     Topic: 'all_users'
     """
     if created:
         logger.info(f"BroadcastNotification created: {instance.title}")
         try:
-            # Create message with High Priority config
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=instance.title, 
-                    body=instance.body
-                ),
-                android=messaging.AndroidConfig(
-                    priority='high',
-                    notification=messaging.AndroidNotification(
-                        channel_id='high_importance_channel',
-                        icon='@mipmap/ic_launcher',
-                    ),
-                ),
-                topic='all_users',
-            )
-            response = messaging.send(message)
-            logger.info(f"Successfully sent broadcast: {response}")
+            push = enqueue_topic_push('all_users', instance.title, instance.body)
+            logger.info(f"Queued broadcast push {push.id}")
+            # No per-user copies: the broadcast is stored once and merged into
+            # each user's list on read; BroadcastStatus rows appear on read/delete.
+        except Exception as e:
+            logger.error(f"Error queueing broadcast push: {e}", exc_info=True)
 
-            # Persist to database for all users so it appears in history
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            users = User.objects.all()
-            
-            notifications_to_create = [
-                Notification(
-                    user=user, 
-                    title=instance.title, 
-                    body=instance.body,
-                    # Optional: link unrelated to order
-                ) for user in users
-            ]
-            
-            # Use bulk_create for performance
-            Notification.objects.bulk_create(notifications_to_create)
-            logger.info(f"Created {len(notifications_to_create)} database notifications for broadcast.")
 
-        except Exception as e:
-            logger.error(f"Error sending broadcast push: {e}", exc_info=True)
+# Unread badge counters (see notifications.counters)
+
+@receiver(post_save, sender=Notification)
+def count_notification_save(sender, instance, created, **kwargs):
+    was_read = instance._loaded_is_read
+    instance._loaded_is_read = instance.is_read
+    if created:
+        if not instance.is_read:
+            adjust_counter(instance.user_id, personal=1)
+    elif was_read is not None and was_read != instance.is_read:
+        adjust_counter(instance.user_id, personal=-1 if instance.is_read else 1)
+
+@receiver(post_delete, sender=Notification)
+def count_notification_delete(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_counter(instance.user_id, personal=-1)
+
+@receiver(post_save, sender=BroadcastStatus)
+def count_broadcast_status_save(sender, instance, created, **kwargs):
+    was_handled = False if created else instance._loaded_handled
+    instance._loaded_handled = instance.handled
+    if was_handled is not None and was_handled != instance.handled:
+        adjust_counter(instance.user_id, broadcasts_handled=1 if instance.handled else -1)
+
+@receiver(post_delete, sender=BroadcastStatus)
+def count_broadcast_status_delete(sender, instance, **kwargs):
+    if instance.handled:
+        adjust_counter(instance.user_id, broadcasts_handled=-1)
+
+@receiver(post_save, sender=BroadcastNotification)
+@receiver(post_delete, sender=BroadcastNotification)
+def count_broadcasts(sender, **kwargs):
+    invalidate_broadcast_count()
@@ -0,0 +1,280 @@
+from importlib import import_module
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Notification, BroadcastNotification, BroadcastStatus, PushMessage
+from .push import FakeTransport, process_outbox, send_to_tokens
+
+User = get_user_model()
+
+@override_settings(PUSH_TRANSPORT='notifications.push.FakeTransport', PUSH_MAX_ATTEMPTS=3)
+class PushOutboxTests(TestCase):
+    def setUp(self):
+        FakeTransport.reset()
+        cache.clear()
+        self.user = User.objects.create_user(email='push@example.com', password='password123', is_active=True)
+        self.user.fcm_token = 'token-1'
+        self.user.save()
+
+    def test_notification_is_queued_not_sent(self):
+        Notification.objects.create(user=self.user, title='Hello', body='World')
+        push = PushMessage.objects.get()
+        self.assertEqual(push.status, 'pending')
+        self.assertEqual(FakeTransport.sent, [])
+
+        self.assertEqual(process_outbox(), 1)
+        push.refresh_from_db()
+        self.assertEqual(push.status, 'sent')
+        self.assertEqual(push.attempts, 1)
+        message = FakeTransport.sent[0]
+        self.assertEqual(message.token, 'token-1')
+        self.assertEqual(message.data['badge'], '1')
+
+    def test_transient_failure_is_retried_with_backoff(self):
+        Notification.objects.create(user=self.user, title='Hello', body='World')
+        FakeTransport.fail_next = 1
+        process_outbox()
+        push = PushMessage.objects.get()
+        self.assertEqual(push.status, 'pending')
+        self.assertGreater(push.next_attempt_at, timezone.now())
+
+        # Not due yet
+        self.assertEqual(process_outbox(), 0)
+        PushMessage.objects.update(next_attempt_at=timezone.now())
+        process_outbox()
+        push.refresh_from_db()
+        self.assertEqual(push.status, 'sent')
+        self.assertEqual(push.attempts, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        Notification.objects.create(user=self.user, title='Hello', body='World')
+        FakeTransport.fail_next = 10
+        for _ in range(3):
+            PushMessage.objects.update(next_attempt_at=timezone.now())
+            process_outbox()
+        push = PushMessage.objects.get()
+        self.assertEqual(push.status, 'failed')
+        self.assertEqual(push.attempts, 3)
+
+    def test_unregistered_token_is_cleared(self):
+        FakeTransport.invalid_tokens = {'token-1'}
+        Notification.objects.create(user=self.user, title='Hello', body='World')
+        process_outbox()
+        self.assertEqual(PushMessage.objects.get().status, 'failed')
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.fcm_token)
+
+    def test_broadcast_is_queued_as_topic_push(self):
+        BroadcastNotification.objects.create(title='Sale', body='50% off')
+        topic_push = PushMessage.objects.get(topic='all_users')
+        process_outbox()
+        topic_push.refresh_from_db()
+        self.assertEqual(topic_push.status, 'sent')
+        self.assertIn('all_users', [message.topic for message in FakeTransport.sent])
+
+    def test_identical_payloads_go_out_as_one_multicast(self):
+        users = [self.user]
+        for i in range(2, 5):
+            user = User.objects.create_user(email=f'push{i}@example.com', password='password123', is_active=True)
+            user.fcm_token = f'token-{i}'
+            user.save()
+            users.append(user)
+        for user in users:
+            Notification.objects.create(user=user, title='Flash sale', body='Today only')
+        FakeTransport.invalid_tokens = {'token-2', 'token-3'}
+
+        process_outbox()
+        self.assertEqual(FakeTransport.calls, [('send_multicast', 4)])
+        self.assertEqual(PushMessage.objects.filter(status='sent').count(), 2)
+        self.assertEqual(User.objects.filter(fcm_token__isnull=True).count(), 2)
+
+
+@override_settings(PUSH_TRANSPORT='notifications.push.FakeTransport')
+class MulticastSenderTests(APITestCase):
+    def setUp(self):
+        FakeTransport.reset()
+
+    def test_tokens_are_sent_in_chunks_of_500(self):
+        tokens = [f'token-{i}' for i in range(1201)]
+        FakeTransport.invalid_tokens = {'token-7'}
+        result = send_to_tokens(tokens, 'Hello', 'World')
+        self.assertEqual(sorted(FakeTransport.calls), [('send_multicast', 201), ('send_multicast', 500), ('send_multicast', 500)])
+        self.assertEqual(result, {"sent": 1200, "failed": 0, "invalid_tokens": 1})
+
+    def test_admin_send_notification_fans_out(self):
+        admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        for i in range(3):
+            User.objects.create_user(email=f'fan{i}@example.com', password='password123', is_active=True, fcm_token=f'fan-{i}')
+        User.objects.create_user(email='dead@example.com', password='password123', is_active=True, fcm_token='dead')
+        FakeTransport.invalid_tokens = {'dead'}
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.post(reverse('send-notification'), {'title': 'Hi', 'body': 'Everyone'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        # Nothing goes to FCM inside the request
+        self.assertEqual(FakeTransport.calls, [])
+
+        process_outbox()
+        push = PushMessage.objects.get(pk=response.data['push_id'])
+        self.assertEqual(push.status, 'sent')
+        self.assertEqual(push.provider_message_id, "sent=3, failed=0, invalid_tokens=1")
+        self.assertEqual(FakeTransport.calls, [('send_multicast', 4)])
+        self.assertFalse(User.objects.filter(fcm_token='dead').exists())
+
+    def test_fan_out_retry_only_sends_to_tokens_not_reached(self):
+        User.objects.bulk_create([
+            User(email=f'fan{i}@example.com', is_active=True, fcm_token=f'fan-{i:04d}') for i in range(600)
+        ])
+        PushMessage.objects.create(all_devices=True, title='Hi', body='Everyone')
+        # The first multicast (tokens fan-0000..fan-0499) hits an FCM outage
+        FakeTransport.fail_next = 1
+        process_outbox(workers=1)
+        push = PushMessage.objects.get()
+        self.assertEqual(push.status, 'pending')
+        self.assertEqual(push.last_error, "sent=100, failed=500, invalid_tokens=0")
+        self.assertEqual(push.pending_token_ranges, [['fan-0000', 'fan-0499']])
+        self.assertGreater(push.next_attempt_at, timezone.now())
+
+        PushMessage.objects.update(next_attempt_at=timezone.now())
+        process_outbox(workers=1)
+        push.refresh_from_db()
+        self.assertEqual(push.status, 'sent')
+        self.assertIsNone(push.pending_token_ranges)
+        self.assertEqual(FakeTransport.calls[-1], ('send_multicast', 500))
+        self.assertEqual(sorted(message.token for message in FakeTransport.sent), [f'fan-{i:04d}' for i in range(600)])
+
+
+class BroadcastInboxTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='inbox@example.com', password='password123', is_active=True)
+        self.url = reverse('notification-list')
+
+    def test_broadcast_is_stored_once(self):
+        User.objects.create_user(email='other@example.com', password='password123', is_active=True)
+        BroadcastNotification.objects.create(title='Sale', body='50% off')
+        self.assertEqual(Notification.objects.count(), 0)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual([item['title'] for item in response.data['results']], ['Sale'])
+        self.assertFalse(response.data['results'][0]['is_read'])
+
+    def test_mark_all_read_materializes_broadcast_status(self):
+        broadcast = BroadcastNotification.objects.create(title='Sale', body='50% off')
+        Notification.objects.create(user=self.user, title='Order Update', body='Shipped')
+        self.client.force_authenticate(user=self.user)
+
+        self.client.patch(reverse('notification-mark-all-read'))
+        response = self.client.get(self.url)
+        self.assertTrue(all(item['is_read'] for item in response.data['results']))
+        self.assertTrue(BroadcastStatus.objects.get(user=self.user, broadcast=broadcast).is_read)
+
+    def test_migration_dedupes_per_user_copies(self):
+        from django.apps import apps
+        migration = import_module('notifications.migrations.0006_dedupe_broadcast_copies')
+        other = User.objects.create_user(email='other@example.com', password='password123', is_active=True)
+        broadcast = BroadcastNotification.objects.create(title='Sale', body='50% off')
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title='Sale', body='50% off', is_read=True),
+            Notification(user=other, title='Sale', body='50% off'),
+        ])
+        Notification.objects.create(user=other, title='Order Update', body='Shipped')
+
+        migration.dedupe_broadcast_copies(apps, None)
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['Order Update'])
+        self.assertTrue(BroadcastStatus.objects.get(user=self.user, broadcast=broadcast).is_read)
+        self.assertFalse(BroadcastStatus.objects.filter(user=other).exists())
+
+    def test_inbox_pages_merged_timeline(self):
+        for i in range(3):
+            BroadcastNotification.objects.create(title=f'Broadcast {i}', body='b')
+            Notification.objects.create(user=self.user, title=f'Personal {i}', body='p')
+        deleted = BroadcastNotification.objects.create(title='Deleted', body='b')
+        BroadcastStatus.objects.create(user=self.user, broadcast=deleted, is_deleted=True)
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse('notification-unread-count'))  # builds the badge counter
+
+        titles = []
+        url = reverse('notification-inbox') + '?page_size=4'
+        while url:
+            with self.assertNumQueries(2):  # timeline + badge counter
+                response = self.client.get(url)
+            self.assertEqual(response.data['unread_count'], 6)
+            titles += [item['title'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(titles, [
+            'Personal 2', 'Broadcast 2', 'Personal 1', 'Broadcast 1', 'Personal 0', 'Broadcast 0'
+        ])
+
+    def test_list_is_paginated_like_inbox(self):
+        for i in range(25):
+            Notification.objects.create(user=self.user, title=f'Personal {i}', body='p')
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 5)
+
+
+class UnreadCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='badge@example.com', password='password123', is_active=True)
+        self.url = reverse('notification-unread-count')
+        self.client.force_authenticate(user=self.user)
+
+    def assertUnread(self, expected):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['unread_count'], expected)
+        self.assertEqual(response.data['unread_count'], self._recount())
+
+    def _recount(self):
+        personal = Notification.objects.filter(user=self.user, is_read=False).count()
+        handled = BroadcastStatus.objects.filter(user=self.user).exclude(is_read=False, is_deleted=False).count()
+        return personal + BroadcastNotification.objects.count() - handled
+
+    def test_counter_follows_every_change(self):
+        first = Notification.objects.create(user=self.user, title='One', body='1')
+        self.assertUnread(1)
+        second = Notification.objects.create(user=self.user, title='Two', body='2')
+        broadcast = BroadcastNotification.objects.create(title='Sale', body='50% off')
+        self.assertUnread(3)
+
+        self.client.patch(reverse('notification-detail', args=[first.id]), {'is_read': True})
+        self.assertUnread(2)
+        self.client.patch(reverse('notification-detail', args=[-broadcast.id]), {'is_read': True})
+        self.assertUnread(1)
+        self.client.delete(reverse('notification-detail', args=[second.id]))
+        self.assertUnread(0)
+
+        BroadcastNotification.objects.create(title='Another', body='b')
+        Notification.objects.create(user=self.user, title='Three', body='3')
+        self.assertUnread(2)
+        self.client.patch(reverse('notification-mark-all-read'))
+        self.assertUnread(0)
+
+        broadcast.delete()
+        self.assertUnread(0)
+
+    def test_reading_the_badge_does_not_count_notifications(self):
+        Notification.objects.create(user=self.user, title='One', body='1')
+        self.client.get(self.url)  # builds the counter
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['unread_count'], 1)
+
+    def test_racing_first_reads_keep_the_count(self):
+        from unittest.mock import patch
+        from django.db import IntegrityError
+        from .counters import refresh_counter
+        from .models import UnreadCounter
+        Notification.objects.create(user=self.user, title='One', body='1')
+        # The other request's insert won; ours then hits the primary key
+        UnreadCounter.objects.update_or_create(user=self.user, defaults={'personal_unread': 1})
+        with patch.object(UnreadCounter.objects, 'update_or_create', side_effect=IntegrityError("UNIQUE constraint failed")):
+            counter = refresh_counter(self.user.id)
+        self.assertEqual(counter.personal_unread, 1)
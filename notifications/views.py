@@ -1,20 +1,27 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .models import Notification, BroadcastNotification
 from .serializers import NotificationSerializer
+from .inbox import timeline, encode_cursor, decode_cursor
+from .counters import get_unread_count, refresh_counter
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+INBOX_PAGE_SIZE = 20
+INBOX_MAX_PAGE_SIZE = 100
+
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     # permission_classes = [IsAuthenticated] # Moved to get_permissions
     http_method_names = ['get', 'patch', 'delete', 'post']
 
     def get_permissions(self):
-        if self.action == 'list':
+        if self.action in ['list', 'inbox', 'unread_count']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
@@ -24,48 +31,55 @@ class NotificationViewSet(viewsets.ModelViewSet):
         return Notification.objects.none()
 
     def list(self, request, *args, **kwargs):
-        # 1. Fetch Broadcast Notifications (for everyone)
-        broadcasts = BroadcastNotification.objects.all().order_by('-created_at')
-        
-        # Helper: Map broadcast ID to status for auth users
-        broadcast_status_map = {}
-        if request.user.is_authenticated:
-            from .models import BroadcastStatus
-            statuses = BroadcastStatus.objects.filter(user=request.user)
-            broadcast_status_map = {s.broadcast_id: s for s in statuses}
-
-        broadcast_data = []
-        for b in broadcasts:
-            # Check status for auth user
-            is_read = False
-            is_deleted = False
-            
-            if request.user.is_authenticated and b.id in broadcast_status_map:
-                status_obj = broadcast_status_map[b.id]
-                is_read = status_obj.is_read
-                is_deleted = status_obj.is_deleted
-
-            if not is_deleted:
-                broadcast_data.append({
-                    "id": -b.id, # Negative ID for broadcasts
-                    "title": b.title,
-                    "body": b.body,
-                    "is_read": is_read,
-                    "created_at": b.created_at.strftime("%Y-%m-%d %H:%M:%S")
-                })
-
-        # 2. Fetch User Notifications (if auth)
-        user_data = []
-        if request.user.is_authenticated:
-            user_notifs = self.get_queryset()
-            serializer = self.get_serializer(user_notifs, many=True)
-            user_data = serializer.data
-        
-        # 3. Combine and Sort
-        combined_data = broadcast_data + user_data
-        combined_data.sort(key=lambda x: x['created_at'], reverse=True)
+        # Same keyset pages as inbox, so the cost follows the page size, not the history
+        return self.inbox(request)
+
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """
+        Paginated merged timeline, newest first: broadcasts (for everyone) and
+        the user's own notifications, merged in SQL.
+        Query params: cursor (from `next`), page_size (default 20, max 100).
+        """
+        user = request.user if request.user.is_authenticated else None
+        try:
+            page_size = min(int(request.query_params.get('page_size', INBOX_PAGE_SIZE)), INBOX_MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = INBOX_PAGE_SIZE
+        page_size = max(page_size, 1)
 
-        return Response(combined_data)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                cursor = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound("Invalid cursor")
+
+        # One extra row tells us whether there is a next page
+        rows = timeline(user, cursor=cursor, limit=page_size + 1)
+        next_url = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor', encode_cursor(rows[-1])
+            )
+
+        return Response({
+            "next": next_url,
+            "unread_count": get_unread_count(user),
+            "results": [self._inbox_item(row) for row in rows],
+        })
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Badge number: unread personal notifications plus unread broadcasts.
+        """
+        user = request.user if request.user.is_authenticated else None
+        return Response({"unread_count": get_unread_count(user)})
+
+    def _inbox_item(self, row):
+        return {**row, "created_at": row['created_at'].strftime("%Y-%m-%d %H:%M:%S")}
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -148,4 +162,15 @@ class NotificationViewSet(viewsets.ModelViewSet):
         Mark all notifications as read.
         """
         Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+
+        # Broadcasts: flip existing statuses, then materialize the missing ones as read
+        from .models import BroadcastStatus
+        BroadcastStatus.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        unseen = BroadcastNotification.objects.exclude(broadcaststatus__user=request.user).values_list('id', flat=True)
+        BroadcastStatus.objects.bulk_create(
+            [BroadcastStatus(user=request.user, broadcast_id=broadcast_id, is_read=True) for broadcast_id in unseen],
+            ignore_conflicts=True
+        )
+        # The bulk statements above bypass the signals that maintain the badge
+        refresh_counter(request.user.id)
         return Response({"message": "All notifications marked as read"}, status=status.HTTP_200_OK)
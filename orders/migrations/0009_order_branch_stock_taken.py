@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_order_created_idx_order_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='branch_stock_taken',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
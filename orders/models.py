@@ -27,6 +27,8 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=10, choices=PAYMENT_CHOICES, default='COD', verbose_name="Payment Method")
     order_type = models.CharField(max_length=10, choices=ORDER_TYPE_CHOICES, default='Normal')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Whether placing the order took units from the branch's BranchStock (see orders.stock)
+    branch_stock_taken = models.BooleanField(default=False, editable=False)
     shipping_address = models.TextField()
     contact_number = models.CharField(
         max_length=11,
@@ -41,6 +43,18 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Status as last loaded/saved, used to emit order_status_changed (see orders.signals)
+        # (read from __dict__ so a deferred status is not fetched; None means unknown)
+        self._loaded_status = self.__dict__.get('status')
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.email}"
 
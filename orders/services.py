@@ -0,0 +1,88 @@
+"""
+Order placement and cancellation.
+
+Single entry point for every stock-changing order flow (OrderViewSet.create,
+QuickOrderView, cancel_order). A checkout costs the same number of queries
+whatever the cart size: one product read, one conditional stock UPDATE
+(plus one on BranchStock when the order names a branch), one Order insert
+(total computed up front) and one bulk OrderItem insert.
+"""
+from django.db import transaction
+from products.models import Product
+from .models import Order, OrderItem
+from .stock import merge_quantities, reserve_stock, release_stock, InsufficientStock
+from .signals import send_order_placed
+
+
+class ProductNotFound(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Product {', '.join(str(pk) for pk in product_ids)} not found")
+
+
+class OrderNotCancellable(Exception):
+    pass
+
+
+def place_order(user, items, **order_fields):
+    """
+    Create an order for `items` ([(product_id, quantity), ...] or a dict).
+    `order_fields` are passed to the Order (shipping_address, contact_number,
+    branch_id, payment_method, order_type).
+    Raises ProductNotFound, InsufficientStock or ValueError (bad quantity).
+    """
+    quantities = merge_quantities(items)
+    if not quantities:
+        raise ValueError("Order must contain at least one item.")
+
+    products = Product.objects.in_bulk(list(quantities))
+    missing = [pk for pk in quantities if pk not in products]
+    if missing:
+        raise ProductNotFound(missing)
+
+    total_amount = sum(products[pk].price * quantity for pk, quantity in quantities.items())
+
+    with transaction.atomic():
+        # An order for a branch is filled from that branch's stock
+        branch_stock_taken = reserve_stock(quantities, order_fields.get('branch_id'))
+        order = Order.objects.create(
+            user=user, total_amount=total_amount, branch_stock_taken=branch_stock_taken, **order_fields
+        )
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=products[pk],
+                quantity=quantity,
+                price_at_purchase=products[pk].price
+            )
+            for pk, quantity in quantities.items()
+        ])
+        send_order_placed(order, order_items)
+
+    return order
+
+
+def cancel_order(order):
+    """
+    Cancel a pending order and put its stock back.
+    The order row is locked first so a double submit cannot restore stock twice.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.status != 'Pending':
+            raise OrderNotCancellable("Cannot cancel order that is not pending.")
+
+        # Only a branch whose stock this order took gets it back (it may have
+        # started tracking stock after the order was placed)
+        release_stock(
+            list(order.items.values_list('product_id', 'quantity')),
+            order.branch_id if order.branch_stock_taken else None,
+        )
+        order.status = 'Cancelled'
+        order.save(update_fields=['status', 'updated_at'])
+    return order
+
+
+def load_order(order):
+    """Re-read an order with everything OrderSerializer touches, in a fixed number of queries."""
+    return Order.objects.select_related('user', 'branch').prefetch_related('items__product').get(pk=order.pk)
@@ -1,53 +1,80 @@
+"""
+Order lifecycle events.
+
+- order_placed(order, items): sent once per checkout by orders.services.place_order
+- order_status_changed(order, old_status, new_status, items): sent when a saved
+  order's status actually changes (views, admin, cancellation)
+
+Both are sent after the surrounding transaction commits, with the item summary
+passed in, so receivers never re-read the order or act on rolled back data.
+`items` is a list of {"product_id", "category_id", "name", "quantity", "price"} dicts.
+"""
+from django.db import transaction
 from django.db.models.signals import post_save
-from django.dispatch import receiver
-from firebase_admin import messaging
+from django.dispatch import receiver, Signal
 from orders.models import Order
 from notifications.models import Notification
 import logging
 
 logger = logging.getLogger(__name__)
 
+order_placed = Signal()
+order_status_changed = Signal()
+
+
+def item_summary(order_items):
+    return [
+        {
+            "product_id": item.product_id,
+            "category_id": item.product.category_id,
+            "name": item.product.name,
+            "quantity": item.quantity,
+            "price": item.price_at_purchase,
+        }
+        for item in order_items
+    ]
+
+
+def send_order_placed(order, order_items):
+    items = item_summary(order_items)
+    transaction.on_commit(lambda: order_placed.send(sender=Order, order=order, items=items))
+
+
 @receiver(post_save, sender=Order)
-def order_status_notification(sender, instance, created, **kwargs):
-    # Retrieve the user associated with the order
-    user = instance.user
-    
-    # helper to get items string
-    items = instance.items.all()
-    if items.exists():
-        item_str = ", ".join([f"{item.quantity}x {item.product.name}" for item in items])
-    else:
-        item_str = ""
-
-    # Check if user has a registered device (FCM Token)
-    # We will log the flow regardless of token existence for debugging
-    
-    if created:
-        # If created with no items, it's likely the first step of the view transaction.
-        # We skip this and wait for the second save which updates total_amount after adding items.
-        if not item_str:
-            logger.info(f"Order #{instance.id} created but has no items yet. Skipping notification.")
-            return
-
-        title = "Order Placed"
-        body = f"Your order #{instance.id} has been placed. Items: {item_str}"
-    else:
-        # Order Update (or the second save of creation)
-        if instance.status == 'Pending' and item_str:
-            # This handles the second save after items are added
-            title = "Order Placed"
-            body = f"Your order #{instance.id} has been placed successfully. Items: {item_str}"
-        else:
-            title = "Order Update"
-            body = f"Your order #{instance.id} is now {instance.status}. Items: {item_str}"
-
-    # Always attempt to save DB notification
+def detect_status_change(sender, instance, created, **kwargs):
+    old_status = instance._loaded_status
+    instance._loaded_status = instance.status
+    if created or old_status is None or old_status == instance.status:
+        return
 
+    items = item_summary(instance.items.select_related('product'))
+    new_status = instance.status
+    transaction.on_commit(lambda: order_status_changed.send(
+        sender=Order, order=instance, old_status=old_status, new_status=new_status, items=items
+    ))
+
+
+def _items_text(items):
+    return ", ".join([f"{item['quantity']}x {item['name']}" for item in items])
+
+
+def _create_notification(order, title, body):
     # Create DB Entry
     # This creation will trigger the 'post_save' signal in notifications/signals.py
     # which will handle the actual Firebase Push.
     try:
-        Notification.objects.create(user=user, title=title, body=body, order=instance)
+        Notification.objects.create(user_id=order.user_id, title=title, body=body, order=order)
     except Exception as e:
-        # Fallback print/log if notification creation fails
-        print(f"Error creating notification object: {e}")
+        logger.error(f"Error creating notification object: {e}")
+
+
+@receiver(order_placed)
+def order_placed_notification(sender, order, items, **kwargs):
+    body = f"Your order #{order.id} has been placed. Items: {_items_text(items)}"
+    _create_notification(order, "Order Placed", body)
+
+
+@receiver(order_status_changed)
+def order_status_notification(sender, order, new_status, items, **kwargs):
+    body = f"Your order #{order.id} is now {new_status}. Items: {_items_text(items)}"
+    _create_notification(order, "Order Update", body)
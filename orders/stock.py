@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Q, Value, When
+from branches.models import Branch, BranchStock
+from products.models import Product
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when a reservation cannot be fully satisfied.
+    `failures` lists the offending lines:
+    [{"product_id": 1, "name": "Panadol", "requested": 3, "available": 1}, ...]
+    """
+    def __init__(self, failures):
+        self.failures = failures
+        messages = []
+        for failure in failures:
+            if failure['name'] is None:
+                messages.append(f"Product {failure['product_id']} not found")
+            else:
+                messages.append(f"Insufficient stock for {failure['name']}. Available: {failure['available']}")
+        super().__init__("; ".join(messages) or "Stock changed while placing the order. Please try again.")
+
+
+class _PartialReservation(Exception):
+    pass
+
+
+def merge_quantities(quantities):
+    """Accept {product_id: qty} or [(product_id, qty), ...]; sum duplicate lines."""
+    pairs = quantities.items() if isinstance(quantities, dict) else quantities
+    merged = {}
+    for product_id, quantity in pairs:
+        product_id, quantity = int(product_id), int(quantity)
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive number.")
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    return merged
+
+
+def _delta(quantities, field='id'):
+    return Case(
+        *[When(**{field: product_id}, then=Value(quantity)) for product_id, quantity in sorted(quantities.items())],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def shortages(quantities, branch_id=None):
+    """Lines that cannot be filled, from Product.stock or from the branch's stock."""
+    quantities = merge_quantities(quantities)
+    found = {
+        pk: (name, stock)
+        for pk, name, stock in Product.objects.filter(id__in=quantities).values_list('id', 'name', 'stock')
+    }
+    if branch_id is not None:
+        on_hand = dict(BranchStock.objects.filter(
+            branch_id=branch_id, product_id__in=quantities
+        ).values_list('product_id', 'quantity'))
+        found = {pk: (name, on_hand.get(pk, 0)) for pk, (name, stock) in found.items()}
+    failures = []
+    for product_id, requested in sorted(quantities.items()):
+        name, available = found.get(product_id, (None, 0))
+        if name is None or available < requested:
+            failures.append({
+                "product_id": product_id,
+                "name": name,
+                "requested": requested,
+                "available": available,
+            })
+    return failures
+
+
+def reserve_stock(quantities, branch_id=None):
+    """
+    Atomically take stock for every line, or for none of them.
+
+    Runs one conditional statement for the whole cart:
+        UPDATE product SET stock = stock - CASE id ... END
+        WHERE id IN (...) AND stock >= CASE id ... END
+    Each row is checked and decremented under its row lock, so two checkouts
+    racing for the last unit can never both succeed. If any line falls short
+    the statement is rolled back (savepoint) and InsufficientStock reports
+    which lines failed.
+
+    With a branch_id the same statement runs against that branch's
+    BranchStock rows too, so the branch must hold every line as well.
+    A branch with no BranchStock rows at all does not track its stock yet
+    (see BranchStock) and only Product.stock is checked.
+    Returns whether the branch's stock was taken (for release_stock).
+    """
+    quantities = merge_quantities(quantities)
+    if not quantities:
+        return False
+    short_at = None
+    taken = False
+    try:
+        with transaction.atomic():
+            delta = _delta(quantities)
+            updated = Product.objects.filter(
+                id__in=list(quantities), stock__gte=delta
+            ).update(stock=F('stock') - delta)
+            if updated != len(quantities):
+                raise _PartialReservation()
+            if branch_id is not None:
+                short_at = branch_id
+                delta = _delta(quantities, 'product_id')
+                updated = BranchStock.objects.filter(
+                    branch_id=branch_id, product_id__in=list(quantities), quantity__gte=delta
+                ).update(quantity=F('quantity') - delta)
+                if updated != len(quantities) and (updated or tracks_stock(branch_id)):
+                    raise _PartialReservation()
+                taken = updated > 0
+    except _PartialReservation:
+        raise InsufficientStock(shortages(quantities, short_at))
+    return taken
+
+
+def tracks_stock(branch_id):
+    """Whether the branch's stock has been loaded (it has any BranchStock row)."""
+    return BranchStock.objects.filter(branch_id=branch_id).exists()
+
+
+def release_stock(quantities, branch_id=None):
+    """
+    Give stock back (e.g. on cancellation) in a single statement (two with a
+    branch). Pass branch_id only if reserve_stock took the branch's stock.
+    """
+    quantities = merge_quantities(quantities)
+    if not quantities:
+        return
+    Product.objects.filter(id__in=list(quantities)).update(stock=F('stock') + _delta(quantities))
+    if branch_id is not None:
+        BranchStock.objects.filter(branch_id=branch_id, product_id__in=list(quantities)).update(
+            quantity=F('quantity') + _delta(quantities, 'product_id')
+        )
+
+
+def branches_with_stock(quantities):
+    """
+    Active branches holding every line of the cart, in one grouped query:
+        SELECT branch.* ... JOIN branch_stock ... WHERE product_id IN (...)
+        AND quantity >= CASE product_id ... END GROUP BY branch HAVING COUNT(*) = <lines>
+    Branches that do not track stock yet are included when Product.stock
+    covers the cart, as reserve_stock would accept an order for them.
+    """
+    quantities = merge_quantities(quantities)
+    if not quantities:
+        return Branch.objects.none()
+    stocked = Branch.objects.filter(
+        stock__product_id__in=list(quantities),
+        stock__quantity__gte=_delta(quantities, 'stock__product_id'),
+    ).annotate(lines_in_stock=Count('stock')).filter(lines_in_stock=len(quantities)).values('id')
+    available = Q(id__in=stocked)
+    if not shortages(quantities):
+        available |= ~Exists(BranchStock.objects.filter(branch_id=OuterRef('pk')))
+    return Branch.objects.filter(available, is_active=True)
@@ -2,6 +2,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from branches.models import Branch, BranchStock
 from products.models import Category, Product
 from .models import Order
 
@@ -60,3 +61,214 @@ class OrderTests(APITestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Order.objects.count(), 1)
+
+    def test_quick_order_rejects_invalid_quantity(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('quick-order')
+        for quantity in (0, -2, 'two'):
+            response = self.client.post(url, {"product_id": self.product.id, "quantity": quantity})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {"product_id": 'abc', "quantity": 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 100)
+
+    def test_create_order_reserves_all_lines_or_none(self):
+        self.client.force_authenticate(user=self.user)
+        scarce = Product.objects.create(name='Brufen', category=self.category, price=5.00, stock=1)
+        data = {
+            "shipping_address": "123 Street",
+            "contact_number": "1234567890",
+            "items": [
+                {"product_id": self.product.id, "quantity": 2},
+                {"product_id": scarce.id, "quantity": 2}
+            ]
+        }
+        response = self.client.post(self.orders_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failed_items'], [
+            {"product_id": scarce.id, "name": "Brufen", "requested": 2, "available": 1}
+        ])
+        self.assertEqual(Order.objects.count(), 0)
+
+        # Nothing was taken from the line that had enough stock
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 100)
+
+    def test_reserve_stock_never_oversells(self):
+        from .stock import reserve_stock, InsufficientStock
+        last_unit = Product.objects.create(name='Last Unit', category=self.category, price=5.00, stock=1)
+        reserve_stock({last_unit.id: 1})
+        with self.assertRaises(InsufficientStock):
+            reserve_stock({last_unit.id: 1})
+        last_unit.refresh_from_db()
+        self.assertEqual(last_unit.stock, 0)
+
+    def test_checkout_queries_constant_in_cart_size(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.force_authenticate(user=self.user)
+        products = [
+            Product.objects.create(name=f'Item {i}', category=self.category, price=1.00, stock=10)
+            for i in range(6)
+        ]
+
+        def checkout(cart):
+            data = {
+                "shipping_address": "123 Street",
+                "contact_number": "1234567890",
+                "items": [{"product_id": p.id, "quantity": 1} for p in cart]
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.orders_url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(checkout(products[:1]), checkout(products[1:]))
+
+    def test_cancel_order_restores_stock(self):
+        self.client.force_authenticate(user=self.user)
+        data = {
+            "shipping_address": "123 Street",
+            "contact_number": "1234567890",
+            "items": [{"product_id": self.product.id, "quantity": 3}]
+        }
+        order_id = self.client.post(self.orders_url, data, format='json').data['id']
+        url = reverse('order-cancel-order', args=[order_id])
+
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 100)
+        self.assertEqual(Order.objects.get(id=order_id).total_amount, 30)
+
+    def test_checkout_sends_one_order_placed_notification(self):
+        from notifications.models import Notification
+        self.client.force_authenticate(user=self.user)
+        data = {
+            "shipping_address": "123 Street",
+            "contact_number": "1234567890",
+            "items": [{"product_id": self.product.id, "quantity": 2}]
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.orders_url, data, format='json')
+        notifications = Notification.objects.filter(order_id=response.data['id'])
+        self.assertEqual([n.title for n in notifications], ["Order Placed"])
+        self.assertIn("2x Panadol", notifications[0].body)
+
+        # Saving without a status change is silent, a status change notifies once
+        order = Order.objects.get(id=response.data['id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            order.shipping_address = "456 Street"
+            order.save()
+            order.status = 'Shipped'
+            order.save()
+        self.assertEqual(
+            list(Notification.objects.filter(order=order).order_by('id').values_list('title', flat=True)),
+            ["Order Placed", "Order Update"]
+        )
+
+
+class BranchStockTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='password123', is_active=True)
+        category = Category.objects.create(name='Medicine')
+        self.panadol = Product.objects.create(name='Panadol', category=category, price=10.00, stock=100)
+        self.brufen = Product.objects.create(name='Brufen', category=category, price=5.00, stock=100)
+        self.blue_area = Branch.objects.create(name='Blue Area', address='-', phone='-', latitude=33.71, longitude=73.06)
+        self.saddar = Branch.objects.create(name='Saddar', address='-', phone='-', latitude=33.59, longitude=73.05)
+        self.closed = Branch.objects.create(name='Closed', address='-', phone='-', latitude=33.70, longitude=73.05, is_active=False)
+        for branch, panadol, brufen in [(self.blue_area, 5, 1), (self.saddar, 2, 4), (self.closed, 9, 9)]:
+            BranchStock.objects.create(branch=branch, product=self.panadol, quantity=panadol)
+            BranchStock.objects.create(branch=branch, product=self.brufen, quantity=brufen)
+        self.client.force_authenticate(user=self.user)
+
+    def order(self, branch, items):
+        return self.client.post(reverse('order-list'), {
+            "shipping_address": "123 Street",
+            "contact_number": "1234567890",
+            "branch_id": branch.id,
+            "items": [{"product_id": product.id, "quantity": quantity} for product, quantity in items],
+        }, format='json')
+
+    def on_hand(self, branch, product):
+        return BranchStock.objects.get(branch=branch, product=product).quantity
+
+    def test_order_takes_stock_from_its_branch(self):
+        response = self.order(self.saddar, [(self.panadol, 2), (self.brufen, 3)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Order.objects.get(pk=response.data['id']).branch_stock_taken)
+        self.assertEqual((self.on_hand(self.saddar, self.panadol), self.on_hand(self.saddar, self.brufen)), (0, 1))
+        self.assertEqual(self.on_hand(self.blue_area, self.panadol), 5)
+        self.panadol.refresh_from_db()
+        self.assertEqual(self.panadol.stock, 98)
+
+        url = reverse('order-cancel-order', args=[response.data['id']])
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.assertEqual((self.on_hand(self.saddar, self.panadol), self.on_hand(self.saddar, self.brufen)), (2, 4))
+
+    def test_branch_short_of_one_line_takes_nothing(self):
+        response = self.order(self.blue_area, [(self.panadol, 2), (self.brufen, 3)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failed_items'], [
+            {"product_id": self.brufen.id, "name": "Brufen", "requested": 3, "available": 1}
+        ])
+        self.assertEqual(self.on_hand(self.blue_area, self.panadol), 5)
+        self.panadol.refresh_from_db()
+        self.assertEqual(self.panadol.stock, 100)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_availability_lists_branches_holding_the_whole_cart(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('branch-availability')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'items': f'{self.panadol.id}:2,{self.brufen.id}:1'})
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual([b['name'] for b in response.data], ['Blue Area', 'Saddar'])
+
+        response = self.client.get(url, {'items': f'{self.panadol.id}:2,{self.brufen.id}:3', 'lat': 33.6, 'long': 73.05})
+        self.assertEqual([b['name'] for b in response.data], ['Saddar'])
+        self.assertIn('distance_km', response.data[0])
+
+        # Lines for the same product add up
+        response = self.client.get(url, {'items': f'{self.panadol.id}:3,{self.panadol.id}:3'})
+        self.assertEqual(response.data, [])
+        self.assertEqual(self.client.get(url, {'items': 'x:1'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_branch_without_stock_rows_fills_orders_from_product_stock(self):
+        # Branches whose stock has not been loaded yet keep taking orders
+        new_branch = Branch.objects.create(name='F-10', address='-', phone='-', latitude=33.69, longitude=73.01)
+        response = self.order(new_branch, [(self.panadol, 30), (self.brufen, 3)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.panadol.refresh_from_db()
+        self.assertEqual(self.panadol.stock, 70)
+        self.assertFalse(BranchStock.objects.filter(branch=new_branch).exists())
+
+        response = self.order(new_branch, [(self.panadol, 71)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failed_items'][0]['available'], 70)
+
+        url = reverse('branch-availability')
+        response = self.client.get(url, {'items': f'{self.panadol.id}:3'})
+        self.assertEqual([b['name'] for b in response.data], ['Blue Area', 'F-10'])
+        response = self.client.get(url, {'items': f'{self.panadol.id}:71'})
+        self.assertEqual(response.data, [])
+
+        # Cancelling does not credit a branch that started tracking stock since
+        order_id = Order.objects.filter(branch=new_branch).get().id
+        BranchStock.objects.create(branch=new_branch, product=self.brufen, quantity=0)
+        self.assertEqual(self.client.post(reverse('order-cancel-order', args=[order_id])).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.on_hand(new_branch, self.brufen), 0)
+        self.panadol.refresh_from_db()
+        self.assertEqual(self.panadol.stock, 100)
+        BranchStock.objects.filter(branch=new_branch).delete()
+
+        # From its first row on, the branch's own stock counts
+        BranchStock.objects.create(branch=new_branch, product=self.panadol, quantity=1)
+        response = self.order(new_branch, [(self.brufen, 1)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failed_items'], [
+            {"product_id": self.brufen.id, "name": "Brufen", "requested": 1, "available": 0}
+        ])
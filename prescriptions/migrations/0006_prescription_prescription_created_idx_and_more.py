@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('prescriptions', '0005_prescription_branch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['-created_at', '-id'], name='prescription_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='prescription_user_created_idx'),
+        ),
+    ]
@@ -35,5 +35,11 @@ class Prescription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='prescription_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='prescription_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Prescription by {self.user.email} - {self.status}"
@@ -12,8 +12,8 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Prescription.objects.all().order_by('-created_at')
-        return Prescription.objects.filter(user=user).order_by('-created_at')
+            return Prescription.objects.all().order_by('-created_at', '-id')
+        return Prescription.objects.filter(user=user).order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -0,0 +1,295 @@
+"""
+In-process autocomplete for the app's search box.
+
+Product and category names are kept in a character trie held in memory, so
+suggestions never touch the database per keystroke. Every trie node lazily
+caches its top-k entries (by units sold), which makes a prefix lookup
+O(len(prefix)). Typos are handled with a bounded Levenshtein walk over the trie.
+
+The index is built on first use, updated incrementally from products.signals,
+and rebuilt when another process bumps the shared version or it gets older
+than AUTOCOMPLETE_MAX_AGE (so popularity follows new orders). The version
+lives in the default cache, which must be shared by all processes
+(checked by products.checks).
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from .models import Category, Product
+
+VERSION_CACHE_KEY = 'products:autocomplete_version'
+MAX_SUGGESTIONS = 20
+
+
+def normalize(text):
+    """Casefold, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def max_distance_for(query):
+    # Short prefixes are ambiguous enough already; allow more typos on longer ones
+    if len(query) < 4:
+        return 0
+    if len(query) < 8:
+        return 1
+    return 2
+
+
+class TrieNode:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = set()
+        self.top = None
+
+
+class Trie:
+    def __init__(self, rank, k=MAX_SUGGESTIONS):
+        self.root = TrieNode()
+        self.rank = rank  # entry key -> sort key, smaller is better
+        self.k = k
+
+    def _path(self, term, create=False):
+        node = self.root
+        path = [node]
+        for char in term:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = TrieNode()
+            node = child
+            path.append(node)
+        return path
+
+    def insert(self, term, key):
+        path = self._path(term, create=True)
+        path[-1].entries.add(key)
+        for node in path:
+            node.top = None
+
+    def remove(self, term, key):
+        path = self._path(term)
+        if path is None:
+            return
+        path[-1].entries.discard(key)
+        for node in path:
+            node.top = None
+        # Prune branches left empty
+        for i in range(len(term) - 1, -1, -1):
+            child = path[i + 1]
+            if child.entries or child.children:
+                break
+            del path[i].children[term[i]]
+
+    def find(self, prefix):
+        path = self._path(prefix)
+        return path[-1] if path else None
+
+    def top(self, node):
+        if node.top is None:
+            candidates = set(node.entries)
+            for child in node.children.values():
+                candidates.update(self.top(child))
+            node.top = heapq.nsmallest(self.k, candidates, key=self.rank.__getitem__)
+        return node.top
+
+    def fuzzy(self, query, max_distance):
+        """
+        Yield (distance, node) for nodes whose path is within max_distance
+        edits of query. Their subtrees are the completions.
+        The first character is taken as typed: typos there are rare and
+        anchoring on it keeps the walk away from the dense top of the trie.
+        """
+        first = self.root.children.get(query[0])
+        if first is None:
+            return
+        size = len(query) + 1
+        limit = max_distance + 1  # anything above max_distance is just "too far"
+        first_row = [min(i - 1, limit) for i in range(size)]
+        first_row[0] = 1
+        stack = [(first, first_row, 1)]
+        while stack:
+            node, row, depth = stack.pop()
+            if row[-1] <= max_distance:
+                yield row[-1], node
+                if row[-1] == 0:
+                    # Exact prefix, the subtree cannot match any closer
+                    continue
+            if min(row) > max_distance:
+                continue
+            # Only cells within max_distance of the diagonal can stay in range
+            low = max(1, depth + 1 - max_distance)
+            high = min(size - 1, depth + 1 + max_distance)
+            for char, child in node.children.items():
+                next_row = [limit] * size
+                next_row[0] = min(depth + 1, limit)
+                for i in range(low, high + 1):
+                    next_row[i] = min(
+                        next_row[i - 1] + 1,
+                        row[i] + 1,
+                        row[i - 1] + (query[i - 1] != char),
+                        limit,
+                    )
+                stack.append((child, next_row, depth + 1))
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self.rank = {}
+        self.suggestions = {}
+        self.terms = {}
+        self.trie = Trie(self.rank)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        category_sold = {}
+        products = Product.objects.filter(is_active=True).annotate(
+            units=Sum('order_items__quantity')
+        ).values_list('id', 'name', 'category_id', 'units')
+        for pk, name, category_id, units in products:
+            index.add('product', pk, name, units or 0)
+            category_sold[category_id] = category_sold.get(category_id, 0) + (units or 0)
+        for pk, name in Category.objects.values_list('id', 'name'):
+            index.add('category', pk, name, category_sold.get(pk, 0))
+        return index
+
+    def add(self, kind, pk, text, popularity=None):
+        """Insert or update an entry. popularity=None keeps the current value."""
+        key = (kind, pk)
+        with self.lock:
+            if popularity is None:
+                popularity = self.suggestions.get(key, {}).get('popularity', 0)
+            self._discard(key)
+            words = normalize(text).split()
+            # Index the full name and every word start ("extra" finds "Panadol Extra")
+            terms = {' '.join(words[i:]) for i in range(len(words))}
+            self.rank[key] = (-popularity, normalize(text), kind, pk)
+            self.suggestions[key] = {'type': kind, 'id': pk, 'text': text, 'popularity': popularity}
+            self.terms[key] = terms
+            for term in terms:
+                self.trie.insert(term, key)
+
+    def discard(self, kind, pk):
+        with self.lock:
+            self._discard((kind, pk))
+
+    def _discard(self, key):
+        for term in self.terms.pop(key, ()):
+            self.trie.remove(term, key)
+        self.suggestions.pop(key, None)
+        self.rank.pop(key, None)
+
+    def suggest(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        best = {}
+        with self.lock:
+            node = self.trie.find(query)
+            if node is not None:
+                best = dict.fromkeys(self.trie.top(node), 0)
+            if len(best) >= limit:
+                # Enough exact prefix matches, skip the typo-tolerant walk
+                return self._render(heapq.nsmallest(limit, best, key=self.rank.__getitem__))
+            for distance, node in self.trie.fuzzy(query, max_distance_for(query)):
+                for key in self.trie.top(node):
+                    if distance < best.get(key, distance + 1):
+                        best[key] = distance
+            return self._render(heapq.nsmallest(limit, best, key=lambda key: (best[key], self.rank[key])))
+
+    def _render(self, keys):
+        return [
+            {'type': key[0], 'id': key[1], 'text': self.suggestions[key]['text']}
+            for key in keys
+        ]
+
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+_build_lock = threading.Lock()
+
+
+def _shared_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def get_index():
+    global _index, _index_version, _index_built_at
+    version = _shared_version()
+    max_age = getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 60 * 60)
+    if _index is None or version != _index_version or time.monotonic() - _index_built_at > max_age:
+        with _build_lock:
+            if _index is None or version != _index_version or time.monotonic() - _index_built_at > max_age:
+                _index = AutocompleteIndex.build()
+                _index_version = version
+                _index_built_at = time.monotonic()
+    return _index
+
+
+def _bump_version():
+    """Tell other processes their copy is stale; this process is already current."""
+    global _index_version
+    if cache.add(VERSION_CACHE_KEY, 1, None):
+        version = 1
+    else:
+        try:
+            version = cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            version = None
+    if _index is not None and version is not None and _index_version == version - 1:
+        _index_version = version
+
+
+def product_changed(product):
+    if _index is not None:
+        if product.is_active:
+            _index.add('product', product.id, product.name)
+        else:
+            _index.discard('product', product.id)
+    _bump_version()
+
+
+def products_changed(products):
+    """product_changed() for many products (bulk imports), with one version bump."""
+    if _index is not None:
+        for product in products:
+            if product.is_active:
+                _index.add('product', product.id, product.name)
+            else:
+                _index.discard('product', product.id)
+    _bump_version()
+
+
+def product_deleted(product):
+    if _index is not None:
+        _index.discard('product', product.id)
+    _bump_version()
+
+
+def category_changed(category, deleted=False):
+    if _index is not None:
+        if deleted:
+            _index.discard('category', category.id)
+        else:
+            _index.add('category', category.id, category.name)
+    _bump_version()
+
+
+def reset():
+    """Drop this process's copy (next lookup rebuilds)."""
+    global _index, _index_version
+    _index = None
+    _index_version = None
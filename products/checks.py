@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose contents each worker process keeps to itself
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The autocomplete trie, the branch location index (branches.geo) and the
+    chart cache tell other processes to rebuild through versions in the
+    default cache, and the home feed is invalidated there. With a
+    per-process cache the other workers never see it.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PER_PROCESS_CACHES:
+        return [Error(
+            f"The default cache ({backend}) is not shared between processes.",
+            hint="Use a shared backend (file, database, Redis or Memcached) in CACHES['default'].",
+            id='products.E001',
+        )]
+    return []
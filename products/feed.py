@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from .models import Category, Product
+from .serializers import CategorySerializer, ProductSerializer, get_favorite_ids
+
+HOME_FEED_CACHE_KEY = 'products:home_feed'
+HOME_FEED_SECTION_SIZE = 10
+
+
+def build_home_feed(section_size=HOME_FEED_SECTION_SIZE):
+    """
+    Build the shared (user independent) home feed document.
+    Runs a fixed number of queries regardless of how many categories exist:
+    one for the category list, one for popularity and one ranked product query.
+    """
+    all_categories = Category.objects.all()
+
+    # Hot categories (ordered by order count)
+    hot_categories = list(Category.objects.annotate(
+        popularity=Count('products__order_items')
+    ).order_by('-popularity', 'id'))
+
+    # Top N active products per category in a single ranked query
+    ranked_products = Product.objects.filter(is_active=True).select_related('category').annotate(
+        rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('category_id')],
+            order_by=F('id').asc(),
+        )
+    ).filter(rank__lte=section_size).order_by('category_id', 'rank')
+
+    products_by_category = {}
+    for product in ranked_products:
+        products_by_category.setdefault(product.category_id, []).append(product)
+
+    sections = []
+    for category in hot_categories:
+        products = products_by_category.get(category.id)
+        if products:
+            sections.append({
+                "category": CategorySerializer(category).data,
+                "products": ProductSerializer(products, many=True).data
+            })
+
+    return {
+        "categories": CategorySerializer(all_categories, many=True).data,
+        "sections": sections
+    }
+
+
+def get_home_feed():
+    """
+    Return the cached home feed document, rebuilding it on a cache miss.
+    """
+    document = cache.get(HOME_FEED_CACHE_KEY)
+    if document is None:
+        document = build_home_feed()
+        cache.set(HOME_FEED_CACHE_KEY, document, getattr(settings, 'HOME_FEED_CACHE_TIMEOUT', 60 * 60))
+    return document
+
+
+def invalidate_home_feed():
+    cache.delete(HOME_FEED_CACHE_KEY)
+
+
+def personalize_home_feed(document, request):
+    """
+    Overlay the per-request bits (absolute image URLs, is_favorite flags)
+    on top of the shared document without mutating it.
+    """
+    favorite_ids = get_favorite_ids({
+        'request': request,
+        'product_ids': {product['id'] for section in document['sections'] for product in section['products']},
+    })
+
+    def personalize(product):
+        image = product['image']
+        return {
+            **product,
+            'image': request.build_absolute_uri(image) if image else image,
+            'is_favorite': product['id'] in favorite_ids,
+        }
+
+    return {
+        "categories": document['categories'],
+        "sections": [
+            {
+                "category": section['category'],
+                "products": [personalize(p) for p in section['products']]
+            }
+            for section in document['sections']
+        ]
+    }
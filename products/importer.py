@@ -0,0 +1,154 @@
+"""
+Bulk product import (price lists uploaded to ProductBulkUploadView).
+
+The whole sheet is validated and normalized with pandas column operations,
+then applied set-wise inside one transaction:
+- categories: one lookup query, one bulk insert for the new names
+- products: existing ones fetched by normalized name (products.names) in
+  batches, then bulk_create / bulk_update in batches of `batch_size`
+"Panadol" and "panadol " are the same product; the first one stored wins.
+Rows that fail validation are reported as "Row <n>: <reason>" (n being the
+DataFrame index, as before) and the other rows are still imported.
+
+bulk_create / bulk_update send no post_save, so the search index, the
+autocomplete index and the home feed are updated once for the batch
+(products_bulk_changed, also used by the admin import in products.resources).
+"""
+from decimal import Decimal
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+from . import autocomplete, search
+from .feed import invalidate_home_feed
+from .models import Category, Product
+from .names import find_by_names, normalize_name
+
+REQUIRED_COLUMNS = ['name', 'category', 'price', 'stock']
+NAME_LENGTH = Product._meta.get_field('name').max_length
+UPDATE_FIELDS = ['category', 'price', 'stock', 'description', 'is_active', 'updated_at']
+
+
+class ImportFileError(ValueError):
+    """The sheet as a whole cannot be imported (e.g. a required column is missing)."""
+
+
+def _text(column):
+    column = column.astype('string').str.strip()
+    return column.mask(column == '')
+
+
+def clean_frame(df):
+    """
+    Normalize the sheet. Returns (frame of valid rows, {index: error}).
+    The frame has name, category, price (Decimal), stock (int) and description.
+    """
+    df = df.rename(columns=lambda column: str(column).strip().lower())
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+
+    frame = pd.DataFrame(index=df.index)
+    frame['name'] = _text(df['name'])
+    frame['category'] = _text(df['category'])
+    frame['description'] = _text(df['description']).fillna('') if 'description' in df.columns else ''
+    price = pd.to_numeric(df['price'], errors='coerce')
+    stock = pd.to_numeric(df['stock'], errors='coerce')
+
+    # First failing check wins for each row
+    checks = [
+        (frame['name'].isna(), "name is required"),
+        (frame['name'].str.len() > NAME_LENGTH, f"name is longer than {NAME_LENGTH} characters"),
+        (frame['category'].isna(), "category is required"),
+        (frame['category'].str.len() > NAME_LENGTH, f"category is longer than {NAME_LENGTH} characters"),
+        (price.isna() | (price < 0), "price must be a non-negative number"),
+        (stock.isna() | (stock % 1 != 0), "stock must be a whole number"),
+    ]
+    errors = {}
+    for mask, message in checks:
+        for index in mask[mask.fillna(False)].index:
+            errors.setdefault(index, message)
+
+    valid = ~frame.index.isin(list(errors))
+    frame = frame[valid].copy()
+    frame['price'] = [Decimal(str(value)).quantize(Decimal('0.01')) for value in price[valid]]
+    frame['stock'] = stock[valid].astype('int64')
+    # A name listed twice: the last row wins, as it did when rows were saved one by one
+    frame['key'] = frame['name'].map(normalize_name)
+    frame = frame[~frame['key'].duplicated(keep='last')]
+    return frame, errors
+
+
+def _batches(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def resolve_categories(names):
+    """Return {normalized name: category id}, creating the missing categories in one bulk insert."""
+    ids = {key: category.id for key, category in find_by_names(Category, names).items()}
+    new = {}
+    for name in names:
+        new.setdefault(normalize_name(name), name)
+    new = [Category(name=name, normalized_name=key) for key, name in sorted(new.items()) if key not in ids]
+    if new:
+        Category.objects.bulk_create(new)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            created = dict(Category.objects.filter(name__in=[c.name for c in new]).values_list('name', 'id'))
+            for category in new:
+                category.id = created[category.name]
+        ids.update((category.normalized_name, category.id) for category in new)
+        for category in new:
+            transaction.on_commit(lambda category=category: autocomplete.category_changed(category))
+    return ids
+
+
+def products_bulk_changed(products, batch_size=1000):
+    """What post_save would have done for products written with bulk_create / bulk_update."""
+    for batch in _batches([product.id for product in products], batch_size):
+        search.index_products(batch)
+    transaction.on_commit(lambda: autocomplete.products_changed(products))
+    transaction.on_commit(invalidate_home_feed)
+
+
+def import_products(df, batch_size=1000):
+    """
+    Create or update products from a DataFrame with name, category, price,
+    stock and (optional) description columns, matching products by normalized name.
+    Returns {"created": n, "updated": n, "errors": ["Row <n>: ...", ...]}.
+    """
+    frame, errors = clean_frame(df)
+    now = timezone.now()
+    to_create, to_update = [], []
+
+    with transaction.atomic():
+        categories = resolve_categories(frame['category'])
+        existing = find_by_names(Product, frame['name'])
+
+        for name, key, category, description, price, stock in frame[
+            ['name', 'key', 'category', 'description', 'price', 'stock']
+        ].itertuples(index=False, name=None):
+            fields = {
+                'name': name, 'normalized_name': key, 'category_id': categories[normalize_name(category)],
+                'description': description, 'price': price, 'stock': int(stock), 'is_active': True,
+            }
+            product = existing.get(key)
+            if product is not None:
+                # Keep the stored spelling of the name
+                fields['name'] = product.name
+                to_update.append(Product(id=product.id, updated_at=now, **fields))
+            else:
+                to_create.append(Product(**fields))
+
+        Product.objects.bulk_create(to_create, batch_size=batch_size)
+        Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=batch_size)
+
+        if to_create and not connection.features.can_return_rows_from_bulk_insert:
+            to_create = list(Product.objects.filter(name__in=[p.name for p in to_create]))
+        products_bulk_changed(to_create + to_update, batch_size)
+
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "errors": [f"Row {index}: {message}" for index, message in sorted(errors.items())],
+    }
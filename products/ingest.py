@@ -0,0 +1,128 @@
+"""
+Background ingest of large product files.
+
+ProductBulkUploadView stores the upload as a ProductImportJob; the
+`run_product_imports` worker reads it in chunks of PRODUCT_IMPORT_CHUNK_ROWS
+rows (pandas chunksize for CSV, read-only openpyxl for XLSX, so memory does
+not grow with the file) and runs every chunk through the bulk importer.
+A chunk's writes and the job's progress are committed together: if the job
+fails or the worker dies, the next run skips the chunks already committed.
+"""
+import csv
+import io
+import logging
+import os
+from datetime import timedelta
+from itertools import islice
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from openpyxl import load_workbook
+from .importer import import_products
+from .models import ProductImportJob
+
+logger = logging.getLogger(__name__)
+
+# A running job that made no progress for this long is assumed lost (worker died)
+RUN_TIMEOUT = timedelta(minutes=30)
+
+# Errors kept on the job, the rest are only counted
+MAX_STORED_ERRORS = 1000
+
+
+def chunk_rows():
+    return getattr(settings, 'PRODUCT_IMPORT_CHUNK_ROWS', 5000)
+
+
+def is_excel(name):
+    return os.path.splitext(name)[1].lower() == '.xlsx'
+
+
+def count_rows(job):
+    """Data rows in the file (for progress), without loading it."""
+    with job.file.open('rb') as f:
+        if is_excel(job.file.name):
+            sheet = load_workbook(f, read_only=True).active
+            return max((sheet.max_row or 1) - 1, 0)
+        # Records, not lines: a quoted field may span lines. Blank lines are skipped, as by read_csv
+        text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+        return max(sum(1 for row in csv.reader(text) if row) - 1, 0)
+
+
+def read_chunks(job, size):
+    """Yield DataFrames of at most `size` rows, indexed by row position in the file."""
+    with job.file.open('rb') as f:
+        if not is_excel(job.file.name):
+            yield from pd.read_csv(f, dtype=str, keep_default_na=False, chunksize=size)
+            return
+        rows = load_workbook(f, read_only=True).active.iter_rows(values_only=True)
+        header = [str(cell or '') for cell in next(rows, [])]
+        start = 0
+        while batch := list(islice(rows, size)):
+            yield pd.DataFrame(
+                [['' if cell is None else str(cell) for cell in row] for row in batch],
+                columns=header, index=range(start, start + len(batch)),
+            )
+            start += len(batch)
+
+
+def claim_job():
+    """Mark the oldest queued (or abandoned running) job as running and return it."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = ProductImportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status='queued') | Q(status='running', started_at__lt=now - RUN_TIMEOUT)
+        ).order_by('created_at').first()
+        if job is None:
+            return None
+        job.status, job.started_at, job.error = 'running', now, ''
+        job.save(update_fields=['status', 'started_at', 'error'])
+    return job
+
+
+def run_job(job):
+    """Import the chunks not committed yet. Returns the job."""
+    try:
+        if job.total_rows is None:
+            job.total_rows = count_rows(job)
+            job.save(update_fields=['total_rows'])
+
+        for number, frame in enumerate(read_chunks(job, chunk_rows())):
+            if number < job.chunks_done:
+                continue
+            with transaction.atomic():
+                result = import_products(frame)
+                job.chunks_done = number + 1
+                job.rows_processed += len(frame)
+                job.created_count += result['created']
+                job.updated_count += result['updated']
+                job.errors = (job.errors + result['errors'])[:MAX_STORED_ERRORS]
+                # Also serves as the worker's heartbeat
+                job.started_at = timezone.now()
+                job.save(update_fields=[
+                    'chunks_done', 'rows_processed', 'created_count', 'updated_count', 'errors', 'started_at',
+                ])
+        job.status = 'done'
+    except Exception as e:
+        logger.error(f"Product import {job.id} failed after {job.chunks_done} chunks: {e}", exc_info=True)
+        job.status, job.error = 'failed', str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def resume_job(job):
+    """Queue a failed job again; it continues after its last committed chunk."""
+    return ProductImportJob.objects.filter(pk=job.pk, status='failed').update(
+        status='queued', error='', finished_at=None
+    )
+
+
+def process_jobs():
+    """Run one queued job if there is one. Returns the job or None."""
+    job = claim_job()
+    if job is not None:
+        run_job(job)
+    return job
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from products.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text product search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products."))
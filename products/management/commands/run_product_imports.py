@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from products.ingest import process_jobs
+
+class Command(BaseCommand):
+    help = 'Imports queued product files in chunks (runs until interrupted unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the queued jobs and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                job = process_jobs()
+                if job is not None:
+                    total += 1
+                    self.stdout.write(
+                        f"Product import {job.id}: {job.status} "
+                        f"({job.rows_processed} rows, {job.created_count} created, {job.updated_count} updated)"
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} product imports."))
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts "
+            "USING fts5(name, description, category, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO products_product_fts (rowid, name, description, category) "
+            "SELECT p.id, p.name, p.description, c.name FROM products_product p "
+            "JOIN products_category c ON c.id = p.category_id"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS products_product_search ("
+            "product_id bigint PRIMARY KEY REFERENCES products_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS products_product_search_gin "
+            "ON products_product_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO products_product_search (product_id, document) "
+            "SELECT p.id, setweight(to_tsvector('simple', p.name), 'A') || "
+            "setweight(to_tsvector('simple', c.name), 'B') || "
+            "setweight(to_tsvector('simple', p.description), 'C') "
+            "FROM products_product p JOIN products_category c ON c.id = p.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_favorite_favorite_user_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations, models
+from products.names import normalize_name
+
+
+def populate_normalized_names(apps, schema_editor):
+    for model_name in ('Category', 'Product'):
+        model = apps.get_model('products', model_name)
+        batch = []
+        for instance in model.objects.only('id', 'name').order_by('id').iterator(chunk_size=2000):
+            instance.normalized_name = normalize_name(instance.name)
+            batch.append(instance)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['normalized_name'])
+                batch = []
+        model.objects.bulk_update(batch, ['normalized_name'])
+
+
+def reindex_products(apps, schema_editor):
+    # The search index now holds normalized names ("400 mg" -> "400mg").
+    # Plain SQL against the tables as of this migration, like 0003, so later
+    # changes to products.search cannot break it.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DELETE FROM products_product_fts")
+        schema_editor.execute(
+            "INSERT INTO products_product_fts (rowid, name, description, category) "
+            "SELECT p.id, p.normalized_name, p.description, c.name FROM products_product p "
+            "JOIN products_category c ON c.id = p.category_id"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("TRUNCATE products_product_search")
+        schema_editor.execute(
+            "INSERT INTO products_product_search (product_id, document) "
+            "SELECT p.id, setweight(to_tsvector('simple', p.normalized_name), 'A') || "
+            "setweight(to_tsvector('simple', c.name), 'B') || "
+            "setweight(to_tsvector('simple', p.description), 'C') "
+            "FROM products_product p JOIN products_category c ON c.id = p.category_id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_name_lower_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='category',
+            name='category_name_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_name_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_normalized_names, migrations.RunPython.noop),
+        migrations.RunPython(reindex_products, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['normalized_name'], name='category_normalized_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['normalized_name'], name='product_normalized_name_idx'),
+        ),
+    ]
@@ -1,13 +1,31 @@
+import uuid
 from django.db import models
 from django.conf import settings
+from .names import normalize_name
+
+def _save_kwargs(kwargs):
+    # A save limited to update_fields=['name'] must write the key as well
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'name' in update_fields:
+        kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+    return kwargs
 
 class Category(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    # products.names.normalize_name(name), kept by save()
+    normalized_name = models.CharField(max_length=255, editable=False, default='')
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            models.Index(fields=['normalized_name'], name='category_normalized_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **_save_kwargs(kwargs))
 
     def __str__(self):
         return self.name
@@ -15,6 +33,8 @@ class Category(models.Model):
 class Product(models.Model):
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
+    # products.names.normalize_name(name), kept by save()
+    normalized_name = models.CharField(max_length=255, editable=False, default='')
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
@@ -23,6 +43,19 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', '-created_at', '-id'], name='product_active_created_idx'),
+            models.Index(fields=['normalized_name'], name='product_normalized_name_idx'),
+            # ?ordering=price / stock, keyset paginated on (field, id)
+            models.Index(fields=['is_active', 'price', 'id'], name='product_active_price_idx'),
+            models.Index(fields=['is_active', 'stock', 'id'], name='product_active_stock_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **_save_kwargs(kwargs))
+
     def __str__(self):
         return self.name
 
@@ -33,6 +66,51 @@ class Favorite(models.Model):
 
     class Meta:
         unique_together = ('user', 'product')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='favorite_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.product}"
+
+class ProductImportJob(models.Model):
+    """
+    A product file imported in the background by `manage.py run_product_imports`.
+    The file is read in chunks and each chunk is committed together with the
+    progress fields, so a failed or interrupted job resumes after `chunks_done`.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    chunks_done = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='product_imports')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='product_import_status_idx'),
+        ]
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return 100 if self.status == 'done' else 0
+        return min(100, self.rows_processed * 100 // self.total_rows)
+
+    def __str__(self):
+        return f"Product import {self.id} ({self.status})"
@@ -0,0 +1,34 @@
+"""
+Canonical product / category names.
+
+normalize_name() is the key two names are "the same" by: Unicode NFKC,
+casefolded, whitespace collapsed and strength units attached to their
+number ("Panadol  500 MG " -> "panadol 500mg"). Product and Category keep
+it in an indexed `normalized_name` column (set on save), so exact-name
+lookups from imports, bulk upload and search are index seeks.
+"""
+import re
+import unicodedata
+
+UNITS = ('mcg', 'μg', 'mg', 'g', 'kg', 'ml', 'l', 'iu', 'units', '%')
+_UNIT_GAP = re.compile(r'(\d)\s+(' + '|'.join(re.escape(unit) for unit in UNITS) + r')(?![a-z])')
+MAX_LENGTH = 255
+
+
+def normalize_name(value):
+    value = unicodedata.normalize('NFKC', str(value if value is not None else '')).casefold()
+    value = ' '.join(value.split())
+    return _UNIT_GAP.sub(r'\1\2', value)[:MAX_LENGTH]
+
+
+def find_by_names(model, names, batch_size=2000):
+    """
+    {normalized name: instance} for the given names, one indexed query per
+    batch_size names. When several rows share a key the oldest wins.
+    """
+    keys = sorted({normalize_name(name) for name in names if name is not None and str(name).strip()})
+    found = {}
+    for start in range(0, len(keys), batch_size):
+        for instance in model.objects.filter(normalized_name__in=keys[start:start + batch_size]).order_by('id'):
+            found.setdefault(instance.normalized_name, instance)
+    return found
@@ -1,6 +1,14 @@
+from django.utils import timezone
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
 from .models import Product, Category
+from .importer import products_bulk_changed
+from .names import find_by_names, normalize_name
+
+
+def _column(dataset, name):
+    return dataset[name] if dataset.headers and name in dataset.headers else []
+
 
 class CategoryResource(resources.ModelResource):
     class Meta:
@@ -8,38 +16,48 @@ class CategoryResource(resources.ModelResource):
         fields = ('id', 'name')
         import_id_fields = ('name',)
 
+    def before_import(self, dataset, **kwargs):
+        self.categories = find_by_names(Category, _column(dataset, 'name'))
+
     def get_instance(self, instance_loader, row):
         """
-        Override to perform case-insensitive lookup for existing Categories.
+        Case-insensitive lookup for existing Categories.
         If CSV has 'devices' and DB has 'Devices', we return 'Devices'.
         """
         name = row.get('name')
         if name:
-            try:
-                # Try case-insensitive exact match
-                return Category.objects.get(name__iexact=name)
-            except Category.DoesNotExist:
-                return None
-            except Category.MultipleObjectsReturned:
-                # Fallback: just return the first one found (edge case)
-                return Category.objects.filter(name__iexact=name).first()
+            return self.categories.get(normalize_name(name))
         return None
 
+    def save_instance(self, instance, is_create, row, **kwargs):
+        super().save_instance(instance, is_create, row, **kwargs)
+        # Later rows of the same file ('devices' after 'Devices') update this one
+        self.categories.setdefault(normalize_name(instance.name), instance)
+
 # Custom Widget: Searches for Category by name (Case-Insensitive). If not found, CREATES it.
 class GetOrCreateForeignKeyWidget(ForeignKeyWidget):
+    # {normalized name: instance}, filled by the resource's before_import
+    lookup = None
+
     def clean(self, value, row=None, *args, **kwargs):
         if value:
-            # 1. Try to find existing category (Case Insensitive)
-            try:
-                return self.model.objects.get(name__iexact=value)
-            except self.model.DoesNotExist:
-                # 2. If not found, create it (using the original casing from file)
-                return self.model.objects.create(name=value)
-            except self.model.MultipleObjectsReturned:
-                 return self.model.objects.filter(name__iexact=value).first()
+            if self.lookup is not None:
+                # 1. Try to find existing category in the prefetched map
+                key = normalize_name(value)
+                if key not in self.lookup:
+                    # 2. If not found, create it (using the original casing from file)
+                    self.lookup[key] = self.model.objects.create(name=value)
+                return self.lookup[key]
+            found = find_by_names(self.model, [value])
+            return found.get(normalize_name(value)) or self.model.objects.create(name=value)
         return None
 
 class ProductResource(resources.ModelResource):
+    """
+    Products and categories named in the file are fetched up front
+    (before_import) into maps keyed by normalized name, so rows resolve
+    without queries, and rows are written with bulk_create / bulk_update.
+    """
     # Field mapping with the custom widget
     category = fields.Field(
         column_name='category',
@@ -53,19 +71,22 @@ class ProductResource(resources.ModelResource):
         import_id_fields = ('name',)
         # whitelist fields to import
         fields = ('name', 'category', 'price', 'stock', 'description', 'is_active')
+        use_bulk = True
+        batch_size = 1000
+
+    def before_import(self, dataset, **kwargs):
+        self.products = find_by_names(Product, _column(dataset, 'name'))
+        self.fields['category'].widget.lookup = find_by_names(Category, _column(dataset, 'category'))
+        self.saved = []
 
     def get_instance(self, instance_loader, row):
         """
         Case-insensitive lookup for Products (e.g., 'panadol' matches 'Panadol').
+        A product created by an earlier row of the same file is found too.
         """
         name = row.get('name')
         if name:
-            try:
-                return Product.objects.get(name__iexact=name)
-            except Product.DoesNotExist:
-                return None
-            except Product.MultipleObjectsReturned:
-                return Product.objects.filter(name__iexact=name).first()
+            return self.products.get(normalize_name(name))
         return None
 
     def before_import_row(self, row, **kwargs):
@@ -74,17 +95,39 @@ class ProductResource(resources.ModelResource):
         """
         name = row.get('name')
         new_stock = row.get('stock')
-        
+
         if name and new_stock:
-            # Try to find the existing product using our case-insensitive logic
-            try:
-                product = Product.objects.get(name__iexact=name)
-                # If found, add the stocks
+            product = self.products.get(normalize_name(name))
+            # If found, add the stocks
+            if product is not None:
                 try:
                     current_stock = int(product.stock)
                     added_stock = int(new_stock)
                     row['stock'] = current_stock + added_stock
                 except ValueError:
                     pass # Invalid integer in CSV or DB, ignore
-            except Product.DoesNotExist:
-                pass # New product, keep row['stock'] as is
+
+    def get_bulk_update_fields(self):
+        # bulk_update skips auto_now, updated_at is set in before_save_instance
+        return super().get_bulk_update_fields() + ['updated_at']
+
+    def before_save_instance(self, instance, row, **kwargs):
+        # Bulk writes skip Product.save()
+        instance.normalized_name = normalize_name(instance.name)
+        instance.updated_at = timezone.now()
+
+    def save_instance(self, instance, is_create, row, **kwargs):
+        if not is_create and instance.pk is None:
+            # Created by an earlier row of the file and still queued for bulk_create,
+            # which will save it with the stock added up
+            self.before_save_instance(instance, row, **kwargs)
+            self.after_save_instance(instance, row, **kwargs)
+            return
+        super().save_instance(instance, is_create, row, **kwargs)
+        self.products.setdefault(normalize_name(instance.name), instance)
+        self.saved.append(instance)
+
+    def after_import(self, dataset, result, **kwargs):
+        # Bulk writes send no post_save: update the search / autocomplete indexes once
+        if not result.has_errors():
+            products_bulk_changed([product for product in self.saved if product.pk])
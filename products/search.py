@@ -0,0 +1,247 @@
+"""
+Full-text product search.
+
+Products are mirrored into a side index keyed by product id:
+- SQLite: an FTS5 virtual table (rowid = product id)
+- PostgreSQL: a table of weighted tsvectors with a GIN index
+Other backends fall back to icontains lookups.
+The index tables are created by migration 0003_product_search_index and kept
+in sync by products.signals; `manage.py rebuild_search_index` repopulates them.
+"""
+import re
+from django.db import connection
+from django.db.models import Case, Q, When
+from django.db.models.expressions import RawSQL
+from .models import Product
+from .names import normalize_name
+
+SQLITE_TABLE = 'products_product_fts'
+POSTGRES_TABLE = 'products_product_search'
+
+
+def _tokens(query):
+    return re.findall(r'\w+', normalize_name(query))
+
+
+def _search_rows(product_ids=None, category_id=None):
+    # Names are indexed normalized (see products.names), like the queries
+    queryset = Product.objects.all()
+    if product_ids is not None:
+        queryset = queryset.filter(id__in=product_ids)
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    return queryset.values_list('id', 'normalized_name', 'description', 'category__name')
+
+
+class SQLiteSearchBackend:
+    def match_query(self, tokens):
+        # Every term must match, each as a prefix ("pana" finds "panadol")
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def index(self, cursor, rows):
+        self.remove(cursor, [row[0] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)",
+            rows
+        )
+
+    def remove(self, cursor, product_ids):
+        if product_ids:
+            placeholders = ', '.join(['%s'] * len(product_ids))
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+
+    def matching_ids_sql(self, tokens):
+        return f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [self.match_query(tokens)]
+
+    def ranked_sql(self, tokens, name):
+        # Exact name first, then bm25 with column weights: name, description, category
+        return (
+            f"SELECT p.id FROM {SQLITE_TABLE} f JOIN products_product p ON p.id = f.rowid "
+            f"WHERE {SQLITE_TABLE} MATCH %s AND p.is_active "
+            f"ORDER BY p.normalized_name = %s DESC, bm25({SQLITE_TABLE}, 10.0, 1.0, 4.0), p.id",
+            [self.match_query(tokens), name]
+        )
+
+    def count_sql(self, tokens):
+        return (
+            f"SELECT COUNT(*) FROM {SQLITE_TABLE} f JOIN products_product p ON p.id = f.rowid "
+            f"WHERE {SQLITE_TABLE} MATCH %s AND p.is_active",
+            [self.match_query(tokens)]
+        )
+
+
+class PostgresSearchBackend:
+    document = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C')"
+    )
+
+    def match_query(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def index(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES (%s, {self.document}) "
+            f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            [(pk, name, category or '', description or '') for pk, name, description, category in rows]
+        )
+
+    def remove(self, cursor, product_ids):
+        if product_ids:
+            cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE product_id = ANY(%s)", [list(product_ids)])
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {POSTGRES_TABLE}")
+
+    def matching_ids_sql(self, tokens):
+        return (
+            f"SELECT product_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+            [self.match_query(tokens)]
+        )
+
+    def ranked_sql(self, tokens, name):
+        # Exact name first, then by rank
+        return (
+            f"SELECT p.id FROM {POSTGRES_TABLE} s JOIN products_product p ON p.id = s.product_id, "
+            f"to_tsquery('simple', %s) q WHERE s.document @@ q AND p.is_active "
+            f"ORDER BY p.normalized_name = %s DESC, ts_rank(s.document, q) DESC, p.id",
+            [self.match_query(tokens), name]
+        )
+
+    def count_sql(self, tokens):
+        return (
+            f"SELECT COUNT(*) FROM {POSTGRES_TABLE} s JOIN products_product p ON p.id = s.product_id "
+            f"WHERE s.document @@ to_tsquery('simple', %s) AND p.is_active",
+            [self.match_query(tokens)]
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class() if backend_class else None
+
+
+def index_products(product_ids):
+    """(Re)index the given products."""
+    backend = get_backend()
+    if backend is None or not product_ids:
+        return
+    rows = list(_search_rows(product_ids=product_ids))
+    with connection.cursor() as cursor:
+        backend.index(cursor, rows)
+
+
+def index_category(category_id):
+    """Reindex every product in a category (e.g. after a rename)."""
+    backend = get_backend()
+    if backend is None:
+        return
+    rows = list(_search_rows(category_id=category_id))
+    with connection.cursor() as cursor:
+        backend.index(cursor, rows)
+
+
+def remove_products(product_ids):
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        backend.remove(cursor, list(product_ids))
+
+
+def rebuild_index(batch_size=2000):
+    """Repopulate the whole index. Returns the number of indexed products."""
+    backend = get_backend()
+    if backend is None:
+        return 0
+    total = 0
+    with connection.cursor() as cursor:
+        backend.clear(cursor)
+        batch = []
+        for row in _search_rows().order_by('id').iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                backend.index(cursor, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            backend.index(cursor, batch)
+            total += len(batch)
+    return total
+
+
+def filter_products(queryset, query):
+    """Restrict a Product queryset to index matches (unranked)."""
+    tokens = _tokens(query)
+    if not tokens:
+        return queryset
+    backend = get_backend()
+    if backend is None:
+        conditions = Q()
+        for token in tokens:
+            conditions &= Q(normalized_name__icontains=token) | Q(category__name__icontains=token)
+        return queryset.filter(conditions)
+    sql, params = backend.matching_ids_sql(tokens)
+    return queryset.filter(id__in=RawSQL(sql, params))
+
+
+class SearchResults:
+    """
+    Lazy, ranked result sequence for a search query.
+    Supports count() and slicing so DRF's LimitOffsetPagination can page it:
+    only the requested slice of products is ever loaded.
+    """
+    def __init__(self, query):
+        self.tokens = _tokens(query)
+        self.name = normalize_name(query)
+        self.backend = get_backend()
+
+    def _fallback_queryset(self):
+        return filter_products(
+            Product.objects.filter(is_active=True), ' '.join(self.tokens)
+        ).alias(
+            exact=Case(When(normalized_name=self.name, then=0), default=1)
+        ).order_by('exact', 'name', 'id')
+
+    def count(self):
+        if not self.tokens:
+            return 0
+        if self.backend is None:
+            return self._fallback_queryset().count()
+        sql, params = self.backend.count_sql(self.tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError("SearchResults only supports slicing.")
+        if not self.tokens:
+            return []
+        if self.backend is None:
+            return list(self._fallback_queryset().select_related('category')[item])
+
+        start = item.start or 0
+        sql, params = self.backend.ranked_sql(self.tokens, self.name)
+        if item.stop is not None:
+            sql, params = f"{sql} LIMIT %s OFFSET %s", params + [item.stop - start, start]
+        elif start:
+            raise TypeError("Open-ended slices must start at 0.")
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [row[0] for row in cursor.fetchall()]
+        products = Product.objects.select_related('category').in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
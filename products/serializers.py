@@ -1,11 +1,53 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Category, Product, Favorite
+from .models import Category, Product, Favorite, ProductImportJob
+from .names import normalize_name
+
+def validate_unique_name(serializer, model, value):
+    """Reject names equal to an existing one up to case, spacing and units."""
+    others = model.objects.filter(normalized_name=normalize_name(value))
+    if serializer.instance is not None:
+        others = others.exclude(pk=serializer.instance.pk)
+    if others.exists():
+        raise serializers.ValidationError(f"A {model._meta.verbose_name} with this name already exists.")
+    return value
+
+FAVORITE_LOOKUP_BATCH = 500  # below SQLite's 999 parameters per query
+
+def get_favorite_ids(context):
+    """
+    Product IDs favorited by the requesting user, among context['product_ids']
+    (the products being rendered). Loaded once and kept on the serializer
+    context, which list and nested serializers share, so is_favorite costs one
+    query per response however many favorites the user has.
+    """
+    if 'favorite_ids' not in context:
+        request = context.get('request')
+        product_ids = list(context.get('product_ids', []))
+        favorite_ids = set()
+        if request and request.user.is_authenticated:
+            for start in range(0, len(product_ids), FAVORITE_LOOKUP_BATCH):
+                favorite_ids.update(Favorite.objects.filter(
+                    user=request.user, product_id__in=product_ids[start:start + FAVORITE_LOOKUP_BATCH]
+                ).values_list('product_id', flat=True))
+        context['favorite_ids'] = favorite_ids
+    return context['favorite_ids']
+
+class RenderedProductsListSerializer(serializers.ListSerializer):
+    """Records which products the response renders (for get_favorite_ids) before the items are serialized."""
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context.setdefault('product_ids', [self.child.rendered_product_id(item) for item in items])
+        return super().to_representation(items)
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'image', 'created_at']
 
+    def validate_name(self, value):
+        return validate_unique_name(self, Category, value)
+
 class ProductSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     is_favorite = serializers.SerializerMethodField()
@@ -18,12 +60,20 @@ class ProductSerializer(serializers.ModelSerializer):
             'is_active', 'created_at', 'updated_at',
             'is_favorite'
         ]
+        list_serializer_class = RenderedProductsListSerializer
+
+    @staticmethod
+    def rendered_product_id(obj):
+        return obj.id
+
+    def validate_name(self, value):
+        return validate_unique_name(self, Product, value)
 
     def get_is_favorite(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return Favorite.objects.filter(user=user, product=obj).exists()
-        return False
+        if 'product_ids' not in self.context:
+            # A single product (retrieve, create): look up just that one
+            return obj.id in get_favorite_ids({'request': self.context.get('request'), 'product_ids': [obj.id]})
+        return obj.id in get_favorite_ids(self.context)
 
 class FavoriteSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -35,6 +85,23 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ['id', 'product', 'product_id', 'created_at']
         read_only_fields = ['user']
+        list_serializer_class = RenderedProductsListSerializer
+
+    @staticmethod
+    def rendered_product_id(obj):
+        return obj.product_id
 
 class ProductBulkUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
+    # Import in the background even if the file is small
+    background = serializers.BooleanField(required=False, default=False)
+
+class ProductImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ProductImportJob
+        fields = [
+            'id', 'status', 'progress', 'total_rows', 'rows_processed', 'chunks_done',
+            'created_count', 'updated_count', 'errors', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, Product
+from .feed import invalidate_home_feed
+from . import autocomplete, search
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender='orders.OrderItem')
+@receiver(post_delete, sender='orders.OrderItem')
+# OrderItems are bulk created (no post_save), the order header save follows them
+@receiver(post_save, sender='orders.Order')
+def invalidate_home_feed_on_change(sender, **kwargs):
+    # Drop it now and again on commit, so a feed rebuilt mid-transaction is not kept
+    invalidate_home_feed()
+    transaction.on_commit(invalidate_home_feed)
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, **kwargs):
+    search.index_products([instance.id])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    search.remove_products([instance.id])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        search.index_category(instance.id)
+
+
+@receiver(post_save, sender=Product)
+def update_autocomplete_on_product_save(sender, instance, **kwargs):
+    autocomplete.product_changed(instance)
+
+
+@receiver(post_delete, sender=Product)
+def update_autocomplete_on_product_delete(sender, instance, **kwargs):
+    autocomplete.product_deleted(instance)
+
+
+@receiver(post_save, sender=Category)
+def update_autocomplete_on_category_save(sender, instance, **kwargs):
+    autocomplete.category_changed(instance)
+
+
+@receiver(post_delete, sender=Category)
+def update_autocomplete_on_category_delete(sender, instance, **kwargs):
+    autocomplete.category_changed(instance, deleted=True)
@@ -1,8 +1,26 @@
-from django.urls import reverse
+from decimal import Decimal
+import shutil
+import tempfile
+from unittest.mock import patch
+import tablib
+from openpyxl import Workbook
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, resolve
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from .models import Category, Product
+from django.core.cache import cache
+from .models import Category, Product, Favorite, ProductImportJob
+from . import autocomplete
+from .views import ProductBulkUploadView
+from .resources import CategoryResource, ProductResource
+from .serializers import ProductSerializer
+from .names import normalize_name
+from .importer import import_products
+from . import ingest
 
 User = get_user_model()
 
@@ -30,6 +48,38 @@ class ProductTests(APITestCase):
         response = self.client.get(self.product_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_list_products_cursor_pagination(self):
+        for i in range(25):
+            Product.objects.create(name=f'Product {i}', category=self.category, price=1, stock=1)
+
+        first = self.client.get(self.product_url)
+        self.assertEqual(len(first.data['results']), 20)
+        self.assertIsNotNone(first.data['next'])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 6)
+        self.assertIsNone(second.data['next'])
+        ids = [p['id'] for p in first.data['results'] + second.data['results']]
+        self.assertEqual(len(set(ids)), 26)
+
+    def test_cursor_pagination_on_non_unique_ordering(self):
+        # Many products share a price: the cursor must key on (price, id), not price + offset
+        for i in range(30):
+            Product.objects.create(name=f'Product {i}', category=self.category, price=i % 3, stock=1)
+        expected = list(Product.objects.filter(is_active=True).order_by('price', 'id').values_list('id', flat=True))
+
+        pages, url = [], self.product_url + '?ordering=price&page_size=7'
+        while url:
+            response = self.client.get(url)
+            pages.append(response.data)
+            url = response.data['next']
+        self.assertEqual([p['id'] for page in pages for p in page['results']], expected)
+
+        back = self.client.get(pages[2]['previous'])
+        self.assertEqual([p['id'] for p in back.data['results']], [p['id'] for p in pages[1]['results']])
+        self.assertIsNone(pages[0]['previous'])
+        self.assertEqual(self.client.get(self.product_url + '?cursor=bogus').status_code, status.HTTP_404_NOT_FOUND)
+
     def test_create_product_admin(self):
         self.client.force_authenticate(user=self.admin)
         data = {
@@ -51,3 +101,429 @@ class ProductTests(APITestCase):
         }
         response = self.client.post(self.product_url, data)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class HomeFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='test@example.com', password='password123', is_active=True)
+        self.home_url = reverse('home')
+        for i in range(3):
+            category = Category.objects.create(name=f'Category {i}')
+            for j in range(12):
+                Product.objects.create(name=f'Product {i}-{j}', category=category, price=10, stock=5)
+
+    def test_home_sections_limited_per_category(self):
+        response = self.client.get(self.home_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['categories']), 3)
+        self.assertEqual(len(response.data['sections']), 3)
+        for section in response.data['sections']:
+            self.assertEqual(len(section['products']), 10)
+
+    def test_home_query_count_independent_of_categories(self):
+        with self.assertNumQueries(3):
+            self.client.get(self.home_url)
+        # Served from cache afterwards
+        with self.assertNumQueries(0):
+            self.client.get(self.home_url)
+
+    def test_home_overlays_user_favorites(self):
+        product = Product.objects.get(name='Product 0-0')
+        Favorite.objects.create(user=self.user, product=product)
+        self.client.get(self.home_url)  # warm the shared cache anonymously
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.home_url)
+        favorites = [p['id'] for s in response.data['sections'] for p in s['products'] if p['is_favorite']]
+        self.assertEqual(favorites, [product.id])
+
+    def test_home_invalidated_on_product_change(self):
+        self.client.get(self.home_url)
+        category = Category.objects.create(name='New Category')
+        Product.objects.create(name='Fresh', category=category, price=1, stock=1)
+        response = self.client.get(self.home_url)
+        self.assertEqual(len(response.data['sections']), 4)
+
+class FavoriteBatchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='password123', is_active=True)
+        self.category = Category.objects.create(name='Medicine')
+        for i in range(20):
+            product = Product.objects.create(name=f'Product {i}', category=self.category, price=10, stock=5)
+            if i % 2:
+                Favorite.objects.create(user=self.user, product=product)
+        self.client.force_authenticate(user=self.user)
+
+    def test_product_list_resolves_favorites_in_one_query(self):
+        # One query for the products, one for the user's favorite IDs
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-list'))
+        self.assertEqual(sum(1 for p in response.data['results'] if p['is_favorite']), 10)
+
+    def test_favorites_lookup_is_limited_to_rendered_products(self):
+        page = list(Product.objects.order_by('id')[:3])
+        with CaptureQueriesContext(connection) as ctx:
+            data = ProductSerializer(page, many=True, context={'request': self.client_request()}).data
+        self.assertEqual([p['is_favorite'] for p in data], [False, True, False])
+        favorite_sql = [q['sql'] for q in ctx.captured_queries if 'products_favorite' in q['sql']]
+        self.assertEqual(len(favorite_sql), 1)
+        self.assertIn('"product_id" IN (', favorite_sql[0])
+
+        single = ProductSerializer(page[1], context={'request': self.client_request()}).data
+        self.assertTrue(single['is_favorite'])
+
+    def client_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return request
+
+    def test_favorite_list_marks_nested_products(self):
+        response = self.client.get(reverse('favorite-list'))
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertTrue(all(f['product']['is_favorite'] for f in response.data['results']))
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        self.medicine = Category.objects.create(name='Medicine')
+        self.baby = Category.objects.create(name='Baby Care')
+        self.panadol = Product.objects.create(name='Panadol Extra', category=self.medicine, price=10, stock=5)
+        self.brufen = Product.objects.create(name='Brufen 400mg', category=self.medicine, price=10, stock=5,
+                                             description='Pain relief, like panadol')
+        self.diapers = Product.objects.create(name='Pampers Diapers', category=self.baby, price=10, stock=5)
+        self.search_url = reverse('product-search')
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        response = self.client.get(self.search_url, {'q': 'pana'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([p['name'] for p in response.data['results']], ['Panadol Extra', 'Brufen 400mg'])
+
+    def test_search_matches_category_name(self):
+        response = self.client.get(self.search_url, {'q': 'baby'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.diapers.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.diapers.name = 'Huggies Diapers'
+        self.diapers.save()
+        self.assertEqual(self.client.get(self.search_url, {'q': 'huggies'}).data['count'], 1)
+
+        self.baby.name = 'Infant'
+        self.baby.save()
+        self.assertEqual(self.client.get(self.search_url, {'q': 'infant'}).data['count'], 1)
+
+        self.diapers.delete()
+        self.assertEqual(self.client.get(self.search_url, {'q': 'huggies'}).data['count'], 0)
+
+    def test_list_search_param_uses_index(self):
+        response = self.client.get(reverse('product-list'), {'search': 'brufen'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.brufen.id])
+
+class AutocompleteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.category = Category.objects.create(name='Pain Relief')
+        self.panadol = Product.objects.create(name='Panadol Extra', category=self.category, price=10, stock=5)
+        self.panadol_cf = Product.objects.create(name='Panadol CF', category=self.category, price=10, stock=5)
+        self.brufen = Product.objects.create(name='Brufen 400mg', category=self.category, price=10, stock=5)
+        self.url = reverse('product-autocomplete')
+
+    def tearDown(self):
+        autocomplete.reset()
+
+    def test_prefix_suggestions_without_queries(self):
+        self.client.get(self.url, {'q': 'pan'})  # build the index
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'pana'})
+        self.assertEqual({s['id'] for s in response.data}, {self.panadol.id, self.panadol_cf.id})
+
+    def test_word_prefix_and_typo(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'extra'}).data[0]['id'], self.panadol.id)
+        self.assertEqual(self.client.get(self.url, {'q': 'brufn'}).data[0]['id'], self.brufen.id)
+
+    def test_index_updated_incrementally(self):
+        self.client.get(self.url, {'q': 'pan'})
+        Product.objects.create(name='Ponstan Forte', category=self.category, price=10, stock=5)
+        self.brufen.delete()
+        self.assertEqual(self.client.get(self.url, {'q': 'ponst'}).data[0]['text'], 'Ponstan Forte')
+        self.assertEqual(self.client.get(self.url, {'q': 'brufen'}).data, [])
+
+    def test_requires_a_cache_shared_between_processes(self):
+        from .checks import check_shared_cache
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([e.id for e in check_shared_cache(None)], ['products.E001'])
+
+class BulkUploadTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.client.force_authenticate(user=self.admin)
+        self.medicine = Category.objects.create(name='Medicine')
+        self.panadol = Product.objects.create(name='Panadol', category=self.medicine, price=10, stock=100)
+        self.url = reverse('bulk-upload')
+
+    def tearDown(self):
+        autocomplete.reset()
+
+    def upload(self, content, name='prices.csv'):
+        return self.client.post(self.url, {'file': SimpleUploadedFile(name, content.encode())}, format='multipart')
+
+    def test_url_is_not_shadowed_by_product_detail(self):
+        self.assertEqual(resolve(self.url).func.view_class, ProductBulkUploadView)
+
+    def test_creates_updates_and_reports_bad_rows(self):
+        response = self.upload(
+            "name,category,price,stock,description\n"
+            "Panadol,Medicine,12.5,40,\n"
+            "Brufen 400mg,Pain Relief,25,10,Tablets\n"
+            ",Medicine,1,1,\n"
+            "Ponstan,Medicine,abc,1,\n"
+            "Disprin,Medicine,3,1.5,\n"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(response.data['errors'], [
+            "Row 2: name is required",
+            "Row 3: price must be a non-negative number",
+            "Row 4: stock must be a whole number",
+        ])
+
+        self.panadol.refresh_from_db()
+        self.assertEqual((self.panadol.price, self.panadol.stock), (Decimal('12.50'), 40))
+        brufen = Product.objects.get(name='Brufen 400mg')
+        self.assertEqual((brufen.category.name, brufen.description, brufen.is_active), ('Pain Relief', 'Tablets', True))
+        # bulk writes skip post_save, the import updates the indexes itself
+        self.assertEqual(self.client.get(reverse('product-search'), {'q': 'brufen'}).data['count'], 1)
+        self.assertEqual(self.client.get(reverse('product-autocomplete'), {'q': 'brufe'}).data[0]['id'], brufen.id)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def sheet(count):
+            return "name,category,price,stock\n" + "".join(
+                f"Item {count}-{n},Category {count}-{n % 3},{n},{n}\n" for n in range(count)
+            )
+        with CaptureQueriesContext(connection) as small:
+            self.upload(sheet(5))
+        with CaptureQueriesContext(connection) as large:
+            # Under SQLite's 999 parameters per INSERT, so the bulk insert stays one statement
+            response = self.upload(sheet(90))
+        self.assertEqual(response.data['created'], 90)
+        self.assertEqual(len(large), len(small))
+
+    def test_missing_column(self):
+        response = self.upload("name,price\nPanadol,1\n")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('category', response.data['error'])
+
+class ProductResourceImportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.devices = Category.objects.create(name='Devices')
+        self.thermometer = Product.objects.create(name='Thermometer', category=self.devices, price=500, stock=5)
+
+    def tearDown(self):
+        autocomplete.reset()
+
+    def run_import(self, rows):
+        dataset = tablib.Dataset(headers=['name', 'category', 'price', 'stock', 'description', 'is_active'])
+        for row in rows:
+            dataset.append(row)
+        return ProductResource().import_data(dataset, dry_run=False, use_transactions=True)
+
+    def test_case_insensitive_match_adds_stock(self):
+        result = self.run_import([
+            ('thermometer', 'devices', 550, 10, '', 1),
+            ('Glucometer', 'DEVICES', 2000, 3, '', 1),
+            ('GLUCOMETER', 'devices', 2000, 4, '', 1),
+            ('Ors Sachet', 'Hydration', 20, 50, '', 1),
+        ])
+        self.assertFalse(result.has_errors())
+        self.thermometer.refresh_from_db()
+        self.assertEqual((self.thermometer.stock, self.thermometer.price), (15, 550))
+        glucometer = Product.objects.get(name__iexact='glucometer')
+        self.assertEqual((glucometer.stock, glucometer.category_id), (7, self.devices.id))
+        self.assertEqual(Category.objects.filter(name='Hydration').count(), 1)
+        self.assertEqual(Product.objects.count(), 3)
+        # bulk writes skip post_save, the resource updates the search index itself
+        self.assertEqual(self.client.get(reverse('product-search'), {'q': 'ors'}).data['count'], 1)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def rows(count, prefix):
+            return [(f'{prefix} {n}', 'Devices', 10, 1, '', 1) for n in range(count)]
+        with CaptureQueriesContext(connection) as small:
+            self.run_import(rows(5, 'Small'))
+        with CaptureQueriesContext(connection) as large:
+            self.run_import(rows(90, 'Large'))
+        self.assertEqual(Product.objects.filter(name__startswith='Large').count(), 90)
+        self.assertEqual(len(large), len(small))
+
+    def test_category_rows_repeated_in_a_file_update_one_category(self):
+        dataset = tablib.Dataset(headers=['name'])
+        for name in ['Hydration', 'hydration', 'HYDRATION', 'devices']:
+            dataset.append([name])
+        result = CategoryResource().import_data(dataset, dry_run=False, use_transactions=True)
+        self.assertFalse(result.has_errors())
+        # Each row updates (and renames) the category the earlier row created or matched
+        self.assertEqual(sorted(Category.objects.values_list('name', flat=True)), ['HYDRATION', 'devices'])
+        self.devices.refresh_from_db()
+        self.assertEqual(self.devices.name, 'devices')
+
+class NormalizedNameTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.medicine = Category.objects.create(name='Medicine')
+        self.brufen = Product.objects.create(name='Brufen 400 MG', category=self.medicine, price=10, stock=5)
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('  Panadol   Extra 500 MG '), 'panadol extra 500mg')
+        self.assertEqual(normalize_name('ORS 10 %'), 'ors 10%')
+        self.assertEqual(normalize_name('Pack of 5 gloves'), 'pack of 5 gloves')
+        self.assertEqual(self.brufen.normalized_name, 'brufen 400mg')
+
+    def test_key_follows_renames(self):
+        self.brufen.name = 'Brufen 200 mg'
+        self.brufen.save(update_fields=['name'])
+        self.brufen.refresh_from_db()
+        self.assertEqual(self.brufen.normalized_name, 'brufen 200mg')
+
+    def test_search_ignores_unit_spacing_and_ranks_exact_name_first(self):
+        Product.objects.create(name='Brufen 400mg Syrup', category=self.medicine, price=10, stock=5)
+        response = self.client.get(reverse('product-search'), {'q': 'brufen 400mg'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'][0]['id'], self.brufen.id)
+
+    def test_bulk_upload_matches_normalized_names(self):
+        self.client.force_authenticate(user=self.admin)
+        content = "name,category,price,stock\nbrufen  400mg ,medicine,12,7\n"
+        response = self.client.post(
+            reverse('bulk-upload'), {'file': SimpleUploadedFile('prices.csv', content.encode())}, format='multipart'
+        )
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+        self.brufen.refresh_from_db()
+        self.assertEqual((self.brufen.name, self.brufen.stock), ('Brufen 400 MG', 7))
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_api_rejects_near_duplicate_names(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(reverse('product-list'), {
+            'name': 'brufen 400mg', 'category': self.medicine.id, 'price': 5, 'stock': 1,
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data)
+
+
+class ProductImportJobTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, PRODUCT_IMPORT_CHUNK_ROWS=2)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.client.force_authenticate(user=self.admin)
+        self.csv = (
+            "name,category,price,stock\n"
+            "Panadol,Medicine,10,5\n"
+            "Brufen,Medicine,20,6\n"
+            "Disprin,Medicine,abc,7\n"
+            "Ponstan,Medicine,40,8\n"
+            "Flagyl,Antibiotics,50,9\n"
+        )
+
+    def job(self, content=None, name='prices.csv'):
+        content = self.csv.encode() if content is None else content
+        return ProductImportJob.objects.create(file=SimpleUploadedFile(name, content))
+
+    def test_large_or_background_upload_is_queued(self):
+        response = self.client.post(reverse('bulk-upload'), {
+            'file': SimpleUploadedFile('prices.csv', self.csv.encode()), 'background': True,
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ProductImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual((job.status, job.requested_by), ('queued', self.admin))
+        self.assertFalse(Product.objects.exists())
+
+        with override_settings(PRODUCT_IMPORT_SYNC_MAX_BYTES=10):
+            response = self.client.post(reverse('bulk-upload'), {
+                'file': SimpleUploadedFile('prices.csv', self.csv.encode()),
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.client.get(response.data['status_url'])
+        self.assertEqual((response.data['status'], response.data['progress']), ('queued', 0))
+
+    def test_csv_is_imported_chunk_by_chunk(self):
+        job = ingest.process_jobs()
+        self.assertIsNone(job)
+        job = self.job()
+        with patch('products.ingest.import_products', wraps=import_products) as spy:
+            ingest.process_jobs()
+        job.refresh_from_db()
+        self.assertEqual(spy.call_count, 3)
+        self.assertEqual(
+            (job.status, job.total_rows, job.rows_processed, job.chunks_done, job.created_count, job.progress),
+            ('done', 5, 5, 3, 4, 100),
+        )
+        # Row numbers run on across chunks
+        self.assertEqual(job.errors, ["Row 2: price must be a non-negative number"])
+        self.assertEqual(Product.objects.get(name='Flagyl').category.name, 'Antibiotics')
+
+    def test_rows_are_counted_as_csv_records(self):
+        # A quoted description spanning lines is one row, a blank line none
+        content = self.csv + '"Ors",Hydration,20,50\n\n'
+        content = content.replace('name,category,price,stock', 'name,category,price,stock,description')
+        content = content.replace('Flagyl,Antibiotics,50,9', 'Flagyl,Antibiotics,50,9,"Tablets\n400 mg"')
+        job = ingest.run_job(self.job(content.encode()))
+        self.assertEqual((job.status, job.total_rows, job.rows_processed, job.progress), ('done', 6, 6, 100))
+
+    def test_xlsx_is_read_in_chunks(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        for line in self.csv.splitlines():
+            sheet.append(line.split(','))
+        sheet.append(['Panadol', 'Medicine', 11, None])
+        path = f'{self.media_root}/prices.xlsx'
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            job = self.job(f.read(), name='prices.xlsx')
+
+        ingest.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total_rows, job.chunks_done, job.created_count), ('done', 6, 3, 4))
+        self.assertEqual(job.errors, [
+            "Row 2: price must be a non-negative number",
+            "Row 5: stock must be a whole number",
+        ])
+
+    def test_failed_job_resumes_after_last_committed_chunk(self):
+        job = self.job()
+        calls = []
+
+        def fail_second_chunk(frame):
+            calls.append(list(frame['name']))
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return import_products(frame)
+
+        with patch('products.ingest.import_products', side_effect=fail_second_chunk):
+            ingest.process_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.chunks_done, job.rows_processed), ('failed', 1, 2))
+        self.assertEqual(job.error, 'database went away')
+        self.assertEqual(set(Product.objects.values_list('name', flat=True)), {'Panadol', 'Brufen'})
+
+        url = reverse('product-import-job', args=[job.id])
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_202_ACCEPTED)
+        with patch('products.ingest.import_products', side_effect=fail_second_chunk):
+            ingest.process_jobs()
+        job.refresh_from_db()
+        # The first chunk is not imported again
+        self.assertEqual(calls[2:], [['Disprin', 'Ponstan'], ['Flagyl']])
+        self.assertEqual((job.status, job.rows_processed, job.created_count), ('done', 5, 4))
+        # Only failed jobs can be resumed
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_409_CONFLICT)
@@ -4,6 +4,7 @@ from .views import (
     CategoryListView, 
     ProductViewSet, 
     ProductBulkUploadView, 
+    ProductImportJobView,
     FavoriteListView, 
     FavoriteToggleView,
     FavoriteToggleView,
@@ -15,9 +16,11 @@ router.register(r'products', ProductViewSet, basename='product')
 
 urlpatterns = [
     path('products/home/', HomeView.as_view(), name='home'),
+    # Before the router, or products/<pk>/ swallows it
+    path('products/bulk-upload/', ProductBulkUploadView.as_view(), name='bulk-upload'),
+    path('products/imports/<uuid:job_id>/', ProductImportJobView.as_view(), name='product-import-job'),
     path('', include(router.urls)),
     path('categories/', CategoryListView.as_view(), name='category-list'),
-    path('products/bulk-upload/', ProductBulkUploadView.as_view(), name='bulk-upload'),
     path('favorites/', FavoriteListView.as_view(), name='favorite-list'),
     path('favorites/toggle/', FavoriteToggleView.as_view(), name='favorite-toggle'),
 ]
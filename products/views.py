@@ -1,44 +1,43 @@
 from rest_framework import viewsets, generics, status, filters
 from rest_framework.views import APIView
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.parsers import MultiPartParser
 from django.db.models import Q, Count
 import pandas as pd
-from .models import Category, Product, Favorite
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from .models import Category, Product, Favorite, ProductImportJob
 from .serializers import (
     CategorySerializer, 
     ProductSerializer, 
     FavoriteSerializer, 
-    ProductBulkUploadSerializer
+    ProductBulkUploadSerializer,
+    ProductImportJobSerializer
 )
+from .feed import get_home_feed, personalize_home_feed
+from .search import SearchResults, filter_products
+from .autocomplete import get_index as get_autocomplete_index
+from .importer import import_products, ImportFileError
+from .ingest import resume_job
+from config.pagination import SearchResultsPagination
 
 class HomeView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        # 1. All Categories (for the top list)
-        all_categories = Category.objects.all()
-        
-        # 2. Hot Categories Sections (ordered by order count)
-        hot_categories = Category.objects.annotate(
-            popularity=Count('products__order_items')
-        ).order_by('-popularity')
-
-        sections = []
-        for category in hot_categories:
-            # Get top 10 products for this category
-            products = Product.objects.filter(category=category, is_active=True)[:10]
-            if products.exists():
-                sections.append({
-                    "category": CategorySerializer(category).data,
-                    "products": ProductSerializer(products, many=True, context={'request': request}).data
-                })
-
-        return Response({
-            "categories": CategorySerializer(all_categories, many=True).data,
-            "sections": sections
-        })
+        # Shared document is cached; only favorites/image URLs are per request
+        return Response(personalize_home_feed(get_home_feed(), request))
+
+class ProductSearchFilter(filters.BaseFilterBackend):
+    """
+    `?search=` backed by the full-text index (see products.search)
+    instead of LIKE '%term%' scans.
+    """
+    def filter_queryset(self, request, queryset, view):
+        return filter_products(queryset, request.query_params.get('search', ''))
 
 class CategoryListView(generics.ListAPIView):
     queryset = Category.objects.all()
@@ -46,12 +45,12 @@ class CategoryListView(generics.ListAPIView):
     permission_classes = [AllowAny]
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.filter(is_active=True)
+    queryset = Product.objects.filter(is_active=True).select_related('category')
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'category__name']
+    filter_backends = [ProductSearchFilter, filters.OrderingFilter]
+    # Non-null fields only: the keyset paginator appends id to whichever is picked
     ordering_fields = ['price', 'created_at', 'stock']
-    ordering = ['-created_at'] # Default ordering
+    ordering = ['-created_at', '-id'] # Default ordering (keyset pagination tie-breaker)
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_upload']:
@@ -79,6 +78,30 @@ class ProductViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(price__lte=max_price)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Ranked full-text search with prefix matching.
+        GET /api/products/search/?q=pana&limit=20&offset=0
+        """
+        paginator = SearchResultsPagination()
+        page = paginator.paginate_queryset(SearchResults(request.query_params.get('q', '')), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Typo-tolerant suggestions served from the in-memory trie (no DB hit).
+        GET /api/products/autocomplete/?q=panad&limit=10
+        """
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        suggestions = get_autocomplete_index().suggest(request.query_params.get('q', ''), max(limit, 1))
+        return Response(suggestions)
+
 class ProductBulkUploadView(APIView):
     permission_classes = [IsAdminUser]
     parser_classes = [MultiPartParser]
@@ -87,60 +110,56 @@ class ProductBulkUploadView(APIView):
         serializer = ProductBulkUploadSerializer(data=request.data)
         if serializer.is_valid():
             file = serializer.validated_data['file']
+            if not file.name.endswith(('.csv', '.xlsx')):
+                return Response({"error": "Invalid file format. Only CSV or Excel allowed."}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Big files are read in chunks by the `run_product_imports` worker
+            if serializer.validated_data['background'] or file.size > settings.PRODUCT_IMPORT_SYNC_MAX_BYTES:
+                job = ProductImportJob.objects.create(file=file, requested_by=request.user)
+                return Response({
+                    "message": "Bulk upload queued.",
+                    "job_id": str(job.id),
+                    "status_url": reverse('product-import-job', args=[job.id]),
+                }, status=status.HTTP_202_ACCEPTED)
+
             try:
                 if file.name.endswith('.csv'):
-                    df = pd.read_csv(file)
+                    df = pd.read_csv(file, dtype=str, keep_default_na=False)
                 elif file.name.endswith('.xlsx'):
-                    df = pd.read_excel(file)
-                else:
-                    return Response({"error": "Invalid file format. Only CSV or Excel allowed."}, status=status.HTTP_400_BAD_REQUEST)
-
-                # Expect columns: name, category, price, stock, description
-                created_count = 0
-                updated_count = 0
-                errors = []
-
-                for index, row in df.iterrows():
-                    try:
-                        category_name = row.get('category')
-                        category, _ = Category.objects.get_or_create(name=category_name)
-                        
-                        product, created = Product.objects.update_or_create(
-                            name=row.get('name'),
-                            defaults={
-                                'category': category,
-                                'price': row.get('price'),
-                                'stock': row.get('stock'),
-                                'description': row.get('description', ''),
-                                'is_active': True
-                            }
-                        )
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1
-                            
-                    except Exception as e:
-                        errors.append(f"Row {index}: {str(e)}")
+                    df = pd.read_excel(file, dtype=str, keep_default_na=False)
 
-                return Response({
-                    "message": "Bulk upload processed.",
-                    "created": created_count,
-                    "updated": updated_count,
-                    "errors": errors
-                }, status=status.HTTP_200_OK)
+                # Expect columns: name, category, price, stock, description (see products.importer)
+                result = import_products(df)
+                return Response({"message": "Bulk upload processed.", **result}, status=status.HTTP_200_OK)
 
+            except ImportFileError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class ProductImportJobView(APIView):
+    """GET: progress of a background bulk upload. POST: resume a failed one."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ProductImportJob, pk=job_id)
+        return Response(ProductImportJobSerializer(job).data)
+
+    def post(self, request, job_id):
+        job = get_object_or_404(ProductImportJob, pk=job_id)
+        if not resume_job(job):
+            return Response({"error": "Only failed imports can be resumed."}, status=status.HTTP_409_CONFLICT)
+        job.refresh_from_db()
+        return Response(ProductImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 class FavoriteListView(generics.ListAPIView):
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user)
+        return Favorite.objects.filter(user=self.request.user).select_related('product__category')
 
 class FavoriteToggleView(APIView):
     permission_classes = [IsAuthenticated]
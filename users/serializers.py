@@ -33,7 +33,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             # Check if the specific error is for an inactive user
             # 'no_active_account' is the code Simple JWT uses for inactive users
             if e.default_code == 'no_active_account':
-                user = User.objects.filter(email__iexact=email).first()
+                # Emails are stored lowercased (User.save), an exact match uses the unique index
+                user = User.objects.filter(email=(email or '').lower()).first()
                 logger.debug(f"[{self.__class__.__name__}] User found after 'no_active_account' error: {bool(user)}, Is active: {user.is_active if user else 'N/A'}")
 
                 # Double-check that the user exists and is indeed inactive
@@ -18,6 +18,7 @@ from .serializers import (
     CustomTokenObtainPairSerializer
 )
 from .utils import generate_otp, send_otp_email
+from config.pagination import DateJoinedCursorPagination
 
 logger = logging.getLogger(__name__)
 
@@ -220,6 +221,7 @@ class UserListView(generics.ListAPIView):
     permission_classes = [IsAdminUser]
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
+    pagination_class = DateJoinedCursorPagination
 
 class ResendOTPView(APIView):
     permission_classes = [AllowAny]